@@ -0,0 +1,246 @@
+# admission.py — admission control for the expensive operations
+#
+# Every session's script runs in a thread of the same server process, so ten
+# users running a full-dataset breakdown at once all compete for the same CPU
+# and memory. Pages wrap the expensive steps (dataset load, aggregation,
+# forecast fit, backtest) in heavy(...) / admit(...):
+#   - at most MAX_CONCURRENT run at a time, and their declared memory costs
+#     stay under MEMORY_MB together;
+#   - waiting requests are served round-robin per user, so one user's burst
+#     does not starve everyone else, and the caller is told its queue position;
+#   - a request is refused up front (AdmissionRefused) when it could never
+#     fit, when the user already has MAX_PER_USER in flight, or when the
+#     expected wait plus its own expected run time — from recent durations of
+#     the same operation — exceeds MAX_WAIT_S. Under load the slowest
+#     operations are turned away first instead of slowing everyone down.
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+MAX_CONCURRENT = int(os.getenv("LUMINAIQ_MAX_CONCURRENT", "4"))
+MEMORY_MB = float(os.getenv("LUMINAIQ_ADMISSION_MEM_MB", "2048"))
+MAX_QUEUE = int(os.getenv("LUMINAIQ_MAX_QUEUE", "32"))
+MAX_PER_USER = int(os.getenv("LUMINAIQ_MAX_PER_USER", "2"))  # running + waiting
+MAX_WAIT_S = float(os.getenv("LUMINAIQ_MAX_WAIT_S", "30"))
+_EWMA = 0.3  # weight of the latest duration in the per-operation estimate
+
+
+class AdmissionRefused(RuntimeError):
+    """The request was turned away instead of queued; the message says why."""
+
+
+_cv = threading.Condition()
+_tickets = itertools.count(1)
+_requests: Dict[int, Dict[str, Any]] = {}  # ticket → {user, op, cost, since}
+_running: Dict[int, Dict[str, Any]] = {}
+_waiting: "OrderedDict[str, deque]" = OrderedDict()  # user → tickets; key order is the round-robin order
+_durations: Dict[str, float] = {}  # op → smoothed seconds
+_stats: Dict[str, float] = {"admitted_total": 0, "queued_total": 0, "refused_total": 0, "wait_seconds_total": 0.0}
+
+
+# ---------- Scheduling (call with _cv held) ----------
+
+def _mem_in_use() -> float:
+    return sum(r["cost"] for r in _running.values())
+
+
+def _fits(req: Dict[str, Any]) -> bool:
+    if len(_running) >= MAX_CONCURRENT:
+        return False
+    return not _running or _mem_in_use() + req["cost"] <= MEMORY_MB
+
+
+def _dispatch() -> None:
+    """Grant waiting requests round-robin over users while they fit."""
+    granted = True
+    while granted and _waiting:
+        granted = False
+        for user in list(_waiting):
+            queue = _waiting[user]
+            req = _requests[queue[0]]
+            if not _fits(req):
+                continue
+            ticket = queue.popleft()
+            if queue:
+                _waiting.move_to_end(user)
+            else:
+                del _waiting[user]
+            req["started"] = time.monotonic()
+            _running[ticket] = req
+            granted = True
+            break
+    _cv.notify_all()
+
+
+def _order() -> List[int]:
+    """Waiting tickets in the order they would be served (one per user per round)."""
+    queues = [list(q) for q in _waiting.values()]
+    out: List[int] = []
+    for i in range(max((len(q) for q in queues), default=0)):
+        out.extend(q[i] for q in queues if i < len(q))
+    return out
+
+
+def _expected(op: str) -> float:
+    return _durations.get(op, 0.0)
+
+
+def _eta(ahead: List[int]) -> float:
+    """Seconds until a slot frees for a request behind `ahead`, from smoothed durations."""
+    now = time.monotonic()
+    busy = sum(max(0.0, _expected(r["op"]) - (now - r["started"])) for r in _running.values())
+    busy += sum(_expected(_requests[t]["op"]) for t in ahead)
+    return busy / max(1, MAX_CONCURRENT)
+
+
+def _drop(ticket: int) -> None:
+    req = _requests.pop(ticket, None)
+    _running.pop(ticket, None)
+    if req is not None and req["user"] in _waiting:
+        queue = _waiting[req["user"]]
+        if ticket in queue:
+            queue.remove(ticket)
+        if not queue:
+            del _waiting[req["user"]]
+
+
+def _refuse(message: str) -> None:
+    _stats["refused_total"] += 1
+    raise AdmissionRefused(message)
+
+
+# ---------- Public API ----------
+
+@contextmanager
+def admit(op: str, *, user: str = "anonymous", cost_mb: float = 0.0,
+          on_wait: Optional[Callable[[int, float], None]] = None):
+    """
+    Run the body once the request is admitted. While it waits, on_wait(position,
+    eta_seconds) is called whenever the position changes (position 0 = next).
+    Raises AdmissionRefused instead of waiting when the request can't be served
+    in time.
+    """
+    user = str(user)
+    with _cv:
+        if cost_mb > MEMORY_MB:
+            _refuse(f"{op} needs about {cost_mb:,.0f} MB, more than the server allows "
+                    f"at once ({MEMORY_MB:,.0f} MB).")
+        mine = sum(1 for r in _requests.values() if r["user"] == user)
+        if mine >= MAX_PER_USER:
+            _refuse(f"You already have {mine} heavy operations in progress — wait for them to finish.")
+        ticket = next(_tickets)
+        req = {"user": user, "op": op, "cost": float(cost_mb), "since": time.monotonic()}
+        if not _waiting and _fits(req):
+            req["started"] = req["since"]
+            _requests[ticket] = req
+            _running[ticket] = req
+        else:
+            ahead = _order()
+            if len(ahead) >= MAX_QUEUE:
+                _refuse("The server is at capacity — please try again in a moment.")
+            eta = _eta(ahead)
+            if eta + _expected(op) > MAX_WAIT_S:
+                _refuse(f"The server is busy — {op} usually takes {_expected(op):,.0f}s and would start "
+                        f"in about {eta:,.0f}s. Please try again shortly.")
+            _requests[ticket] = req
+            _waiting.setdefault(user, deque()).append(ticket)
+            _stats["queued_total"] += 1
+            _dispatch()
+
+    try:
+        last = None
+        while True:
+            with _cv:
+                if ticket in _running:
+                    break
+                waited = time.monotonic() - req["since"]
+                if waited > MAX_WAIT_S + _expected(op):
+                    _drop(ticket)
+                    _refuse(f"{op} waited {waited:,.0f}s without a free slot. Please try again shortly.")
+                order = _order()
+                position = order.index(ticket)
+                eta = _eta(order[:position])
+            if on_wait is not None and position != last:
+                on_wait(position, eta)
+                last = position
+            with _cv:
+                if ticket not in _running:
+                    _cv.wait(0.5)
+    except BaseException:
+        with _cv:
+            _drop(ticket)
+            _dispatch()
+        raise
+
+    with _cv:
+        _stats["admitted_total"] += 1
+        _stats["wait_seconds_total"] += req["started"] - req["since"]
+    try:
+        yield
+    finally:
+        with _cv:
+            elapsed = time.monotonic() - req["started"]
+            prev = _durations.get(op)
+            _durations[op] = elapsed if prev is None else (1 - _EWMA) * prev + _EWMA * elapsed
+            _drop(ticket)
+            _dispatch()
+
+
+def stats() -> Dict[str, Any]:
+    """Counters plus the current running/waiting requests (for the Admin page)."""
+    with _cv:
+        now = time.monotonic()
+        order = _order()
+        rows = [
+            {"state": "running", "user": r["user"], "op": r["op"], "cost_mb": r["cost"],
+             "seconds": round(now - r["started"], 1)}
+            for r in _running.values()
+        ] + [
+            {"state": f"waiting #{i + 1}", "user": _requests[t]["user"], "op": _requests[t]["op"],
+             "cost_mb": _requests[t]["cost"], "seconds": round(now - _requests[t]["since"], 1)}
+            for i, t in enumerate(order)
+        ]
+        return {
+            **_stats,
+            "running": len(_running),
+            "waiting": len(order),
+            "memory_mb_in_use": _mem_in_use(),
+            "expected_seconds": {op: round(s, 3) for op, s in sorted(_durations.items())},
+            "requests": rows,
+        }
+
+
+# ---------- Streamlit ----------
+
+@contextmanager
+def heavy(op: str, *, cost_mb: float = 0.0, skip: bool = False):
+    """
+    admit() for page code: the current user's id, queue position shown in a
+    placeholder, and a refusal ends the script run with a message. skip=True
+    (e.g. the result is already cached) runs the body without admission.
+    """
+    if skip:
+        yield
+        return
+    import streamlit as st
+
+    user = (st.session_state.get("user") or {}).get("id", "anonymous")
+    box = st.empty()
+
+    def _show(position: int, eta: float) -> None:
+        ahead = "next in line" if position == 0 else f"{position} ahead of you"
+        box.info(f"⏳ Waiting for a free slot for {op} — {ahead}" + (f" (about {eta:,.0f}s)" if eta >= 1 else ""))
+
+    try:
+        with admit(op, user=user, cost_mb=cost_mb, on_wait=_show):
+            box.empty()
+            yield
+    except AdmissionRefused as e:
+        box.warning(f"⏸️ {e}")
+        st.stop()
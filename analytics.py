@@ -0,0 +1,288 @@
+# analytics.py — the Dashboard's data operations as plain functions
+#
+# Used by pages/3_Dashboard.py and by benchmark.py, so the code that is timed
+# is the code that runs in the app. No Streamlit here.
+from __future__ import annotations
+
+from io import BytesIO
+from typing import Dict, Optional, Sequence, Tuple
+from zipfile import ZipFile, ZIP_DEFLATED
+
+import numpy as np
+import pandas as pd
+
+DATE_HINTS = ("date", "day", "time")
+
+
+def coerce_date_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Parse date-like columns (by name) in place; columns that don't parse are left as they are."""
+    for c in df.columns:
+        if any(k in c.lower() for k in DATE_HINTS) and not pd.api.types.is_datetime64_any_dtype(df[c]):
+            try:
+                df[c] = pd.to_datetime(df[c])
+            except (ValueError, TypeError, OverflowError):
+                pass
+    return df
+
+
+def column_kinds(df: pd.DataFrame) -> Tuple[list, list, list]:
+    """(numeric, categorical, datetime) column names."""
+    num_cols = df.select_dtypes("number").columns.tolist()
+    cat_cols = df.select_dtypes(include=["object", "category"]).columns.tolist()
+    dt_cols = df.select_dtypes(include=["datetime", "datetimetz"]).columns.tolist()
+    return num_cols, cat_cols, dt_cols
+
+
+def apply_filters(
+    df: pd.DataFrame,
+    *,
+    date_col: Optional[str] = None,
+    drange: Optional[Sequence] = None,
+    cat_col: Optional[str] = None,
+    keep_vals: Optional[Sequence[str]] = None,
+    value_col: Optional[str] = None,
+    num_range: Optional[Sequence[float]] = None,
+) -> pd.DataFrame:
+    """
+    Rows inside the date range (inclusive, by calendar day), with cat_col among
+    keep_vals (compared as strings) and value_col inside num_range. The filters
+    are combined into one mask, so the frame is indexed once; with no filter
+    the input frame itself is returned (not a copy).
+    """
+    mask = None
+
+    def _and(m):
+        nonlocal mask
+        mask = m if mask is None else (mask & m)
+
+    if date_col and drange:
+        sdt = pd.to_datetime(df[date_col], errors="coerce")
+        if getattr(sdt.dt, "tz", None) is not None:
+            sdt = sdt.dt.tz_localize(None)
+        d0 = pd.Timestamp(drange[0]).normalize()
+        d1 = pd.Timestamp(drange[1]).normalize() + pd.Timedelta(days=1)
+        _and((sdt >= d0) & (sdt < d1))
+    if cat_col and keep_vals:
+        _and(df[cat_col].astype(str).isin(keep_vals))
+    if value_col and num_range:
+        v0, v1 = num_range
+        sv = pd.to_numeric(df[value_col], errors="coerce")
+        _and((sv >= v0) & (sv <= v1))
+    return df if mask is None else df[mask.to_numpy()]
+
+
+def category_breakdown(df: pd.DataFrame, cat_col: str, value_col: str, top: int = 20) -> pd.DataFrame:
+    """Top `top` values of cat_col by summed value_col (non-numeric values count as missing)."""
+    return breakdown_from_sums(category_sums(df, cat_col, value_col), top=top)
+
+
+def time_series(df: pd.DataFrame, date_col: str, value_col: str) -> pd.DataFrame:
+    """value_col summed per distinct timestamp of date_col, sorted."""
+    return series_from_sums(time_sums(df, date_col, value_col))
+
+
+# ---------- Mergeable sums ----------
+# The partial results behind category_breakdown, time_series and pivot. Sums
+# over two sets of rows add up (add_sums / add_cells), so the result for a
+# dataset with appended rows is the previous one plus the sums of the new rows.
+
+def category_sums(df: pd.DataFrame, cat_col: str, value_col: str) -> pd.Series:
+    """value_col summed per value of cat_col (missing included), named value_col."""
+    values = pd.to_numeric(df[value_col], errors="coerce")
+    return values.groupby(df[cat_col], dropna=False, observed=True).sum().rename(value_col)
+
+
+def time_sums(df: pd.DataFrame, date_col: str, value_col: str) -> pd.Series:
+    """value_col summed per distinct timestamp of date_col (rows missing either are dropped)."""
+    ts = pd.DataFrame({
+        date_col: pd.to_datetime(df[date_col], errors="coerce"),
+        value_col: pd.to_numeric(df[value_col], errors="coerce"),
+    }).dropna()
+    return ts.groupby(date_col)[value_col].sum()
+
+
+def add_sums(a: pd.Series, b: pd.Series) -> pd.Series:
+    """Two category_sums / time_sums results combined into the sums over both sets of rows."""
+    if not len(b):
+        return a
+    return pd.concat([a, b]).groupby(level=0, dropna=False, sort=False).sum().rename(a.name)
+
+
+def breakdown_from_sums(sums: pd.Series, top: int = 20) -> pd.DataFrame:
+    """category_breakdown from category_sums (possibly merged)."""
+    return sums.sort_index().reset_index().sort_values(sums.name, ascending=False).head(top)
+
+
+def series_from_sums(sums: pd.Series) -> pd.DataFrame:
+    """time_series from time_sums (possibly merged)."""
+    return sums.sort_index().reset_index()
+
+
+def export_zip(df_view: pd.DataFrame, figures: Optional[Dict[str, object]] = None, pio=None) -> bytes:
+    """
+    ZIP with filtered.csv plus one PNG per figure ({name: plotly figure}) when
+    `pio` (plotly.io with kaleido) is given. PNG failures are written to
+    export_warning.txt instead of aborting the export.
+    """
+    mem = BytesIO()
+    with ZipFile(mem, mode="w", compression=ZIP_DEFLATED) as zf:
+        zf.writestr("filtered.csv", df_view.to_csv(index=False))
+        if pio is not None and figures:
+            try:
+                for name, fig in figures.items():
+                    if fig is None:
+                        continue
+                    buf = BytesIO()
+                    pio.write_image(fig, buf, format="png", scale=2)
+                    zf.writestr(f"{name}.png", buf.getvalue())
+            except Exception as e:
+                zf.writestr("export_warning.txt", f"PNG export failed: {e}")
+    return mem.getvalue()
+
+
+ROLLUP_COUNT = "rows_in_group"
+
+
+def rollup(df: pd.DataFrame, max_cardinality: int = 1000) -> pd.DataFrame:
+    """
+    Aggregated stand-in for a frame too large to hold per session: numeric
+    columns summed per (date, low-cardinality category) combination, with the
+    number of source rows in ROLLUP_COUNT. Totals, breakdowns and time series
+    over sums stay exact; identifier-like columns (more than max_cardinality
+    distinct values) are dropped.
+    """
+    num_cols, cat_cols, dt_cols = column_kinds(df)
+    keys = dt_cols + [c for c in cat_cols if df[c].nunique(dropna=False) <= max_cardinality]
+    if not keys:
+        out = df[num_cols].sum().to_frame().T
+        out[ROLLUP_COUNT] = len(df)
+        return out
+    g = df.groupby(keys, dropna=False, observed=True, sort=False)
+    out = g[num_cols].sum() if num_cols else g.size().to_frame(name="_").iloc[:, :0]
+    out[ROLLUP_COUNT] = g.size()
+    return out.reset_index()
+
+
+PIVOT_AGGS = ("sum", "mean", "count")
+PIVOT_OTHER = "(other)"
+PIVOT_MISSING = "(missing)"
+
+
+def _pivot_codes(s: pd.Series, rank: np.ndarray, top: int) -> Tuple[np.ndarray, pd.Index]:
+    """
+    Integer codes of s restricted to the `top` labels with the largest `rank`
+    (per-row contribution), the rest pooled into PIVOT_OTHER; returns (codes, labels).
+    """
+    codes, uniques = pd.factorize(s)
+    labels = pd.Index(uniques).astype(object)
+    if (codes < 0).any():  # missing values get the last code
+        codes = np.where(codes < 0, len(labels), codes)
+        labels = labels.append(pd.Index([PIVOT_MISSING]))
+    totals = np.bincount(codes, weights=rank, minlength=len(labels))
+    order = np.argsort(-totals, kind="stable")[:top]
+    if len(labels) <= top:
+        return codes, labels
+    remap = np.full(len(labels), top, dtype=np.int64)
+    remap[order] = np.arange(top)
+    return remap[codes], labels[order].append(pd.Index([PIVOT_OTHER]))
+
+
+def pivot(
+    df: pd.DataFrame, row_col: str, col_col: str, value_col: Optional[str] = None, *, agg: str = "sum",
+    weights: Optional[np.ndarray] = None, count_col: Optional[str] = None, top_rows: int = 30, top_cols: int = 20,
+) -> pd.DataFrame:
+    """
+    row_col × col_col table of value_col's sum or mean, or the row count
+    (agg "count" or no value_col): both dimensions are factorized to integer
+    codes, combined into one flat cell index, and every cell is filled by
+    np.bincount in a single pass over the rows. The top_rows / top_cols labels
+    with the largest totals are kept, the rest pooled into PIVOT_OTHER; empty
+    cells are NaN. `weights` scales values and counts (sampled rows);
+    `count_col` holds the rows each line stands for (a rollup()).
+    """
+    if value_col is None:
+        agg = "count"
+    rows, numbered, values = _pivot_weights(df, value_col, weights, count_col)
+    return _pivot_fill(df[row_col], df[col_col], rows, numbered, values,
+                       rows if agg == "count" else np.abs(values), agg, top_rows, top_cols)
+
+
+def _pivot_weights(df: pd.DataFrame, value_col: Optional[str], weights: Optional[np.ndarray],
+                   count_col: Optional[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per line of df: rows it stands for, those rows when value_col holds a number, and the value (0 if not)."""
+    n = len(df)
+    rows = np.ones(n) if count_col is None else pd.to_numeric(df[count_col], errors="coerce").fillna(0).to_numpy()
+    values = np.zeros(n) if value_col is None else pd.to_numeric(df[value_col], errors="coerce").to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    values = np.where(valid, values, 0.0)
+    if weights is not None:
+        w = np.asarray(weights, dtype=float)
+        rows, values = rows * w, values * w
+    return rows, np.where(valid, rows, 0.0), values
+
+
+def _pivot_fill(row_s: pd.Series, col_s: pd.Series, rows: np.ndarray, numbered: np.ndarray, values: np.ndarray,
+                rank: np.ndarray, agg: str, top_rows: int, top_cols: int) -> pd.DataFrame:
+    """The pivot table of lines labelled row_s × col_s carrying rows / numbered / values, by np.bincount."""
+    r, row_labels = _pivot_codes(row_s, rank, top_rows)
+    c, col_labels = _pivot_codes(col_s, rank, top_cols)
+    cells = r * len(col_labels) + c
+    size = len(row_labels) * len(col_labels)
+    shape = (len(row_labels), len(col_labels))
+    count = np.bincount(cells, weights=rows, minlength=size).reshape(shape)
+    if agg == "count":
+        table = count
+    else:
+        total = np.bincount(cells, weights=values, minlength=size).reshape(shape)
+        if agg == "mean":
+            # mean over the rows with a number; a rollup line carries its group's sum
+            with np.errstate(invalid="ignore", divide="ignore"):
+                table = total / np.bincount(cells, weights=numbered, minlength=size).reshape(shape)
+        else:
+            table = total
+    table = np.where(count > 0, table, np.nan)
+    return pd.DataFrame(table, index=pd.Index(row_labels, name=row_s.name),
+                        columns=pd.Index(col_labels, name=col_s.name))
+
+
+PIVOT_CELL_SUMS = ("rows", "numbered", "total", "magnitude")
+
+
+def pivot_cells(df: pd.DataFrame, row_col: str, col_col: str, value_col: Optional[str] = None, *,
+                count_col: Optional[str] = None) -> pd.DataFrame:
+    """
+    One line per (row_col, col_col) label pair present in df, in order of first
+    appearance, with the sums pivot() fills its cells from (PIVOT_CELL_SUMS:
+    rows, rows with a number, value total, |value| total). Mergeable with
+    add_cells; pivot_from_cells gives the same table as pivot(df, ...).
+    """
+    rows, numbered, values = _pivot_weights(df, value_col, None, count_col)
+    r, row_uniques = pd.factorize(df[row_col])
+    c, col_uniques = pd.factorize(df[col_col])
+    parts = pd.DataFrame({"r": r, "c": c, "rows": rows, "numbered": numbered,
+                          "total": values, "magnitude": np.abs(values)})
+    cells = parts.groupby(["r", "c"], sort=False).sum().reset_index()
+    # code -1 (missing) takes back NaN
+    out = pd.DataFrame({
+        row_col: pd.Index(row_uniques).astype(object).take(cells["r"].to_numpy(), allow_fill=True, fill_value=np.nan),
+        col_col: pd.Index(col_uniques).astype(object).take(cells["c"].to_numpy(), allow_fill=True, fill_value=np.nan),
+    })
+    for k in PIVOT_CELL_SUMS:
+        out[k] = cells[k].to_numpy()
+    return out
+
+
+def add_cells(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """Two pivot_cells results (same columns) combined into the cells of both sets of rows."""
+    if not len(b):
+        return a
+    keys = [k for k in a.columns if k not in PIVOT_CELL_SUMS]
+    return pd.concat([a, b], ignore_index=True).groupby(keys, dropna=False, sort=False).sum().reset_index()
+
+
+def pivot_from_cells(cells: pd.DataFrame, row_col: str, col_col: str, *, agg: str = "sum",
+                     top_rows: int = 30, top_cols: int = 20) -> pd.DataFrame:
+    """pivot() of the rows summarized by pivot_cells (agg "count" when they were built without value_col)."""
+    rows = cells["rows"].to_numpy()
+    return _pivot_fill(cells[row_col], cells[col_col], rows, cells["numbered"].to_numpy(), cells["total"].to_numpy(),
+                       rows if agg == "count" else cells["magnitude"].to_numpy(), agg, top_rows, top_cols)
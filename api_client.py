@@ -0,0 +1,176 @@
+# api_client.py — client for api_server.py (used by the pages when LUMINAIQ_API_URL is set)
+#
+# Tables come back as DataFrames read from the Arrow stream as it arrives;
+# documents as dicts/lists. A 503 (the server's admission control refused the
+# request) is raised as admission.AdmissionRefused, so pages handle it like a
+# local refusal; anything else is ApiError.
+#
+# Requests are signed: the user id and a timestamp travel in headers with an
+# HMAC-SHA256, under LUMINAIQ_API_TOKEN (a secret shared with the server, never
+# sent), of both plus the method, path with query and a hash of the body. The
+# server trusts the user id only from a holder of the secret, a captured
+# header cannot be reused for another endpoint or other parameters, and a
+# captured request is useless after MAX_SKEW_S.
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Any, Optional
+
+from admission import AdmissionRefused
+
+API_URL = os.getenv("LUMINAIQ_API_URL", "").rstrip("/")
+TOKEN = os.getenv("LUMINAIQ_API_TOKEN")
+TIMEOUT = float(os.getenv("LUMINAIQ_API_TIMEOUT", "120"))
+MAX_SKEW_S = 300  # how old a signed request may be
+
+USER_HEADER = "X-LuminaIQ-User"
+TIME_HEADER = "X-LuminaIQ-Time"
+SIGNATURE_HEADER = "X-LuminaIQ-Signature"
+
+
+class ApiError(RuntimeError):
+    """The API could not be reached or rejected the request."""
+
+
+def enabled() -> bool:
+    return bool(API_URL)
+
+
+def signature(token: str, user_id: str, timestamp: str, method: str, path: str, body: bytes = b"") -> str:
+    """
+    HMAC-SHA256 (hex) binding a user id to a request time and to the request
+    itself: method, path with query string, and the SHA-256 of the body.
+    """
+    message = "\n".join([user_id, timestamp, method.upper(), path, hashlib.sha256(body or b"").hexdigest()])
+    return hmac.new(token.encode("utf-8"), message.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _default(o):
+    if hasattr(o, "isoformat"):
+        return o.isoformat()
+    if hasattr(o, "item"):  # numpy scalars
+        return o.item()
+    return str(o)
+
+
+def _open(method: str, path: str, user_id: str, body: Optional[dict] = None):
+    if not TOKEN:
+        raise ApiError("LUMINAIQ_API_TOKEN is not set; requests to the analytics API cannot be signed")
+    data = None if body is None else json.dumps(body, default=_default).encode("utf-8")
+    req = urllib.request.Request(f"{API_URL}{path}", data=data, method=method)
+    req.add_header("Content-Type", "application/json")
+    timestamp = str(int(time.time()))
+    req.add_header(USER_HEADER, urllib.parse.quote(str(user_id)))
+    req.add_header(TIME_HEADER, timestamp)
+    req.add_header(SIGNATURE_HEADER, signature(TOKEN, str(user_id), timestamp, method, req.selector, data or b""))
+    try:
+        return urllib.request.urlopen(req, timeout=TIMEOUT)
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read() or b"{}").get("error") or e.reason
+        except ValueError:
+            message = e.reason
+        if e.code == 503:
+            raise AdmissionRefused(message) from None
+        raise ApiError(f"{e.code}: {message}") from None
+    except OSError as e:
+        raise ApiError(f"Analytics API unreachable at {API_URL}: {e}") from None
+
+
+def _json(method: str, path: str, user_id: str, body: Optional[dict] = None) -> Any:
+    with _open(method, path, user_id, body) as resp:
+        return json.load(resp)
+
+
+def _frame(path: str, user_id: str, body: dict):
+    import pyarrow as pa
+
+    with _open("POST", path, user_id, body) as resp:
+        return pa.ipc.open_stream(resp).read_pandas()
+
+
+# ---------- Operations ----------
+
+def list_uploads(user_id: str) -> list:
+    return _json("GET", "/uploads", user_id)
+
+
+def profile(upload_id: int, user_id: str) -> dict:
+    return _json("GET", f"/uploads/{int(upload_id)}/profile", user_id)
+
+
+def columns(upload_id: int, user_id: str) -> dict:
+    """Rows, column kinds, date ranges and the stored column sketches (sketches.py, decoded)."""
+    import sketches
+
+    out = _json("GET", f"/uploads/{int(upload_id)}/columns", user_id)
+    out["sketches"] = sketches.from_json(out["sketches"])
+    return out
+
+
+def totals(upload_id: int, user_id: str, *, value_col: Optional[str] = None, filters: Optional[dict] = None) -> dict:
+    """{"rows", "total"} of the filtered upload (total None without value_col)."""
+    return _json("POST", f"/uploads/{int(upload_id)}/totals", user_id,
+                 {"filters": filters or {}, "value_col": value_col})
+
+
+def values(upload_id: int, user_id: str, *, column: str, query: str = "", limit: int = 500) -> list:
+    """Sorted distinct values of a column that contain `query`."""
+    return _json("POST", f"/uploads/{int(upload_id)}/values", user_id,
+                 {"column": column, "query": query, "limit": limit})
+
+
+def sketch(upload_id: int, user_id: str, *, column: str, filters: Optional[dict] = None) -> dict:
+    """sketches.sketch_column of the filtered numeric column."""
+    import sketches
+
+    payload = _json("POST", f"/uploads/{int(upload_id)}/sketch", user_id, {"filters": filters or {}, "column": column})
+    return sketches.from_json({column: payload})[column]
+
+
+def pivot(upload_id: int, user_id: str, *, row_col: str, col_col: str, value_col: Optional[str] = None,
+          agg: str = "sum", filters: Optional[dict] = None):
+    """analytics.pivot of the filtered upload (column labels come back as strings)."""
+    table = _frame(f"/uploads/{int(upload_id)}/pivot", user_id,
+                   {"filters": filters or {}, "row_col": row_col, "col_col": col_col,
+                    "value_col": value_col, "agg": agg}).set_index(row_col)
+    table.columns.name = col_col
+    return table
+
+
+def series(upload_id: int, user_id: str, *, date_col: str, target_col: str, freq: str = "D"):
+    """target_col summed per `freq` period of date_col."""
+    return _frame(f"/uploads/{int(upload_id)}/series", user_id,
+                  {"date_col": date_col, "target_col": target_col, "freq": freq})
+
+
+def aggregate(upload_id: int, user_id: str, *, cat_col: str, value_col: str, top: int = 20,
+              filters: Optional[dict] = None):
+    """analytics.category_breakdown of the filtered upload, computed by the API."""
+    return _frame(f"/uploads/{int(upload_id)}/aggregate", user_id,
+                  {"filters": filters or {}, "cat_col": cat_col, "value_col": value_col, "top": top})
+
+
+def time_series(upload_id: int, user_id: str, *, date_col: str, value_col: str, filters: Optional[dict] = None):
+    """analytics.time_series of the filtered upload, computed by the API."""
+    return _frame(f"/uploads/{int(upload_id)}/timeseries", user_id,
+                  {"filters": filters or {}, "date_col": date_col, "value_col": value_col})
+
+
+def forecast(upload_id: int, user_id: str, *, date_col: str, target_col: str, freq: str = "D",
+             model_kind: str = "auto", periods: int = 30):
+    return _frame(f"/uploads/{int(upload_id)}/forecast", user_id,
+                  {"date_col": date_col, "target_col": target_col, "freq": freq,
+                   "model_kind": model_kind, "periods": periods})
+
+
+def kpis(upload_id: int, user_id: str, *, kpis: Optional[list] = None, mapping: Optional[dict] = None) -> list:
+    body = {"kpis": kpis, "mapping": mapping}
+    return _json("POST", f"/uploads/{int(upload_id)}/kpis", user_id, {k: v for k, v in body.items() if v is not None})
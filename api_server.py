@@ -0,0 +1,418 @@
+# api_server.py — headless analytics API over the same uploads and db.py metadata
+#
+#   python api_server.py                 # 127.0.0.1:8600 (--host/--port, LUMINAIQ_API_HOST/PORT)
+#
+# Pages call it through api_client.py when LUMINAIQ_API_URL is set, so several
+# Streamlit processes can share one warm compute tier (and it can be scaled or
+# reused by other tools on its own). LUMINAIQ_API_TOKEN is required: every
+# request names its user in a header signed with it together with the method,
+# path, query and body (api_client.signature), so the user id cannot be chosen
+# by whoever reaches the port and a signature is good for that one request
+# only; uploads of other users are 404.
+#
+#   GET  /health
+#   GET  /uploads                          JSON   the user's uploads
+#   GET  /uploads/<id>/profile             JSON   rows, columns, dtypes, nulls, distinct, min/max
+#   GET  /uploads/<id>/columns             JSON   rows, column kinds, date ranges, stored column sketches
+#   POST /uploads/<id>/totals              JSON   {filters, value_col} → rows, total
+#   POST /uploads/<id>/values              JSON   {column, query, limit} → matching distinct values
+#   POST /uploads/<id>/sketch              JSON   {filters, column} → sketch of the filtered column
+#   POST /uploads/<id>/aggregate           Arrow  {filters, cat_col, value_col, top}
+#   POST /uploads/<id>/timeseries          Arrow  {filters, date_col, value_col}
+#   POST /uploads/<id>/pivot               Arrow  {filters, row_col, col_col, value_col, agg}
+#   POST /uploads/<id>/series              Arrow  {date_col, target_col, freq} → resampled sums
+#   POST /uploads/<id>/forecast            Arrow  {date_col, target_col, freq, model_kind, periods}
+#   POST /uploads/<id>/kpis                JSON   {kpis, mapping} (default: config/client_config.yaml)
+#   GET  /metrics                          Prometheus text (memory + admission counters;
+#                                          no user, so "Authorization: Bearer <token>")
+#
+# `filters` are analytics.apply_filters keyword arguments. Tables are sent as an
+# Arrow IPC stream, one record batch of BATCH_ROWS at a time. The computation
+# runs on a thread pool under admission control (same limits and per-user
+# fairness as the pages; a refusal is a 503 with Retry-After) while the event
+# loop keeps serving other requests.
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hmac
+import io
+import json
+import os
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import pandas as pd
+import pyarrow as pa
+import tornado.ioloop
+import tornado.web
+import yaml
+
+import admission
+import analytics
+import api_client
+import appends
+import db
+import memtrack
+import sketches
+from forecasting import SEASON_PERIODS, es_forecast, init_state, state_fit
+from kpi_engine import evaluate_kpis
+from client_data import apply_mapping, source_aliases
+
+HOST = os.getenv("LUMINAIQ_API_HOST", "127.0.0.1")
+PORT = int(os.getenv("LUMINAIQ_API_PORT", "8600"))
+TOKEN = os.getenv("LUMINAIQ_API_TOKEN")
+THREADS = int(os.getenv("LUMINAIQ_API_THREADS", "8"))
+CACHE_ENTRIES = int(os.getenv("LUMINAIQ_API_CACHE", "8"))
+CACHE_TTL_S = 300
+BATCH_ROWS = 64 * 1024
+MAPPING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "client_config.yaml")
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+_executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix="api")
+
+
+# ---------- Warm datasets ----------
+
+_frames: "OrderedDict[str, tuple]" = OrderedDict()  # path → (frame, loaded_at, rows), LRU order
+_frames_lock = threading.Lock()
+
+
+def _keep(path: str, df: pd.DataFrame, loaded_at: float, rows) -> None:
+    memtrack.track_cache(f"api:{path}", df, ttl=CACHE_TTL_S)
+    with _frames_lock:
+        _frames[path] = (df, loaded_at, rows)
+        _frames.move_to_end(path)
+        while len(_frames) > CACHE_ENTRIES:
+            _frames.popitem(last=False)
+
+
+def load_frame(upload: dict, user_id: str) -> pd.DataFrame:
+    """
+    Parsed, date-coerced upload; kept warm for CACHE_TTL_S (at most
+    CACHE_ENTRIES datasets). When rows were appended since it was loaded, only
+    the new rows are read and added (appends.read_since).
+    """
+    path, rows = upload["path"], upload.get("rows")
+    now = time.time()
+    with _frames_lock:
+        hit = _frames.get(path)
+        if hit and now - hit[1] < CACHE_TTL_S:
+            _frames.move_to_end(path)
+    if hit and now - hit[1] < CACHE_TTL_S:
+        df, loaded_at, known = hit
+        if known == rows:
+            return df
+        extra = appends.read_since(upload, known) if known is not None and rows and known < rows else None
+        if extra is not None:
+            df = pd.concat([df, analytics.coerce_date_columns(extra)], ignore_index=True)
+            _keep(path, df, loaded_at, rows)
+            return df
+    size = os.path.getsize(path) if os.path.isfile(path) else 0
+    with admission.admit("dataset load", user=user_id, cost_mb=size * 4 / (1024 * 1024)):
+        df = analytics.coerce_date_columns(pd.read_csv(path))
+    _keep(path, df, now, rows)
+    return df
+
+
+# ---------- Operations (run on the thread pool) ----------
+
+def op_profile(df: pd.DataFrame) -> dict:
+    num_cols, cat_cols, dt_cols = analytics.column_kinds(df)
+    cols = []
+    for c in df.columns:
+        s = df[c]
+        info = {"name": c, "dtype": str(s.dtype), "nulls": int(s.isna().sum()), "distinct": int(s.nunique())}
+        if c in num_cols or c in dt_cols:
+            info["min"], info["max"] = s.min(), s.max()
+        cols.append(info)
+    return {"rows": int(len(df)), "numeric": num_cols, "categorical": cat_cols, "datetime": dt_cols, "columns": cols}
+
+
+def op_columns(df: pd.DataFrame, upload: dict) -> dict:
+    """What the Dashboard needs to build its widgets without the rows."""
+    num_cols, cat_cols, dt_cols = analytics.column_kinds(df)
+    return {
+        "rows": int(len(df)), "columns": list(map(str, df.columns)),
+        "numeric": num_cols, "categorical": cat_cols, "datetime": dt_cols,
+        "date_ranges": {c: [df[c].min(), df[c].max()] if df[c].notna().any() else None for c in dt_cols},
+        "sketches": sketches.to_json(appends.column_sketches(upload)),
+    }
+
+
+def op_totals(df: pd.DataFrame, body: dict) -> dict:
+    view = analytics.apply_filters(df, **(body.get("filters") or {}))
+    value_col = body.get("value_col")
+    total = float(pd.to_numeric(view[value_col], errors="coerce").sum()) if value_col else None
+    return {"rows": int(len(view)), "total": total}
+
+
+def op_values(df: pd.DataFrame, body: dict) -> list:
+    """Distinct values of `column` containing `query` (case-insensitive), sorted, at most `limit`."""
+    uniq = pd.Series(df[body["column"]].dropna().unique()).astype(str)
+    query = str(body.get("query") or "").lower()
+    if query:
+        uniq = uniq[uniq.str.lower().str.contains(query, regex=False)]
+    return sorted(uniq)[: int(body.get("limit", 500))]
+
+
+def op_sketch(df: pd.DataFrame, body: dict) -> dict:
+    view = analytics.apply_filters(df, **(body.get("filters") or {}))
+    column = body["column"]
+    return sketches.to_json({column: sketches.sketch_column(pd.to_numeric(view[column], errors="coerce"))})[column]
+
+
+def op_pivot(df: pd.DataFrame, body: dict) -> pd.DataFrame:
+    """analytics.pivot with the row labels as the first column and column labels as strings (Arrow names)."""
+    view = analytics.apply_filters(df, **(body.get("filters") or {}))
+    table = analytics.pivot(view, body["row_col"], body["col_col"], body.get("value_col"),
+                            agg=body.get("agg", "sum"))
+    table.columns = table.columns.map(str)
+    return table.reset_index()
+
+
+def op_series(df: pd.DataFrame, body: dict) -> pd.DataFrame:
+    """target_col summed per `freq` period of date_col (the Forecasting page's history)."""
+    date_col, target_col = body["date_col"], body["target_col"]
+    out = df[[date_col, target_col]].dropna().copy()
+    out[date_col] = pd.to_datetime(out[date_col], errors="coerce")
+    out = out.dropna(subset=[date_col]).sort_values(date_col)
+    return out.set_index(date_col).resample(body.get("freq", "D")).sum(numeric_only=True).reset_index()
+
+
+def op_aggregate(df: pd.DataFrame, body: dict) -> pd.DataFrame:
+    view = analytics.apply_filters(df, **(body.get("filters") or {}))
+    return analytics.category_breakdown(view, body["cat_col"], body["value_col"], top=int(body.get("top", 20)))
+
+
+def op_timeseries(df: pd.DataFrame, body: dict) -> pd.DataFrame:
+    view = analytics.apply_filters(df, **(body.get("filters") or {}))
+    return analytics.time_series(view, body["date_col"], body["value_col"])
+
+
+def op_forecast(df: pd.DataFrame, body: dict) -> pd.DataFrame:
+    """History resampled to `freq` plus `periods` forecast points (column `type`: actual/forecast)."""
+    date_col, target_col = body["date_col"], body["target_col"]
+    freq = body.get("freq", "D")
+    series = analytics.time_series(df, date_col, target_col).set_index(date_col)[target_col]
+    series = series.resample(freq).sum().reset_index()
+    y = series[target_col].to_numpy(dtype=float)
+    fit = state_fit(init_state(y, body.get("model_kind", "auto"), m=SEASON_PERIODS.get(freq, 1)), y)
+    periods = int(body.get("periods", 30))
+    yhat = es_forecast(fit, periods)[0]
+    future = pd.date_range(series[date_col].iloc[-1], periods=periods + 1, freq=freq)[1:]
+    return pd.concat([
+        series.assign(type="actual"),
+        pd.DataFrame({date_col: future, target_col: yhat, "type": "forecast"}),
+    ], ignore_index=True)
+
+
+def op_kpis(df: pd.DataFrame, body: dict) -> list:
+    mapping = body.get("mapping")
+    if mapping is None and not body.get("kpis"):
+        with open(MAPPING, "r") as f:
+            mapping = yaml.safe_load(f) or {}
+    kpis = body.get("kpis") or (mapping or {}).get("kpis", [])
+    if mapping:
+        return evaluate_kpis(kpis, apply_mapping(df, mapping), aliases=source_aliases(mapping, df.columns),
+                             fallback=df)
+    return evaluate_kpis(kpis, df)
+
+
+def _arrow_table(df: pd.DataFrame) -> pa.Table:
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        mixed = {c: str for c in df.columns if df[c].dtype == object}
+        return pa.Table.from_pandas(df.astype(mixed), preserve_index=False)
+
+
+def _json_default(o):
+    if hasattr(o, "isoformat"):
+        return o.isoformat()
+    if hasattr(o, "item"):
+        return o.item()
+    return str(o)
+
+
+# ---------- Handlers ----------
+
+def verified_user(request, token: str, now: float) -> str:
+    """
+    The user id of a request signed with api_client.signature over its method,
+    path (with query) and body; raises HTTPError 401 otherwise.
+    """
+    headers = request.headers
+    uid = urllib.parse.unquote(headers.get(api_client.USER_HEADER, ""))
+    timestamp = headers.get(api_client.TIME_HEADER, "")
+    given = headers.get(api_client.SIGNATURE_HEADER, "")
+    if not uid or not timestamp.isdigit() or not given:
+        raise tornado.web.HTTPError(401, "Unsigned request")
+    if abs(now - int(timestamp)) > api_client.MAX_SKEW_S:
+        raise tornado.web.HTTPError(401, "Request signature expired")
+    expected = api_client.signature(token, uid, timestamp, request.method, request.uri, request.body or b"")
+    if not hmac.compare_digest(given, expected):
+        raise tornado.web.HTTPError(401, "Bad signature")
+    return uid
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    def prepare(self):
+        self._user_id = verified_user(self.request, TOKEN or "", time.time())
+
+    @property
+    def user_id(self) -> str:
+        return self._user_id
+
+    def body(self) -> dict:
+        try:
+            return json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise tornado.web.HTTPError(400, "Body must be JSON")
+
+    def upload(self, upload_id: str) -> dict:
+        up = db.get_upload(int(upload_id))
+        if not up or str(up["user_id"]) != self.user_id:
+            raise tornado.web.HTTPError(404, "No such upload")
+        return up
+
+    async def run(self, fn, *args):
+        """fn(*args) on the thread pool; admission refusals become 503, bad input 400."""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+        except admission.AdmissionRefused as e:
+            self.set_header("Retry-After", "5")
+            raise tornado.web.HTTPError(503, "%s", str(e))
+        except (KeyError, ValueError, TypeError) as e:
+            raise tornado.web.HTTPError(400, "%s", f"{type(e).__name__}: {e}")
+
+    def write_json(self, obj: Any) -> None:
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(obj, default=_json_default))
+
+    async def write_arrow(self, df: pd.DataFrame) -> None:
+        """Arrow IPC stream, flushed batch by batch."""
+        table = _arrow_table(df)
+        self.set_header("Content-Type", ARROW_STREAM)
+        self.set_header("X-Rows", str(table.num_rows))
+        buf = io.BytesIO()
+
+        async def _drain():
+            data = buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            if data:
+                self.write(data)
+                await self.flush()
+
+        with pa.ipc.new_stream(buf, table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=BATCH_ROWS):
+                writer.write_batch(batch)
+                await _drain()
+        await _drain()  # end-of-stream marker
+        self.finish()
+
+    def write_error(self, status_code: int, **kwargs) -> None:
+        exc = kwargs.get("exc_info", (None, None, None))[1]
+        if isinstance(exc, tornado.web.HTTPError) and exc.log_message:
+            message = exc.log_message % exc.args if exc.args else exc.log_message
+        else:
+            message = self._reason
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps({"status": status_code, "error": message}))
+
+    def _frame_op(self, upload_id: str, op):
+        up, uid, body = self.upload(upload_id), self.user_id, self.body()
+
+        def _work():
+            df = load_frame(up, uid)
+            with admission.admit(op.__name__[3:], user=uid):
+                return op(df, body)
+        return _work
+
+
+class HealthHandler(BaseHandler):
+    def prepare(self):
+        pass
+
+    def get(self):
+        self.write_json({"ok": True, "warm_datasets": len(_frames)})
+
+
+class UploadsHandler(BaseHandler):
+    async def get(self):
+        self.write_json(await self.run(db.list_uploads_for_user, self.user_id))
+
+
+class ProfileHandler(BaseHandler):
+    async def get(self, upload_id: str):
+        up, uid = self.upload(upload_id), self.user_id
+        self.write_json(await self.run(lambda: op_profile(load_frame(up, uid))))
+
+
+class ColumnsHandler(BaseHandler):
+    async def get(self, upload_id: str):
+        up, uid = self.upload(upload_id), self.user_id
+        self.write_json(await self.run(lambda: op_columns(load_frame(up, uid), up)))
+
+
+class FrameHandler(BaseHandler):
+    """POST → DataFrame → Arrow stream (or JSON for the document operations)."""
+    ops = {"aggregate": op_aggregate, "timeseries": op_timeseries, "forecast": op_forecast,
+           "pivot": op_pivot, "series": op_series}
+    json_ops = {"kpis": op_kpis, "totals": op_totals, "values": op_values, "sketch": op_sketch}
+
+    async def post(self, upload_id: str, name: str):
+        if name in self.json_ops:
+            self.write_json(await self.run(self._frame_op(upload_id, self.json_ops[name])))
+            return
+        if name not in self.ops:
+            raise tornado.web.HTTPError(404, "%s", f"Unknown operation: {name}")
+        await self.write_arrow(await self.run(self._frame_op(upload_id, self.ops[name])))
+
+
+class MetricsHandler(BaseHandler):
+    def prepare(self):
+        # scrapers cannot sign requests; the plain token is accepted here only
+        if not hmac.compare_digest(self.request.headers.get("Authorization", ""), f"Bearer {TOKEN or ''}") \
+                or not TOKEN:
+            raise tornado.web.HTTPError(401, "Bearer token required")
+
+    def get(self):
+        stats = admission.stats()
+        lines = [f"luminaiq_admission_{k} {v:g}\n" for k, v in stats.items() if isinstance(v, (int, float))]
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.finish(memtrack.counters_text() + "".join(lines))
+
+
+def make_app() -> tornado.web.Application:
+    return tornado.web.Application([
+        (r"/health", HealthHandler),
+        (r"/uploads", UploadsHandler),
+        (r"/uploads/(\d+)/profile", ProfileHandler),
+        (r"/uploads/(\d+)/columns", ColumnsHandler),
+        (r"/uploads/(\d+)/(aggregate|timeseries|forecast|kpis|totals|values|sketch|pivot|series)", FrameHandler),
+        (r"/metrics", MetricsHandler),
+    ])
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="LuminaIQ analytics API")
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    args = ap.parse_args(argv)
+    if not TOKEN:
+        ap.error("LUMINAIQ_API_TOKEN must be set (the secret the pages sign their requests with)")
+    db.init_db()
+    make_app().listen(args.port, address=args.host)
+    print(f"LuminaIQ analytics API on http://{args.host}:{args.port}")
+    tornado.ioloop.IOLoop.current().start()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,12 +1,10 @@
 # app.py
-import os
-import importlib.util
-import importlib.metadata as md
-import pkg_resources
 import streamlit as st
 
-from db import init_db
-from auth import verify_credentials, ensure_default_admin
+from auth import verify_credentials
+from bootstrap import bootstrap, render_diagnostics
+from profiler import start_run, render_panel
+import warmup
 
 # ---------------------------------------------------------------------
 # MUST be the first Streamlit call
@@ -30,34 +28,9 @@ section[data-testid="stSidebar"] {width: 290px !important;}
 """, unsafe_allow_html=True)
 
 
-# Optional diagnostics (AFTER set_page_config)
-try:
-    if importlib.util.find_spec("supabase"):
-        st.sidebar.success(f"Supabase present: {md.version('supabase')}")
-    else:
-        st.sidebar.warning("Supabase missing")
-except Exception as e:
-    st.sidebar.warning(f"Diag error: {e}")
-
-# (Optional) list installed packages (can remove if too noisy)
-try:
-    packages = sorted([f"{p.project_name}=={p.version}" for p in pkg_resources.working_set])
-    st.sidebar.write("Installed packages:", packages)
-except Exception:
-    pass
-
-# (Optional) quick dependency checks
-try:
-    import plotly  # noqa: F401
-    import plotly.express as px  # noqa: F401
-    import pandas as _pd  # noqa: F401
-    st.sidebar.info(f"Plotly available: {md.version('plotly')}")
-except Exception as e:
-    st.error(f"Dependency import failed: {type(e).__name__}: {e}")
-
-# Initialize DB and default admin
-init_db()
-created_admin = ensure_default_admin()
+# Schema + default admin: once per server process (cached), not on every rerun
+boot = bootstrap()
+created_admin = boot["created_admin"]
 
 # State bootstrap
 if "user" not in st.session_state:
@@ -113,11 +86,19 @@ def topbar():
         st.page_link("pages/3_Dashboard.py", label="📊 Dashboards")
         st.page_link("pages/4_Predictive_Forecasting.py", label="🔮 Predictive Forecasting")
         st.page_link("pages/6_Client_Template.py", label="🧩 Client Template")
+        if (st.session_state.user or {}).get("role") == "admin":
+            st.page_link("pages/5_Admin.py", label="🛠️ Admin tools")
+        st.divider()
+        # environment diagnostics are computed only when asked for
+        if st.toggle("Show diagnostics", key="show_diagnostics"):
+            render_diagnostics(st.sidebar)
 
 # ---------------- Router ----------------
 if st.session_state.user is None:
     login_form()
 else:
+    start_run("Home")
+    warmup.start()  # after sign-in only: the login page stays free of heavy imports
     topbar()
     st.title("🏠 Home")
     if created_admin:
@@ -131,3 +112,4 @@ else:
         - Map any client CSV using the Client Template page.
         """
     )
+    render_panel()
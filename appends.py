@@ -0,0 +1,338 @@
+# appends.py — append-only updates of a stored dataset
+#
+# A delta extract (e.g. yesterday's rows) is validated against the upload's
+# stored schema and written to the end of the stored CSV; nothing already
+# stored is read or rewritten. The artifacts kept for the upload in
+# dataset_artifacts are merged with the delta's own instead of recomputed:
+#   schema   column order and kinds (number / datetime / text)
+#   profile  rows plus per-column count, nulls, sum, min, max
+#   parts    byte offset and row count of the initial upload and every append,
+#            so a reader holding an earlier version reads only what came after
+#   sketches sketches.py summaries of the text columns (distinct count, top
+#            values) and numeric columns (quantile digest)
+#   preview  first PREVIEW_ROWS rows, column kinds and per-numeric-column
+#            histograms binned from the sketches, for the Overview page
+# Loader caches are keyed by the row count (datasets.dataset_key), so an
+# append is picked up at once. Refresh cost scales with the delta, not with
+# the history.
+from __future__ import annotations
+
+import io
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import db
+import sketches
+from analytics import DATE_HINTS
+
+PREVIEW_ROWS = 10
+PREVIEW_BINS = 30
+
+_append_lock = threading.Lock()
+
+
+class SchemaMismatch(ValueError):
+    """The delta does not match the stored schema; .problems lists why."""
+
+    def __init__(self, problems: List[str]):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat(timespec="seconds") + "Z"
+
+
+# ---------- Schema ----------
+
+def _parses_as_dates(s: pd.Series) -> bool:
+    values = s.dropna()
+    if values.empty:
+        return False
+    return bool(pd.to_datetime(values.head(1000).astype(str), errors="coerce", format="mixed").notna().all())
+
+
+def infer_schema(df: pd.DataFrame) -> dict:
+    """Column order and kind: number, datetime (by name, as analytics.coerce_date_columns) or text."""
+    types = {}
+    for c in df.columns:
+        s = df[c]
+        if pd.api.types.is_bool_dtype(s):
+            types[c] = "text"
+        elif pd.api.types.is_numeric_dtype(s):
+            types[c] = "number"
+        elif pd.api.types.is_datetime64_any_dtype(s) or (
+            any(k in str(c).lower() for k in DATE_HINTS) and _parses_as_dates(s)
+        ):
+            types[c] = "datetime"
+        else:
+            types[c] = "text"
+    return {"columns": [str(c) for c in df.columns], "types": types}
+
+
+def validate(delta: pd.DataFrame, schema: dict) -> Tuple[Optional[pd.DataFrame], List[str]]:
+    """(delta with the stored column order, []) or (None, problems)."""
+    columns = schema["columns"]
+    problems = []
+    missing = [c for c in columns if c not in delta.columns]
+    extra = [str(c) for c in delta.columns if c not in columns]
+    if missing:
+        problems.append(f"Missing column(s): {', '.join(missing)}")
+    if extra:
+        problems.append(f"Unexpected column(s): {', '.join(extra)}")
+    if problems:
+        return None, problems
+
+    aligned = delta[columns]
+    for c, kind in schema["types"].items():
+        s = aligned[c]
+        if kind == "number":
+            parsed = pd.to_numeric(s, errors="coerce")
+        elif kind == "datetime":
+            parsed = pd.to_datetime(s.astype(str).where(s.notna()), errors="coerce", format="mixed")
+        else:
+            continue
+        bad = s.notna() & parsed.isna()
+        if bad.any():
+            problems.append(f"{c}: {int(bad.sum()):,} value(s) are not {'numbers' if kind == 'number' else 'dates'} "
+                            f"(e.g. {s[bad].iloc[0]!r})")
+    return (None, problems) if problems else (aligned, [])
+
+
+# ---------- Profile (mergeable) ----------
+
+def profile(df: pd.DataFrame, schema: dict) -> dict:
+    out = {"rows": int(len(df)), "columns": {}}
+    for c, kind in schema["types"].items():
+        s = df[c]
+        col = {"count": int(s.notna().sum()), "nulls": int(s.isna().sum())}
+        if kind == "number":
+            v = pd.to_numeric(s, errors="coerce").dropna()
+            col.update(sum=float(v.sum()), min=float(v.min()) if len(v) else None,
+                       max=float(v.max()) if len(v) else None)
+        elif kind == "datetime":
+            v = pd.to_datetime(s.astype(str).where(s.notna()), errors="coerce", format="mixed").dropna()
+            col.update(min=v.min().isoformat() if len(v) else None, max=v.max().isoformat() if len(v) else None)
+        out["columns"][c] = col
+    return out
+
+
+def _pick(a, b, fn, kind):
+    if a is None or b is None:
+        return a if b is None else b
+    if kind == "datetime":
+        return fn(pd.Timestamp(a), pd.Timestamp(b)).isoformat()
+    return fn(a, b)
+
+
+def merge_profiles(a: dict, b: dict, schema: dict) -> dict:
+    """Profile of the concatenation of the two frames the profiles describe."""
+    out = {"rows": a["rows"] + b["rows"], "columns": {}}
+    for c, kind in schema["types"].items():
+        x, y = a["columns"][c], b["columns"][c]
+        col = {"count": x["count"] + y["count"], "nulls": x["nulls"] + y["nulls"]}
+        if "sum" in x:
+            col["sum"] = x["sum"] + y["sum"]
+        if "min" in x:
+            col["min"] = _pick(x["min"], y["min"], min, kind)
+            col["max"] = _pick(x["max"], y["max"], max, kind)
+        out["columns"][c] = col
+    return out
+
+
+# ---------- Artifacts ----------
+
+def _load(upload_id: int, name: str):
+    raw = db.get_artifact(upload_id, name)
+    return json.loads(raw) if raw else None
+
+
+def _save(upload_id: int, name: str, payload) -> None:
+    db.save_artifact(upload_id, name, json.dumps(payload), _now())
+
+
+def record_upload(upload_id: int, df: pd.DataFrame, nbytes: int) -> dict:
+    """Artifacts of a new upload, from the frame already parsed for it."""
+    schema = infer_schema(df)
+    _save(upload_id, "schema", schema)
+    _save(upload_id, "profile", profile(df, schema))
+    _save(upload_id, "parts", [{"offset": 0, "rows": int(len(df)), "bytes": int(nbytes), "at": _now()}])
+    col_sketches = _sketch(df, schema)
+    _save(upload_id, "sketches", sketches.to_json(col_sketches))
+    _save(upload_id, "preview", _preview(df.head(PREVIEW_ROWS), schema, col_sketches))
+    return schema
+
+
+def _sketch(df: pd.DataFrame, schema: dict, columns: Optional[List[str]] = None) -> Dict[str, dict]:
+    """Sketches of the text and number columns, typed by the schema rather than by how df parsed."""
+    out = {}
+    for c in schema["columns"] if columns is None else columns:
+        kind = schema["types"][c]
+        if kind == "number":
+            out[c] = sketches.sketch_column(pd.to_numeric(df[c], errors="coerce"))
+        elif kind == "text":
+            out[c] = sketches.sketch_column(df[c].astype(object))
+    return out
+
+
+def _sketched(schema: dict) -> List[str]:
+    return [c for c in schema["columns"] if schema["types"][c] in ("number", "text")]
+
+
+def column_sketches(upload: dict) -> Dict[str, dict]:
+    """
+    sketches.py sketches of the upload's columns. Columns without a stored
+    sketch (uploads from before a sketch kind existed) are built once and stored.
+    """
+    schema = artifacts(upload)["schema"]  # a backfill stores sketches too
+    stored = sketches.from_json(_load(upload["id"], "sketches") or {})
+    missing = [c for c in _sketched(schema) if c not in stored]
+    if not missing:
+        return stored
+    with _append_lock:
+        stored.update(_sketch(pd.read_csv(upload["path"], usecols=missing), schema, missing))
+        _save(upload["id"], "sketches", sketches.to_json(stored))
+    return stored
+
+
+def _histograms(schema: dict, col_sketches: Dict[str, dict]) -> Dict[str, dict]:
+    out = {}
+    for c in schema["columns"]:
+        sk = col_sketches.get(c)
+        if schema["types"][c] == "number" and sk is not None and sk["min"] is not None:
+            out[c] = sketches.histogram(sk, bins=PREVIEW_BINS).to_dict(orient="list")
+    return out
+
+
+def _preview(head: pd.DataFrame, schema: dict, col_sketches: Dict[str, dict]) -> dict:
+    return {
+        "head": json.loads(head.to_json(orient="split", index=False, date_format="iso", default_handler=str)),
+        "types": schema["types"],
+        "histograms": _histograms(schema, col_sketches),
+    }
+
+
+def preview(upload: dict) -> Optional[dict]:
+    """
+    Stored preview of an upload — {"head": DataFrame, "types": {column: kind},
+    "histograms": {column: DataFrame(from, to, rows)}} — or None if it has none
+    yet (see build_preview). Reads nothing but the artifact.
+    """
+    snap = _load(upload["id"], "preview")
+    if snap is None:
+        return None
+    return {
+        "head": pd.DataFrame(snap["head"]["data"], columns=snap["head"]["columns"]),
+        "types": snap["types"],
+        "histograms": {c: pd.DataFrame(h) for c, h in snap["histograms"].items()},
+    }
+
+
+def build_preview(upload: dict) -> dict:
+    """Build and store the preview of an upload made before previews existed (reads it once)."""
+    schema = artifacts(upload)["schema"]  # a backfill stores the preview too
+    if _load(upload["id"], "preview") is None:
+        head = pd.read_csv(upload["path"], nrows=PREVIEW_ROWS)
+        _save(upload["id"], "preview", _preview(head, schema, column_sketches(upload)))
+    return preview(upload)
+
+
+def artifacts(upload: dict) -> Dict[str, object]:
+    """schema / profile / parts of an upload; uploads made before artifacts existed are backfilled once."""
+    out = {name: _load(upload["id"], name) for name in ("schema", "profile", "parts")}
+    if out["schema"] is None:
+        df = pd.read_csv(upload["path"])
+        nbytes = os.path.getsize(upload["path"]) if os.path.isfile(upload["path"]) else 0
+        record_upload(upload["id"], df, nbytes)
+        out = {name: _load(upload["id"], name) for name in ("schema", "profile", "parts")}
+    return out
+
+
+# ---------- Append / read back ----------
+
+def append_rows(upload: dict, delta: pd.DataFrame, digest: Optional[str] = None) -> dict:
+    """
+    Validate `delta` against the stored schema and append it to the upload's
+    CSV. Raises SchemaMismatch, or ValueError for datasets that are not stored
+    as a local file, that share their file with another upload record, or
+    when a part with the same `digest` (of the delta file) was appended
+    before. Returns {rows, total_rows, bytes}.
+    """
+    path = upload["path"]
+    if not os.path.isfile(path):
+        raise ValueError("Only datasets stored on this server can be appended to; upload the full file instead.")
+    if any(i != upload["id"] for i in db.upload_ids_for_path(path)):
+        # the other record's parts, profile and cached frames would go stale
+        raise ValueError("This file is shared with another upload; upload the full file again as a new dataset "
+                         "and append to that one.")
+    with _append_lock:
+        art = artifacts(upload)
+        schema = art["schema"]
+        dup = next((p for p in art["parts"] if digest and p.get("digest") == digest), None)
+        if dup:
+            raise ValueError(f"This file was already appended on {dup['at']}.")
+        aligned, problems = validate(delta, schema)
+        if problems:
+            raise SchemaMismatch(problems)
+        if aligned.empty:
+            return {"rows": 0, "total_rows": art["profile"]["rows"], "bytes": 0}
+
+        offset = os.path.getsize(path)
+        needs_newline = False
+        if offset:
+            with open(path, "rb") as f:
+                f.seek(offset - 1)
+                needs_newline = f.read(1) != b"\n"
+        payload = aligned.to_csv(header=False, index=False).encode("utf-8")
+        with open(path, "ab") as f:
+            if needs_newline:
+                f.write(b"\n")
+                offset += 1
+            f.write(payload)
+
+        parts = art["parts"] + [{"offset": offset, "rows": int(len(aligned)), "bytes": len(payload), "at": _now(),
+                                 "digest": digest}]
+        merged = merge_profiles(art["profile"], profile(aligned, schema), schema)
+        _save(upload["id"], "parts", parts)
+        _save(upload["id"], "profile", merged)
+        stored = sketches.from_json(_load(upload["id"], "sketches") or {})
+        if stored:
+            # merge what is stored; columns not sketched yet are built from the whole file on next use
+            delta = _sketch(aligned, schema, [c for c in _sketched(schema) if c in stored])
+            stored = sketches.merge_frames(stored, delta)
+            _save(upload["id"], "sketches", sketches.to_json(stored))
+            snap = _load(upload["id"], "preview")
+            if snap is not None:  # the first rows don't change; the histograms follow the data
+                snap["histograms"] = _histograms(schema, stored)
+                _save(upload["id"], "preview", snap)
+        db.set_upload_rows(upload["id"], merged["rows"])
+    return {"rows": int(len(aligned)), "total_rows": merged["rows"], "bytes": len(payload)}
+
+
+def read_since(upload: dict, rows_known: int) -> Optional[pd.DataFrame]:
+    """
+    Rows appended after the first `rows_known` rows, read from the byte offset
+    of the next part (None when rows_known is not a part boundary, or when the
+    file is no longer the one the parts describe).
+    """
+    parts, schema = _load(upload["id"], "parts"), _load(upload["id"], "schema")
+    if not parts or not schema:
+        return None
+    end = parts[-1]["offset"] + parts[-1]["bytes"]
+    if not os.path.isfile(upload["path"]) or os.path.getsize(upload["path"]) != end:
+        return None  # rewritten or appended to outside append_rows: offsets cannot be trusted
+    seen = 0
+    for part in parts:
+        if seen == rows_known:
+            with open(upload["path"], "rb") as f:
+                f.seek(part["offset"])
+                data = f.read()
+            # the first part starts with the header line
+            return pd.read_csv(io.BytesIO(data), header=0 if part["offset"] == 0 else None, names=schema["columns"])
+        seen += part["rows"]
+    return pd.DataFrame(columns=schema["columns"]) if seen == rows_known else None
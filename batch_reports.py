@@ -0,0 +1,182 @@
+# batch_reports.py — headless month-end client reports (no Streamlit)
+#
+# Usage:
+#   python batch_reports.py clients/ --out reports/2024-06 --workers 8
+#
+# Every <name>.csv in the input directory is one client. Its mapping is
+# <name>.yaml / <name>.yml next to it, merged over the default mapping
+# (config/client_config.yaml), exactly like the Client Template page.
+# Per client the runner writes kpis / timeseries / breakdown as Parquet
+# (CSV when pyarrow is unavailable) into <out>/<name>/, plus a summary of
+# all clients with per-stage timings in <out>/summary.csv and summary.json.
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+import pandas as pd
+import yaml
+
+import client_data
+from kpi_engine import evaluate_kpis
+
+DEFAULT_MAPPING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "client_config.yaml")
+
+
+def _has_parquet() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+def _load_yaml(path: str) -> dict:
+    with open(path, "r") as f:
+        return yaml.safe_load(f) or {}
+
+
+def _find_mapping(csv_path: str) -> Optional[str]:
+    stem, _ = os.path.splitext(csv_path)
+    for ext in (".yaml", ".yml"):
+        if os.path.exists(stem + ext):
+            return stem + ext
+    return None
+
+
+def _write(df: pd.DataFrame, path_no_ext: str, fmt: str) -> str:
+    if fmt == "parquet":
+        path = path_no_ext + ".parquet"
+        df.to_parquet(path, index=False)
+    else:
+        path = path_no_ext + ".csv"
+        df.to_csv(path, index=False)
+    return path
+
+
+def run_client(csv_path: str, default_mapping: dict, out_dir: str, fmt: str) -> dict:
+    """Build one client's report. Runs in a worker process; never raises."""
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    res = {"client": name, "csv": csv_path, "status": "ok", "error": "", "pid": os.getpid(), "rows": 0}
+    timings = {}
+    t_start = time.perf_counter()
+
+    def _stage(label, t0):
+        timings[label] = round(time.perf_counter() - t0, 4)
+        return time.perf_counter()
+
+    try:
+        t = time.perf_counter()
+        mapping = dict(default_mapping)
+        map_path = _find_mapping(csv_path)
+        if map_path:
+            mapping.update(_load_yaml(map_path))
+        res["mapping"] = map_path or "default"
+        with open(csv_path, "rb") as f:
+            raw = client_data.read_client_csv(f.read())
+        res["rows"] = int(len(raw))
+        t = _stage("read_s", t)
+
+        cdf = client_data.apply_mapping(raw, mapping)
+        fields = client_data.chart_fields(mapping, raw.columns)
+        t = _stage("map_s", t)
+
+        kpis = pd.DataFrame(evaluate_kpis(
+            mapping.get("kpis", []) or [], cdf,
+            aliases=client_data.source_aliases(mapping, raw.columns), fallback=raw,
+        ), columns=["id", "label", "value", "error"])
+        t = _stage("kpis_s", t)
+
+        ts = None
+        if fields["date"] and fields["value"]:
+            ts = client_data.time_series(cdf, fields["value"], fields["date"])
+        t = _stage("timeseries_s", t)
+
+        bd = None
+        if fields["category"] and fields["break_value"]:
+            bd = client_data.breakdown(cdf, fields["category"], fields["break_value"])
+            bd[fields["category"]] = bd[fields["category"]].astype("string")
+        t = _stage("breakdown_s", t)
+
+        client_dir = os.path.join(out_dir, name)
+        os.makedirs(client_dir, exist_ok=True)
+        _write(kpis, os.path.join(client_dir, "kpis"), fmt)
+        if ts is not None:
+            _write(ts, os.path.join(client_dir, "timeseries"), fmt)
+        if bd is not None:
+            _write(bd, os.path.join(client_dir, "breakdown"), fmt)
+        _stage("write_s", t)
+
+        bad = kpis[kpis["error"].notna()]
+        if len(bad):
+            res["status"] = "partial"
+            res["error"] = "; ".join(f"{r.id}: {r.error}" for r in bad.itertuples())
+    except Exception as e:
+        res["status"] = "failed"
+        res["error"] = f"{type(e).__name__}: {e}"
+
+    res.update(timings)
+    res["total_s"] = round(time.perf_counter() - t_start, 4)
+    return res
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Build client KPI/time-series/breakdown reports in a process pool.")
+    ap.add_argument("input_dir", help="directory of client CSVs (+ optional <name>.yaml mappings)")
+    ap.add_argument("--out", default="reports", help="output directory (default: reports)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    ap.add_argument("--mapping", default=DEFAULT_MAPPING, help="default mapping YAML")
+    ap.add_argument("--format", choices=["auto", "parquet", "csv"], default="auto")
+    args = ap.parse_args(argv)
+
+    fmt = args.format
+    if fmt == "auto":
+        fmt = "parquet" if _has_parquet() else "csv"
+    elif fmt == "parquet" and not _has_parquet():
+        print("pyarrow is not installed; use --format csv", file=sys.stderr)
+        return 2
+
+    csvs = sorted(
+        os.path.join(args.input_dir, f) for f in os.listdir(args.input_dir) if f.lower().endswith(".csv")
+    )
+    if not csvs:
+        print(f"No CSV files in {args.input_dir}", file=sys.stderr)
+        return 1
+    default_mapping = _load_yaml(args.mapping) if os.path.exists(args.mapping) else {}
+    os.makedirs(args.out, exist_ok=True)
+
+    t0 = time.perf_counter()
+    results = []
+    workers = max(1, args.workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_client, p, default_mapping, args.out, fmt) for p in csvs]
+        for i, fut in enumerate(as_completed(futures), 1):
+            r = fut.result()
+            results.append(r)
+            print(f"[{i}/{len(csvs)}] {r['client']}: {r['status']} · {r['rows']:,} rows · {r['total_s']:.2f}s"
+                  + (f" · {r['error']}" if r["error"] else ""))
+    wall = time.perf_counter() - t0
+
+    summary = pd.DataFrame(results).sort_values("client")
+    summary.to_csv(os.path.join(args.out, "summary.csv"), index=False)
+    with open(os.path.join(args.out, "summary.json"), "w") as f:
+        json.dump({
+            "workers": workers,
+            "format": fmt,
+            "clients": len(results),
+            "failed": int((summary["status"] == "failed").sum()),
+            "wall_s": round(wall, 3),
+            "cpu_s": round(float(summary["total_s"].sum()), 3),
+            "results": summary.to_dict(orient="records"),
+        }, f, indent=2, default=str)
+    print(f"Done: {len(results)} clients in {wall:.2f}s with {workers} workers → {args.out}")
+    return 1 if (summary["status"] == "failed").any() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
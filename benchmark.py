@@ -0,0 +1,265 @@
+# benchmark.py — reproducible timings of the core data operations (no Streamlit)
+#
+# Usage:
+#   python benchmark.py                              # 100k and 1M rows
+#   python benchmark.py --sizes 100k 1m 10m --repeat 5
+#   python benchmark.py --products 5000 --regions 40 # tune cardinalities
+#   python benchmark.py --compare bench_results/a.json bench_results/b.json
+#
+# Synthetic datasets scale the schema of templates/client_demo_retail.csv
+# (date, order_id, region, category, product, quantity, revenue, cost, margin).
+# They are generated from a fixed seed and cached as CSV under bench_data/, so
+# every run (and every machine) times the same bytes. Results go to
+# bench_results/<timestamp>.json together with the environment they ran in.
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import yaml
+
+import analytics
+import rolling
+from forecasting import init_state
+from kpi_engine import evaluate_kpis
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(ROOT, "bench_data")
+RESULTS_DIR = os.path.join(ROOT, "bench_results")
+MAPPING = os.path.join(ROOT, "config", "client_config.yaml")
+
+OPERATIONS = (
+    "csv_load", "date_coercion", "filters", "breakdown", "timeseries", "forecast_fit", "kpi_eval", "zip_export",
+    "rolling", "pivot",
+)
+
+_REGIONS = ["Johannesburg", "Cape Town", "Durban", "Pretoria", "Gqeberha", "Bloemfontein", "Polokwane", "Nelspruit"]
+_CATEGORIES = ["Electronics", "Home", "Groceries", "Clothing", "Beauty", "Sports", "Toys", "Books"]
+
+
+# ---------- Synthetic data ----------
+
+def parse_size(text: str) -> int:
+    t = text.strip().lower().replace("_", "")
+    mult = {"k": 1_000, "m": 1_000_000}.get(t[-1:], 1)
+    return int(float(t[:-1] if mult > 1 else t) * mult)
+
+
+def _names(base: List[str], n: int, prefix: str) -> np.ndarray:
+    return np.array(base[:n] + [f"{prefix} {i + 1}" for i in range(max(0, n - len(base)))], dtype=object)
+
+
+def generate_retail(
+    rows: int,
+    *,
+    seed: int = 42,
+    days: int = 730,
+    regions: int = 8,
+    categories: int = 6,
+    products: int = 120,
+    items_per_order: float = 1.5,
+    start: str = "2023-01-01",
+) -> pd.DataFrame:
+    """
+    Retail transactions in the demo schema. Cardinalities are tunable: `products`
+    is spread over `categories`, and order_id has about rows / items_per_order
+    distinct values. Rows are sorted by date, as exports usually are.
+    """
+    rng = np.random.default_rng(seed)
+    day = np.sort(rng.integers(0, days, rows))
+    dates = pd.Timestamp(start) + pd.to_timedelta(day, unit="D")
+
+    region = _names(_REGIONS, regions, "Region")[rng.integers(0, regions, rows)]
+    prod_idx = rng.zipf(1.3, rows) % products  # a few best sellers, long tail
+    prod_cat = rng.integers(0, categories, products)
+    cat_names = _names(_CATEGORIES, categories, "Category")
+    category = cat_names[prod_cat[prod_idx]]
+    product = np.array([f"Product {i + 1}" for i in range(products)], dtype=object)[prod_idx]
+
+    unit_price = np.round(rng.lognormal(6.5, 1.3, products), 2)
+    quantity = rng.integers(1, 6, rows)
+    revenue = np.round(quantity * unit_price[prod_idx] * rng.uniform(0.9, 1.1, rows), 2)
+    cost = np.round(revenue * rng.uniform(0.55, 0.85, rows), 2)
+
+    order_no = (np.arange(rows) / max(items_per_order, 1.0)).astype(np.int64)
+    order_id = "ORD-" + pd.Series(dates.strftime("%Y%m%d")) + "-" + pd.Series(order_no).astype(str)
+
+    return pd.DataFrame({
+        "date": dates.strftime("%Y-%m-%d"),
+        "order_id": order_id.to_numpy(),
+        "region": region,
+        "category": category,
+        "product": product,
+        "quantity": quantity,
+        "revenue": revenue,
+        "cost": cost,
+        "margin": np.round(revenue - cost, 2),
+    })
+
+
+def dataset_path(rows: int, params: dict) -> str:
+    """Cached CSV for (rows, params); generated on first use."""
+    key = hashlib.sha1(json.dumps({"rows": rows, **params}, sort_keys=True).encode()).hexdigest()[:10]
+    path = os.path.join(DATA_DIR, f"retail_{rows}_{key}.csv")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        t0 = time.perf_counter()
+        generate_retail(rows, **params).to_csv(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+        print(f"  generated {os.path.basename(path)} in {time.perf_counter() - t0:.1f}s")
+    return path
+
+
+# ---------- Operations ----------
+
+def _time(fn: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None) -> List[float]:
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return runs
+
+
+def run_size(rows: int, params: dict, repeat: int, only: Optional[List[str]] = None) -> List[dict]:
+    path = dataset_path(rows, params)
+    with open(MAPPING, "r") as f:
+        kpis = (yaml.safe_load(f) or {}).get("kpis", [])
+
+    raw = pd.read_csv(path)
+    df = analytics.coerce_date_columns(raw.copy())
+    dmin, dmax = df["date"].min(), df["date"].max()
+    span = dmax - dmin
+    regions = sorted(df["region"].unique())
+    filters = dict(
+        date_col="date", drange=(dmin + span * 0.25, dmin + span * 0.75),
+        cat_col="region", keep_vals=regions[: max(1, len(regions) // 2)],
+        value_col="revenue", num_range=tuple(df["revenue"].quantile([0.1, 0.9])),
+    )
+    view = analytics.apply_filters(df, **filters)
+    daily = analytics.time_series(df, "date", "revenue")["revenue"].to_numpy()
+    product_daily = df.groupby(["product", "date"], as_index=False, observed=True)["revenue"].sum()
+
+    work = {}
+
+    def _fresh():
+        work["df"] = raw.copy()
+
+    ops: Dict[str, tuple] = {
+        "csv_load": (lambda: pd.read_csv(path), None),
+        "date_coercion": (lambda: analytics.coerce_date_columns(work["df"]), _fresh),
+        "filters": (lambda: analytics.apply_filters(df, **filters), None),
+        "breakdown": (lambda: analytics.category_breakdown(view, "product", "revenue"), None),
+        "timeseries": (lambda: analytics.time_series(view, "date", "revenue"), None),
+        "forecast_fit": (lambda: init_state(daily, "auto", m=7), None),
+        "kpi_eval": (lambda: evaluate_kpis(kpis, df), None),
+        "zip_export": (lambda: analytics.export_zip(view), None),
+        "rolling": (lambda: rolling.frame(product_daily, "date", "revenue", 28, by="product"), None),
+        "pivot": (lambda: analytics.pivot(df, "region", "category", "revenue"), None),
+    }
+    out = []
+    for name in OPERATIONS:
+        if only and name not in only:
+            continue
+        fn, setup = ops[name]
+        runs = _time(fn, repeat, setup)
+        out.append({
+            "rows": rows, "op": name,
+            "min_s": round(min(runs), 5), "median_s": round(statistics.median(runs), 5),
+            "runs_s": [round(r, 5) for r in runs],
+        })
+        print(f"  {name:14s} min {min(runs) * 1000:10.1f} ms   median {statistics.median(runs) * 1000:10.1f} ms")
+    out.append({"rows": rows, "op": "_context", "filtered_rows": int(len(view)), "daily_points": int(len(daily)),
+                "product_daily_points": int(len(product_daily)),
+                "csv_mb": round(os.path.getsize(path) / 1e6, 1)})
+    return out
+
+
+# ---------- Results ----------
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit,
+    }
+
+
+def compare(path_a: str, path_b: str) -> int:
+    """Print B relative to A per (rows, op), on the min time."""
+    def _load(p):
+        with open(p) as f:
+            doc = json.load(f)
+        return {(r["rows"], r["op"]): r["min_s"] for r in doc["results"] if "min_s" in r}
+    a, b = _load(path_a), _load(path_b)
+    print(f"{'rows':>10s}  {'op':14s} {'A ms':>10s} {'B ms':>10s}  B/A")
+    for key in sorted(set(a) & set(b)):
+        ratio = b[key] / a[key] if a[key] else float("nan")
+        flag = "  slower" if ratio > 1.10 else ("  faster" if ratio < 0.90 else "")
+        print(f"{key[0]:>10,d}  {key[1]:14s} {a[key] * 1000:10.1f} {b[key] * 1000:10.1f}  {ratio:.2f}{flag}")
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark CSV load, filters, aggregations, forecast fit, KPIs and export.")
+    ap.add_argument("--sizes", nargs="*", default=["100k", "1m"], help="row counts, e.g. 100k 1m 10m")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--ops", nargs="*", choices=OPERATIONS, help="subset of operations")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--days", type=int, default=730, help="distinct dates")
+    ap.add_argument("--regions", type=int, default=8)
+    ap.add_argument("--categories", type=int, default=6)
+    ap.add_argument("--products", type=int, default=120)
+    ap.add_argument("--items-per-order", type=float, default=1.5)
+    ap.add_argument("--out", help="results file (default: bench_results/<timestamp>.json)")
+    ap.add_argument("--compare", nargs=2, metavar=("A", "B"), help="compare two results files and exit")
+    args = ap.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare)
+
+    params = dict(seed=args.seed, days=args.days, regions=args.regions, categories=args.categories,
+                  products=args.products, items_per_order=args.items_per_order)
+    results = []
+    for size in args.sizes:
+        rows = parse_size(size)
+        print(f"{rows:,} rows")
+        results.extend(run_size(rows, params, max(1, args.repeat), args.ops))
+
+    out = args.out or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "env": environment(),
+            "params": params,
+            "repeat": args.repeat,
+            "results": results,
+        }, f, indent=2)
+    print(f"Saved {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# bootstrap.py — one-time, per-process application setup
+#
+# Streamlit re-executes app.py on every interaction. Schema/admin setup and the
+# environment diagnostics only need to happen once per server process, so they
+# live here behind st.cache_resource and their results are kept.
+from __future__ import annotations
+
+import importlib.metadata as md
+import importlib.util
+import time
+from datetime import datetime
+from typing import Dict
+
+import streamlit as st
+
+from db import init_db
+from auth import ensure_default_admin
+
+
+def _timed(timings: Dict[str, float], label: str, fn):
+    t0 = time.perf_counter()
+    out = fn()
+    timings[label] = round((time.perf_counter() - t0) * 1000, 2)
+    return out
+
+
+@st.cache_resource(show_spinner=False)
+def bootstrap() -> dict:
+    """
+    Create the schema and the default admin once per process.
+    Returns {created_admin, started_at, timings_ms}.
+    """
+    timings: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    _timed(timings, "init_db", init_db)
+    created_admin = _timed(timings, "ensure_default_admin", ensure_default_admin)
+    timings["total"] = round((time.perf_counter() - t0) * 1000, 2)
+    return {
+        "created_admin": bool(created_admin),
+        "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "timings_ms": timings,
+    }
+
+
+def _version(dist: str):
+    try:
+        return md.version(dist)
+    except md.PackageNotFoundError:
+        return None
+
+
+@st.cache_resource(show_spinner=False)
+def diagnostics() -> dict:
+    """
+    Environment report (optional dependencies, installed packages), computed the
+    first time someone asks for it and then kept for the process. Uses package
+    metadata only — nothing heavy is imported.
+    """
+    timings: Dict[str, float] = {}
+    deps = _timed(timings, "dependencies", lambda: {
+        name: {"present": importlib.util.find_spec(module) is not None, "version": _version(name)}
+        for name, module in (("supabase", "supabase"), ("plotly", "plotly"), ("pandas", "pandas"))
+    })
+    packages = _timed(timings, "packages", lambda: sorted(
+        f"{d.metadata['Name']}=={d.version}" for d in md.distributions() if d.metadata["Name"]
+    ))
+    return {"dependencies": deps, "packages": packages, "timings_ms": timings}
+
+
+def render_diagnostics(container=None) -> None:
+    """Startup timings and the environment report (on demand)."""
+    c = container or st
+    boot = bootstrap()
+    c.caption(f"Process started {boot['started_at']} UTC")
+    c.write("Startup (ms):", boot["timings_ms"])
+    diag = diagnostics()
+    for name, info in diag["dependencies"].items():
+        if info["present"]:
+            c.success(f"{name} {info['version'] or ''}".strip())
+        else:
+            c.warning(f"{name} missing")
+    c.write("Diagnostics (ms):", diag["timings_ms"])
+    c.write("Installed packages:", diag["packages"])
@@ -0,0 +1,114 @@
+# client_data.py — apply a client column mapping to produce the canonical schema
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+from typing import Dict, Optional
+
+import pandas as pd
+
+# Canonical schema (keys of config/client_config.yaml)
+CANONICAL_FIELDS = ("date", "amount", "cost", "margin", "quantity", "category", "subcategory", "region")
+NUMERIC_FIELDS = ("amount", "cost", "margin", "quantity")
+CATEGORY_FIELDS = ("category", "subcategory", "region")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+def mapping_hash(mapping: dict) -> str:
+    """Stable hash of a mapping (key order does not matter)."""
+    blob = json.dumps(mapping or {}, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(blob).hexdigest()[:16]
+
+
+def read_client_csv(data: bytes) -> pd.DataFrame:
+    return pd.read_csv(io.BytesIO(data))
+
+
+def resolve_columns(mapping: dict, columns) -> Dict[str, str]:
+    """canonical field → source column, for mapped columns present in the data."""
+    cols = set(columns)
+    out = {}
+    for field in CANONICAL_FIELDS:
+        src = (mapping or {}).get(field)
+        if isinstance(src, str) and src in cols:
+            out[field] = src
+    return out
+
+
+def source_aliases(mapping: dict, columns) -> Dict[str, str]:
+    """source column → canonical field (lets formulas keep using client names)."""
+    return {src: field for field, src in resolve_columns(mapping, columns).items()}
+
+
+def resolve_field(mapping: dict, name: Optional[str], columns, default: str = "amount") -> Optional[str]:
+    """
+    Canonical field for a chart setting that may name either a canonical field
+    ("amount") or a client column ("revenue"). Falls back to `default`.
+    """
+    fields = resolve_columns(mapping, columns)
+    if name in fields:
+        return name
+    aliases = {src: f for f, src in fields.items()}
+    if name in aliases:
+        return aliases[name]
+    return default if default in fields else None
+
+
+def apply_mapping(df: pd.DataFrame, mapping: dict) -> pd.DataFrame:
+    """
+    Renamed, typed frame in the canonical schema: `date` as datetime64,
+    numeric fields as float64, categorical fields as pandas categoricals.
+    Unmapped fields are omitted.
+    """
+    fields = resolve_columns(mapping, df.columns)
+    out = {}
+    for field in CANONICAL_FIELDS:
+        src = fields.get(field)
+        if src is None:
+            continue
+        s = df[src]
+        if field == "date":
+            s = pd.to_datetime(s, errors="coerce")
+        elif field in NUMERIC_FIELDS:
+            s = pd.to_numeric(s, errors="coerce").astype("float64")
+        else:
+            s = s.astype("string").astype("category")
+        out[field] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+# ---------- Report building blocks (shared by the page and batch_reports.py) ----------
+
+def chart_fields(mapping: dict, columns) -> Dict[str, Optional[str]]:
+    """Canonical fields used by the time-series and breakdown charts of a mapping."""
+    charts = (mapping or {}).get("charts", {}) or {}
+    ts_cfg = charts.get("time_series") or {}
+    bd_cfg = charts.get("breakdown") or {}
+    fields = resolve_columns(mapping, columns)
+    return {
+        "date": "date" if "date" in fields else None,
+        "value": resolve_field(mapping, ts_cfg.get("metric") or "amount", columns),
+        "category": resolve_field(mapping, bd_cfg.get("by") or "category", columns, default="category"),
+        "break_value": resolve_field(mapping, bd_cfg.get("value") or "amount", columns),
+    }
+
+
+def time_series(cdf: pd.DataFrame, value_col: str, date_col: str = "date") -> pd.DataFrame:
+    """Sum of `value_col` per date, sorted."""
+    df_ts = cdf[[date_col, value_col]].dropna(subset=[date_col])
+    return df_ts.groupby(date_col, as_index=False)[value_col].sum().sort_values(date_col)
+
+
+def breakdown(cdf: pd.DataFrame, by: str, value_col: str, top: int = 20) -> pd.DataFrame:
+    """Top `top` groups of `by` by summed `value_col`."""
+    return (
+        cdf.groupby(by, dropna=False, observed=True)[value_col]
+           .sum()
+           .reset_index()
+           .sort_values(value_col, ascending=False)
+           .head(top)
+    )
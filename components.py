@@ -1,7 +1,10 @@
 # --- append to your existing components.py (or replace the file with this full version) ---
 
-import uuid
+import hashlib
+from collections import Counter
+from functools import lru_cache
 from html import escape
+import numpy as np
 import streamlit as st
 
 def kpi(label: str, value: str, delta: str | None = None) -> None:
@@ -14,104 +17,101 @@ def kpi(label: str, value: str, delta: str | None = None) -> None:
 # ==============================
 # base helpers & styles (same as before; keep or replace your previous block)
 # ==============================
+_KPI_CSS = """<style>
+.kpi-grid {
+  display: grid;
+  grid-template-columns: repeat(auto-fit, minmax(220px, 1fr));
+  gap: 12px;
+}
+.kpi-card {
+  border-radius: 14px;
+  padding: 14px 16px;
+  border: 1px solid var(--border-color, rgba(49, 51, 63, 0.2));
+  background: var(--bg-color, rgba(255,255,255,0.6));
+  box-shadow: 0 1px 1px rgba(0,0,0,0.04);
+}
+.kpi-compact { padding: 10px 14px; }
+@media (prefers-color-scheme: dark) {
+  .kpi-card {
+    --bg-color: rgba(255,255,255,0.05);
+    --border-color: rgba(250, 250, 250, 0.15);
+  }
+}
+.kpi-top {
+  display:flex; align-items:center; gap:8px; margin-bottom:6px;
+  color: var(--label-color, #6b7280); font-size: 0.80rem;
+}
+.kpi-icon {
+  width: 26px; height: 26px; border-radius: 8px;
+  display: inline-flex; align-items:center; justify-content:center;
+  font-size: 14px; font-weight: 600; color: white;
+}
+.kpi-value {
+  font-size: 1.45rem; line-height: 1.2; font-weight: 700;
+  letter-spacing: -0.01em;
+}
+.kpi-row {
+  display:flex; align-items: baseline; justify-content: space-between; gap: 8px;
+}
+.kpi-delta { font-size: 0.95rem; font-weight: 600; }
+.kpi-delta.up { color: #16a34a; }
+.kpi-delta.down { color: #dc2626; }
+.kpi-delta.neutral { color: #6b7280; }
+
+/* accents */
+.accent-blue   { background: #3b82f6; }
+.accent-rose   { background: #f43f5e; }
+.accent-amber  { background: #f59e0b; }
+.accent-emerald{ background: #10b981; }
+.accent-violet { background: #8b5cf6; }
+
+/* progress (single) */
+.kpi-meta {
+  margin-top: 8px;
+  font-size: 0.8rem;
+  color: var(--label-color, #6b7280);
+  display: flex; justify-content: space-between;
+}
+.kpi-progress-track {
+  position: relative; height: 8px; border-radius: 999px;
+  background: rgba(0,0,0,0.08); overflow: hidden; margin-top: 6px;
+}
+@media (prefers-color-scheme: dark) {
+  .kpi-progress-track { background: rgba(255,255,255,0.12); }
+}
+.kpi-progress-fill {
+  height: 100%; width: 0%; border-radius: 999px; transition: width 300ms ease;
+}
+.fill-blue   { background: linear-gradient(90deg, #3b82f6, #60a5fa); }
+.fill-rose   { background: linear-gradient(90deg, #f43f5e, #fb7185); }
+.fill-amber  { background: linear-gradient(90deg, #f59e0b, #fbbf24); }
+.fill-emerald{ background: linear-gradient(90deg, #10b981, #34d399); }
+.fill-violet { background: linear-gradient(90deg, #8b5cf6, #a78bfa); }
+
+/* stacked progress */
+.kpi-progress-track-2 { position: relative; height: 10px; border-radius: 999px;
+  background: rgba(0,0,0,0.08); overflow: hidden; margin-top: 6px; }
+@media (prefers-color-scheme: dark) {
+  .kpi-progress-track-2 { background: rgba(255,255,255,0.12); }
+}
+.kpi-progress-fill.soft { opacity: 0.45; }
+.kpi-submeta { display:flex; gap:10px; margin-top:6px; font-size:0.78rem; color:#6b7280; }
+.kpi-dot { width:8px; height:8px; border-radius:999px; display:inline-block; transform: translateY(1px);}
+.dot-blue{background:#3b82f6;} .dot-rose{background:#f43f5e;}
+.dot-amber{background:#f59e0b;} .dot-emerald{background:#10b981;} .dot-violet{background:#8b5cf6;}
+
+/* sparkline */
+.spark-wrap { margin-top: 8px; }
+.spark-legend { display:flex; justify-content: space-between; font-size:0.78rem; color:#6b7280; }
+.spark-svg { width:100%; height:42px; display:block; }
+</style>"""
+
 def _ensure_styles():
     if st.session_state.get("_kpi_css_injected"):
         return
     st.session_state["_kpi_css_injected"] = True
 
-    st.markdown(
-        """
-        <style>
-        .kpi-grid {
-          display: grid;
-          grid-template-columns: repeat(auto-fit, minmax(220px, 1fr));
-          gap: 12px;
-        }
-        .kpi-card {
-          border-radius: 14px;
-          padding: 14px 16px;
-          border: 1px solid var(--border-color, rgba(49, 51, 63, 0.2));
-          background: var(--bg-color, rgba(255,255,255,0.6));
-          box-shadow: 0 1px 1px rgba(0,0,0,0.04);
-        }
-        .kpi-compact { padding: 10px 14px; }
-        @media (prefers-color-scheme: dark) {
-          .kpi-card {
-            --bg-color: rgba(255,255,255,0.05);
-            --border-color: rgba(250, 250, 250, 0.15);
-          }
-        }
-        .kpi-top {
-          display:flex; align-items:center; gap:8px; margin-bottom:6px;
-          color: var(--label-color, #6b7280); font-size: 0.80rem;
-        }
-        .kpi-icon {
-          width: 26px; height: 26px; border-radius: 8px;
-          display: inline-flex; align-items:center; justify-content:center;
-          font-size: 14px; font-weight: 600; color: white;
-        }
-        .kpi-value {
-          font-size: 1.45rem; line-height: 1.2; font-weight: 700;
-          letter-spacing: -0.01em;
-        }
-        .kpi-row {
-          display:flex; align-items: baseline; justify-content: space-between; gap: 8px;
-        }
-        .kpi-delta { font-size: 0.95rem; font-weight: 600; }
-        .kpi-delta.up { color: #16a34a; }
-        .kpi-delta.down { color: #dc2626; }
-        .kpi-delta.neutral { color: #6b7280; }
-
-        /* accents */
-        .accent-blue   { background: #3b82f6; }
-        .accent-rose   { background: #f43f5e; }
-        .accent-amber  { background: #f59e0b; }
-        .accent-emerald{ background: #10b981; }
-        .accent-violet { background: #8b5cf6; }
-
-        /* progress (single) */
-        .kpi-meta {
-          margin-top: 8px;
-          font-size: 0.8rem;
-          color: var(--label-color, #6b7280);
-          display: flex; justify-content: space-between;
-        }
-        .kpi-progress-track {
-          position: relative; height: 8px; border-radius: 999px;
-          background: rgba(0,0,0,0.08); overflow: hidden; margin-top: 6px;
-        }
-        @media (prefers-color-scheme: dark) {
-          .kpi-progress-track { background: rgba(255,255,255,0.12); }
-        }
-        .kpi-progress-fill {
-          height: 100%; width: 0%; border-radius: 999px; transition: width 300ms ease;
-        }
-        .fill-blue   { background: linear-gradient(90deg, #3b82f6, #60a5fa); }
-        .fill-rose   { background: linear-gradient(90deg, #f43f5e, #fb7185); }
-        .fill-amber  { background: linear-gradient(90deg, #f59e0b, #fbbf24); }
-        .fill-emerald{ background: linear-gradient(90deg, #10b981, #34d399); }
-        .fill-violet { background: linear-gradient(90deg, #8b5cf6, #a78bfa); }
-
-        /* stacked progress */
-        .kpi-progress-track-2 { position: relative; height: 10px; border-radius: 999px;
-          background: rgba(0,0,0,0.08); overflow: hidden; margin-top: 6px; }
-        @media (prefers-color-scheme: dark) {
-          .kpi-progress-track-2 { background: rgba(255,255,255,0.12); }
-        }
-        .kpi-progress-fill.soft { opacity: 0.45; }
-        .kpi-submeta { display:flex; gap:10px; margin-top:6px; font-size:0.78rem; color:#6b7280; }
-        .kpi-dot { width:8px; height:8px; border-radius:999px; display:inline-block; transform: translateY(1px);}
-        .dot-blue{background:#3b82f6;} .dot-rose{background:#f43f5e;}
-        .dot-amber{background:#f59e0b;} .dot-emerald{background:#10b981;} .dot-violet{background:#8b5cf6;}
-
-        /* sparkline */
-        .spark-wrap { margin-top: 8px; }
-        .spark-legend { display:flex; justify-content: space-between; font-size:0.78rem; color:#6b7280; }
-        .spark-svg { width:100%; height:42px; display:block; }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
+    st.markdown(_KPI_CSS, unsafe_allow_html=True)
 
 def _delta_class(delta: str | None) -> str:
     if not delta:
@@ -150,55 +150,75 @@ def _dot_class(color: str) -> str:
         "blue":"dot-blue","rose":"dot-rose","amber":"dot-amber","emerald":"dot-emerald","violet":"dot-violet"
     }.get(color, "dot-blue")
 
-# =================
-# existing exports
-# =================
-def kpi(label, value, delta=None, *, icon=None, color="blue", help=None, compact=False):
-    _ensure_styles()
+def _stable_id(prefix: str, *parts) -> str:
+    """
+    Deterministic element id from every argument of a card plus its slot (grid
+    position / key): same card → same id on every rerun, and two cards that
+    share a label still get distinct ids.
+    """
+    digest = hashlib.md5("\x1f".join(map(str, parts)).encode("utf-8")).hexdigest()[:8]
+    return f"{prefix}-{digest}"
+
+_RENDERED_KEY = "_kpi_rendered"  # session state: (this rerun's marker, how often each card was rendered)
+
+def _slot(key, card: tuple):
+    """
+    Slot of a card rendered outside a grid (or of a whole grid): its key, else
+    "#n" for the n-th identical card of this rerun, so cards that match in
+    every argument still get distinct ids that are stable across reruns.
+    """
+    if key is not None:
+        return key
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return "#0"
+    marker = ctx.widget_ids_this_run  # a new set on every rerun
+    seen = st.session_state.get(_RENDERED_KEY)
+    if seen is None or seen[0] is not marker:
+        seen = st.session_state[_RENDERED_KEY] = (marker, Counter())
+    n = seen[1][card]
+    seen[1][card] += 1
+    return f"#{n}"
+
+def _compact(html: str) -> str:
+    """Strip template indentation so cards can be concatenated into one element."""
+    return "".join(line.strip() for line in html.splitlines())
+
+def _top_html(label_safe: str, icon_safe: str, icon_cls: str, help_safe: str) -> str:
+    icon_html = f"<div class='kpi-icon {icon_cls}'>{icon_safe}</div>" if icon_safe else ""
+    return f'<div class="kpi-top" title="{help_safe}">{icon_html}<div>{label_safe}</div></div>'
+
+def _value_row_html(value_txt: str, delta_safe: str | None, delta_cls: str) -> str:
+    delta_html = f"<div class='kpi-delta {delta_cls}'>{delta_safe}</div>" if delta_safe else ""
+    return f'<div class="kpi-row"><div class="kpi-value">{value_txt}</div>{delta_html}</div>'
+
+def _num(x) -> float:
+    try: return float(x)
+    except Exception: return 0.0
+
+# ==============================
+# card markup (pure; cached per input so reruns reuse the same strings)
+# ==============================
+@lru_cache(maxsize=1024)
+def _kpi_card_html(label, value, delta=None, icon=None, color="blue", help=None, compact=False, slot=None) -> str:
     label_safe = escape(str(label)); value_safe = escape(f"{value}")
     delta_safe = escape(delta) if delta is not None else None
     icon_safe  = escape(icon) if icon else ""
-    uid = uuid.uuid4().hex[:8]
-    delta_cls = _delta_class(delta); icon_cls  = _accent_class(color)
     compact_cls = "kpi-compact" if compact else ""
-    st.markdown(
-        f"""
-        <div class="kpi-card {compact_cls}" id="kpi-{uid}">
-          <div class="kpi-top" title="{escape(help) if help else ''}">
-            {("<div class='kpi-icon " + icon_cls + "'>" + icon_safe + "</div>") if icon_safe else ""}
-            <div>{label_safe}</div>
-          </div>
-          <div class="kpi-row">
-            <div class="kpi-value">{value_safe}</div>
-            {("<div class='kpi-delta " + delta_cls + "'>" + delta_safe + "</div>") if delta_safe else ""}
-          </div>
+    return _compact(f"""
+        <div class="kpi-card {compact_cls}" id="{_stable_id('kpi', slot, label, value, delta, icon, color, help, compact)}">
+          {_top_html(label_safe, icon_safe, _accent_class(color), escape(help) if help else '')}
+          {_value_row_html(value_safe, delta_safe, _delta_class(delta))}
         </div>
-        """,
-        unsafe_allow_html=True,
-    )
+    """)
 
-def kpi_grid(items: list[dict]):
-    _ensure_styles()
-    st.markdown('<div class="kpi-grid">', unsafe_allow_html=True)
-    for it in items:
-        kpi(
-            it.get("label",""), it.get("value",""), it.get("delta"),
-            icon=it.get("icon"), color=it.get("color","blue"),
-            help=it.get("help"), compact=it.get("compact",False)
-        )
-    st.markdown("</div>", unsafe_allow_html=True)
-
-def kpi_progress(label, value, target, *, units=None, delta=None, icon=None,
-                 color="blue", help=None, compact=False, clamp_overflow=True, show_percent=True):
-    _ensure_styles()
-    uid = uuid.uuid4().hex[:8]
-    icon_cls = _accent_class(color); fill_cls = _fill_class(color)
+@lru_cache(maxsize=1024)
+def _progress_card_html(label, value, target, units=None, delta=None, icon=None, color="blue",
+                        help=None, compact=False, clamp_overflow=True, show_percent=True, slot=None) -> str:
+    fill_cls = _fill_class(color)
     compact_cls = "kpi-compact" if compact else ""
-
-    try: v = float(value)
-    except Exception: v = 0.0
-    try: t = float(target)
-    except Exception: t = 0.0
+    v = _num(value); t = _num(target)
 
     pct = 0.0 if t == 0 else (v/t*100.0)
     pct_bar = max(0,min(100,pct)) if clamp_overflow else max(0,pct)
@@ -206,22 +226,15 @@ def kpi_progress(label, value, target, *, units=None, delta=None, icon=None,
 
     label_safe = escape(str(label)); units_safe = escape(units) if units else ""
     icon_safe = escape(icon) if icon else ""; help_safe = escape(help) if help else ""
-    delta_safe = escape(delta) if delta else None; delta_cls=_delta_class(delta)
+    delta_safe = escape(delta) if delta else None
     value_txt = f"{v:,.0f}{units_safe}" if units else f"{v:,.0f}"
     target_txt= f"{t:,.0f}{units_safe}" if units else f"{t:,.0f}"
     ratio_txt = f"{value_txt} / {target_txt}" + (f" ({pct_display})" if show_percent else "")
 
-    st.markdown(
-        f"""
-        <div class="kpi-card {compact_cls}" id="kpi-prog-{uid}">
-          <div class="kpi-top" title="{help_safe}">
-            {("<div class='kpi-icon " + icon_cls + "'>" + icon_safe + "</div>") if icon_safe else ""}
-            <div>{label_safe}</div>
-          </div>
-          <div class="kpi-row">
-            <div class="kpi-value">{value_txt}</div>
-            {("<div class='kpi-delta " + delta_cls + "'>" + delta_safe + "</div>") if delta_safe else ""}
-          </div>
+    return _compact(f"""
+        <div class="kpi-card {compact_cls}" id="{_stable_id('kpi-prog', slot, label, value, target, units, delta, icon, color, help, compact)}">
+          {_top_html(label_safe, icon_safe, _accent_class(color), help_safe)}
+          {_value_row_html(value_txt, delta_safe, _delta_class(delta))}
           <div class="kpi-meta">
             <div>{ratio_txt}</div><div>Target</div>
           </div>
@@ -229,48 +242,18 @@ def kpi_progress(label, value, target, *, units=None, delta=None, icon=None,
             <div class="kpi-progress-fill {fill_cls}" style="width:{pct_bar:.2f}%"></div>
           </div>
         </div>
-        """,
-        unsafe_allow_html=True,
-    )
+    """)
 
-# =========================================
-# NEW: stacked progress (Actual vs Previous)
-# =========================================
-def kpi_progress_stacked(
-    label: str,
-    actual: float | int,
-    previous: float | int,
-    target: float | int,
-    *,
-    units: str | None = None,
-    delta: str | None = None,
-    icon: str | None = None,
-    color: str = "blue",        # actual color
-    prev_color: str = "amber",  # previous color
-    help: str | None = None,
-    compact: bool = False,
-    clamp_overflow: bool = True,
-):
-    """
-    Two progress bars on a single track:
-      - top (strong): Actual vs Target
-      - bottom (soft): Previous vs Target
-    Great for 'This period vs Last period' against a common target.
-    """
-    _ensure_styles()
-    uid = uuid.uuid4().hex[:8]
-    icon_cls = _accent_class(color)
+@lru_cache(maxsize=1024)
+def _stacked_card_html(label, actual, previous, target, units=None, delta=None, icon=None, color="blue",
+                       prev_color="amber", help=None, compact=False, clamp_overflow=True, slot=None) -> str:
     fill_actual = _fill_class(color)
     fill_prev   = _fill_class(prev_color)
     dot_actual  = _dot_class(color)
     dot_prev    = _dot_class(prev_color)
     compact_cls = "kpi-compact" if compact else ""
 
-    def _f(x):
-        try: return float(x)
-        except Exception: return 0.0
-
-    a = _f(actual); p = _f(previous); t = _f(target)
+    a = _num(actual); p = _num(previous); t = _num(target)
     pct_a = 0.0 if t == 0 else (a/t*100.0)
     pct_p = 0.0 if t == 0 else (p/t*100.0)
     if clamp_overflow:
@@ -279,63 +262,66 @@ def kpi_progress_stacked(
 
     units_safe = escape(units) if units else ""
     a_txt = f"{a:,.0f}{units_safe}" if units else f"{a:,.0f}"
-    p_txt = f"{p:,.0f}{units_safe}" if units else f"{p:,.0f}"
     t_txt = f"{t:,.0f}{units_safe}" if units else f"{t:,.0f}"
 
-    label_safe = escape(label); icon_safe = escape(icon) if icon else ""
+    label_safe = escape(str(label)); icon_safe = escape(icon) if icon else ""
     help_safe  = escape(help) if help else ""
-    delta_safe = escape(delta) if delta else None; delta_cls=_delta_class(delta)
-
-    st.markdown(
-        f"""
-        <div class="kpi-card {compact_cls}" id="kpi-prog2-{uid}">
-          <div class="kpi-top" title="{help_safe}">
-            {("<div class='kpi-icon " + icon_cls + "'>" + icon_safe + "</div>") if icon_safe else ""}
-            <div>{label_safe}</div>
-          </div>
-          <div class="kpi-row">
-            <div class="kpi-value">{a_txt}</div>
-            {("<div class='kpi-delta " + delta_cls + "'>" + delta_safe + "</div>") if delta_safe else ""}
-          </div>
+    delta_safe = escape(delta) if delta else None
 
+    return _compact(f"""
+        <div class="kpi-card {compact_cls}" id="{_stable_id('kpi-prog2', slot, label, actual, previous, target, units, delta, icon, color, help)}">
+          {_top_html(label_safe, icon_safe, _accent_class(color), help_safe)}
+          {_value_row_html(a_txt, delta_safe, _delta_class(delta))}
           <div class="kpi-meta"><div>Actual / Target ({a_txt} / {t_txt})</div><div>Target</div></div>
           <div class="kpi-progress-track-2">
             <div class="kpi-progress-fill {fill_prev} soft" style="width:{pct_p:.2f}%"></div>
             <div class="kpi-progress-fill {fill_actual}" style="width:{pct_a:.2f}%"></div>
           </div>
-
           <div class="kpi-submeta">
-            <span><span class="kpi-dot {dot_actual}"></span> Actual</span>
-            <span><span class="kpi-dot {dot_prev}"></span> Previous</span>
+            <span><span class="kpi-dot {dot_actual}"></span>&nbsp;Actual</span>
+            <span><span class="kpi-dot {dot_prev}"></span>&nbsp;Previous</span>
           </div>
         </div>
-        """,
-        unsafe_allow_html=True,
-    )
+    """)
 
-# =========================================
-# NEW: KPI with inline sparkline trend (SVG)
-# =========================================
-def kpi_sparkline(
-    label: str,
-    value: float | int | str,
-    series: list[float] | tuple[float, ...],
-    *,
-    delta: str | None = None,
-    units: str | None = None,
-    icon: str | None = None,
-    color: str = "emerald",
-    help: str | None = None,
-    compact: bool = False,
-    area: bool = False,
-):
+# sparkline geometry: viewBox size and the number of min/max buckets drawn
+_SPARK_W, _SPARK_H, _SPARK_PAD = 120.0, 30.0, 2.0
+_SPARK_BUCKETS = 60  # 2 points per bucket → ~1 point per viewBox unit
+
+def _minmax_downsample(y: np.ndarray, buckets: int) -> tuple[np.ndarray, np.ndarray]:
     """
-    KPI with a tiny sparkline underneath. No external libs; pure SVG.
-    `series` is a sequence of numbers (recent → last).
+    Reduce y to at most 2*buckets points, keeping each bucket's min and max in
+    time order (peaks and dips survive). Returns (original indices, values).
     """
-    _ensure_styles()
-    uid = uuid.uuid4().hex[:8]
-    icon_cls = _accent_class(color)
+    n = len(y)
+    if n <= 2 * buckets:
+        return np.arange(n), y
+    size = -(-n // buckets)  # ceil
+    padded = np.concatenate([y, np.full(size * buckets - n, y[-1])]).reshape(buckets, size)
+    base = np.arange(buckets) * size
+    i_min = np.minimum(base + padded.argmin(axis=1), n - 1)
+    i_max = np.minimum(base + padded.argmax(axis=1), n - 1)
+    idx = np.column_stack([np.minimum(i_min, i_max), np.maximum(i_min, i_max)]).ravel()
+    return idx, y[idx]
+
+def _spark_path(series) -> tuple[str, int]:
+    """SVG path for a series (any length) in constant-size output; returns (d, n)."""
+    y = np.asarray(series if series is not None else [], dtype=float).ravel()
+    y = y[np.isfinite(y)]
+    if len(y) == 0:
+        y = np.zeros(2)
+    n = len(y)
+    idx, yv = _minmax_downsample(y, _SPARK_BUCKETS)
+    w, h, pad = _SPARK_W, _SPARK_H, _SPARK_PAD
+    ymin, ymax = yv.min(), yv.max()
+    yrange = (ymax - ymin) or 1.0
+    xs = pad + (w - 2*pad) * idx / max(1, n - 1)
+    ys = pad + (h - 2*pad) * (1.0 - (yv - ymin) / yrange)
+    return "M" + " L".join(map("{:.1f},{:.1f}".format, xs.tolist(), ys.tolist())), n
+
+@lru_cache(maxsize=512)
+def _sparkline_card_html(label, value, path_d: str, n: int, delta=None, units=None, icon=None, color="emerald",
+                         help=None, compact=False, area=False, slot=None) -> str:
     dot_cls  = _dot_class(color)
     compact_cls = "kpi-compact" if compact else ""
 
@@ -346,27 +332,14 @@ def kpi_sparkline(
     except Exception:
         v_txt = escape(str(value))
 
-    # build sparkline path
-    pts = list(series) if series else [0.0, 0.0]
-    n = len(pts)
-    w, h, pad = 120.0, 30.0, 2.0
-    xmin, xmax = 0, max(1, n-1)
-    ymin, ymax = min(pts), max(pts)
-    yrange = (ymax - ymin) or 1.0
-
-    def sx(i): return pad + (w-2*pad) * (i - xmin) / (xmax - xmin)
-    def sy(val): return pad + (h-2*pad) * (1.0 - (val - ymin)/yrange)
+    w, h, pad = _SPARK_W, _SPARK_H, _SPARK_PAD
+    # area fill path (optional): close along the baseline from the last x back to the first
+    area_d = f"{path_d} L{w-pad:.1f},{h-pad:.1f} L{pad:.1f},{h-pad:.1f} Z" if area else ""
 
-    path_d = " ".join([("M" if i==0 else "L") + f"{sx(i):.1f},{sy(v):.1f}" for i, v in enumerate(pts)])
-
-    # area fill path (optional)
-    area_d = f"{path_d} L{sx(n-1):.1f},{h-pad:.1f} L{sx(0):.1f},{h-pad:.1f} Z" if area else ""
-
-    label_safe = escape(label)
+    label_safe = escape(str(label))
     icon_safe  = escape(icon) if icon else ""
     help_safe  = escape(help) if help else ""
     delta_safe = escape(delta) if delta else None
-    delta_cls  = _delta_class(delta)
 
     # pick line color (CSS variables not available in SVG; use fixed palette)
     stroke_map = {
@@ -374,30 +347,172 @@ def kpi_sparkline(
     }
     stroke = stroke_map.get(color, "#10b981")
 
-    st.markdown(
-        f"""
-        <div class="kpi-card {compact_cls}" id="kpi-spark-{uid}">
-          <div class="kpi-top" title="{help_safe}">
-            {("<div class='kpi-icon " + icon_cls + "'>" + icon_safe + "</div>") if icon_safe else ""}
-            <div>{label_safe}</div>
-          </div>
-          <div class="kpi-row">
-            <div class="kpi-value">{v_txt}</div>
-            {("<div class='kpi-delta " + delta_cls + "'>" + delta_safe + "</div>") if delta_safe else ""}
-          </div>
-
+    return _compact(f"""
+        <div class="kpi-card {compact_cls}" id="{_stable_id('kpi-spark', slot, label, value, path_d, delta, units, icon, color, help)}">
+          {_top_html(label_safe, icon_safe, _accent_class(color), help_safe)}
+          {_value_row_html(v_txt, delta_safe, _delta_class(delta))}
           <div class="spark-wrap">
             <svg class="spark-svg" viewBox="0 0 {w:.0f} {h:.0f}" preserveAspectRatio="none">
               {"<path d='" + area_d + "' fill='" + stroke + "22' stroke='none'/>" if area_d else ""}
               <path d="{path_d}" fill="none" stroke="{stroke}" stroke-width="2.0" stroke-linejoin="round" stroke-linecap="round"/>
             </svg>
             <div class="spark-legend">
-              <span><span class="kpi-dot {dot_cls}"></span> Trend</span>
+              <span><span class="kpi-dot {dot_cls}"></span>&nbsp;Trend</span>
               <span>Last {n}</span>
             </div>
           </div>
         </div>
-        """,
+    """)
+
+# =================
+# existing exports
+# =================
+def kpi(label, value, delta=None, *, icon=None, color="blue", help=None, compact=False, key=None):
+    _ensure_styles()
+    slot = _slot(key, ("kpi", label, value, delta, icon, color, help, compact))
+    st.markdown(_kpi_card_html(label, value, delta, icon, color, help, compact, slot), unsafe_allow_html=True)
+
+def kpi_progress(label, value, target, *, units=None, delta=None, icon=None,
+                 color="blue", help=None, compact=False, clamp_overflow=True, show_percent=True, key=None):
+    _ensure_styles()
+    slot = _slot(key, ("progress", label, value, target, units, delta, icon, color, help, compact))
+    st.markdown(
+        _progress_card_html(label, value, target, units, delta, icon, color, help, compact,
+                            clamp_overflow, show_percent, slot),
         unsafe_allow_html=True,
     )
 
+# =========================================
+# NEW: stacked progress (Actual vs Previous)
+# =========================================
+def kpi_progress_stacked(
+    label: str,
+    actual: float | int,
+    previous: float | int,
+    target: float | int,
+    *,
+    units: str | None = None,
+    delta: str | None = None,
+    icon: str | None = None,
+    color: str = "blue",        # actual color
+    prev_color: str = "amber",  # previous color
+    help: str | None = None,
+    compact: bool = False,
+    clamp_overflow: bool = True,
+    key: str | None = None,
+):
+    """
+    Two progress bars on a single track:
+      - top (strong): Actual vs Target
+      - bottom (soft): Previous vs Target
+    Great for 'This period vs Last period' against a common target.
+    """
+    _ensure_styles()
+    slot = _slot(key, ("stacked", label, actual, previous, target, units, delta, icon, color, help))
+    st.markdown(
+        _stacked_card_html(label, actual, previous, target, units, delta, icon, color,
+                           prev_color, help, compact, clamp_overflow, slot),
+        unsafe_allow_html=True,
+    )
+
+# =========================================
+# NEW: KPI with inline sparkline trend (SVG)
+# =========================================
+def kpi_sparkline(
+    label: str,
+    value: float | int | str,
+    series: list[float] | tuple[float, ...],
+    *,
+    delta: str | None = None,
+    units: str | None = None,
+    icon: str | None = None,
+    color: str = "emerald",
+    help: str | None = None,
+    compact: bool = False,
+    area: bool = False,
+    key: str | None = None,
+):
+    """
+    KPI with a tiny sparkline underneath. No external libs; pure SVG.
+    `series` is a sequence of numbers (recent → last).
+    """
+    _ensure_styles()
+    path_d, n = _spark_path(series)
+    slot = _slot(key, ("sparkline", label, value, path_d, delta, units, icon, color, help))
+    st.markdown(
+        _sparkline_card_html(label, value, path_d, n, delta, units, icon, color, help, compact, area, slot),
+        unsafe_allow_html=True,
+    )
+
+# =========================================
+# Batched rendering: a whole KPI row/grid as ONE markdown element
+# =========================================
+def _card_html(it: dict, slot=None) -> str:
+    """Markup for one item of kpi_grid/kpi_row; `type` picks the card kind."""
+    kind = it.get("type", "kpi")
+    common = dict(icon=it.get("icon"), help=it.get("help"), compact=it.get("compact", False))
+    if kind == "progress":
+        return _progress_card_html(
+            it.get("label", ""), it.get("value", 0), it.get("target", 0), it.get("units"), it.get("delta"),
+            common["icon"], it.get("color", "blue"), common["help"], common["compact"],
+            it.get("clamp_overflow", True), it.get("show_percent", True), slot,
+        )
+    if kind == "stacked":
+        return _stacked_card_html(
+            it.get("label", ""), it.get("actual", 0), it.get("previous", 0), it.get("target", 0),
+            it.get("units"), it.get("delta"), common["icon"], it.get("color", "blue"),
+            it.get("prev_color", "amber"), common["help"], common["compact"], it.get("clamp_overflow", True),
+            slot,
+        )
+    if kind == "sparkline":
+        return _sparkline_card_html(
+            it.get("label", ""), it.get("value", ""), *_spark_path(it.get("series")), it.get("delta"),
+            it.get("units"), common["icon"], it.get("color", "emerald"), common["help"], common["compact"],
+            it.get("area", False), slot,
+        )
+    return _kpi_card_html(
+        it.get("label", ""), it.get("value", ""), it.get("delta"),
+        common["icon"], it.get("color", "blue"), common["help"], common["compact"], slot,
+    )
+
+@lru_cache(maxsize=256)
+def _grid_html(cards: tuple[str, ...], columns: int | None) -> str:
+    style = f' style="grid-template-columns: repeat({columns}, minmax(0, 1fr))"' if columns else ""
+    # styles travel with the grid so the element is self-contained on every rerun
+    return _compact(_KPI_CSS) + f'<div class="kpi-grid"{style}>' + "".join(cards) + "</div>"
+
+def kpi_grid(items: list[dict], *, columns: int | None = None, key: str | None = None):
+    """
+    Render all cards in one element (one websocket delta per rerun). Items are
+    dicts with the keyword arguments of kpi / kpi_progress / kpi_progress_stacked /
+    kpi_sparkline plus `type` in {"kpi", "progress", "stacked", "sparkline"}.
+    Card ids include the grid's slot (`key`, or which identical grid of this
+    rerun it is) and each card's position.
+    """
+    if not items:
+        return
+    cards = tuple(_card_html(it, (key, i)) for i, it in enumerate(items))
+    slot = _slot(key, ("grid", cards, columns))
+    if slot != key and slot != "#0":
+        cards = tuple(_card_html(it, (slot, i)) for i, it in enumerate(items))
+    st.markdown(_grid_html(cards, columns), unsafe_allow_html=True)
+
+def kpi_row(items: list[dict], *, key: str | None = None):
+    """Single row of equally wide cards (replaces st.columns + one kpi per column)."""
+    kpi_grid(items, columns=len(items), key=key)
+
+# =========================================
+# Rolling statistics controls (time-series charts)
+# =========================================
+def rolling_controls(key: str, *, window: int = 7, z: float = 3.0) -> dict | None:
+    """
+    Toggle plus window / band width inputs under a time-series chart.
+    Returns {"window", "z"} when rolling statistics are switched on, else None.
+    """
+    c1, c2, c3 = st.columns([1, 1, 2])
+    if not c1.toggle("Rolling statistics", key=f"{key}_roll",
+                     help="Moving average, and a band from the previous window that flags anomalies."):
+        return None
+    w = c2.number_input("Window (points)", min_value=2, max_value=365, value=window, step=1, key=f"{key}_roll_window")
+    zz = c3.slider("Band width (σ)", 1.0, 5.0, z, 0.5, key=f"{key}_roll_z")
+    return {"window": int(w), "z": float(zz)}
@@ -0,0 +1,297 @@
+# datasets.py — cached dataset loaders shared by the pages
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import pandas as pd
+import streamlit as st
+
+import api_client
+import appends
+import client_data
+import sampling
+import sketches
+from analytics import (
+    coerce_date_columns, pivot, category_sums, time_sums, add_sums, breakdown_from_sums, series_from_sums,
+    pivot_cells, add_cells, pivot_from_cells,
+)
+from memtrack import is_cached, track_cache
+
+# Session entry written by the Client Template page for the mapped client CSV
+CLIENT_SESSION_KEY = "client_dataset"
+# Parsed CSV ≈ this many times its size on disk (object columns dominate)
+CSV_EXPANSION = 4
+# Partial results kept for extending after an append (see "Appended rows")
+PARTIAL_ENTRIES = 64
+
+
+# ---------- Appended rows ----------
+# Caches below are keyed by dataset version (path@rows). When rows are
+# appended, the new version is built from the previous one plus the new rows
+# (appends.read_since) instead of from scratch, as api_server.load_frame does.
+# _partials keeps, per dataset and cached result, the last version built in
+# this process and its mergeable form (sums, pivot cells, the sample).
+
+_versions: dict = {}  # path → rows of the last version load_csv parsed
+_partials: "OrderedDict[tuple, tuple]" = OrderedDict()  # (name, path) → (rows, partial), LRU order
+_partials_lock = threading.Lock()
+
+
+def _extend(name: tuple, ds: Optional[dict], frame: pd.DataFrame, build: Callable, merge: Callable):
+    """
+    build(frame), or merge(previous partial, build(rows appended since)) when
+    a previous version of upload `ds` was built here. `frame` holds the
+    upload's rows (or a filtered subset) indexed by their position in it, as
+    load_csv returns them; without `ds` nothing is kept.
+    """
+    path, rows = (ds or {}).get("path"), (ds or {}).get("rows")
+    if not path or rows is None or ds.get("client"):
+        return build(frame)
+    with _partials_lock:
+        prev = _partials.get((name, path))
+    if prev is not None and prev[0] == rows:
+        return prev[1]
+    partial = None
+    if prev is not None and prev[0] < rows:
+        partial = merge(prev[1], build(frame[frame.index >= prev[0]]))
+    if partial is None:
+        partial = build(frame)
+    if prev is not None and prev[0] > rows:  # an older version: keep the newer one
+        return partial
+    with _partials_lock:
+        _partials[(name, path)] = (rows, partial)
+        _partials.move_to_end((name, path))
+        while len(_partials) > PARTIAL_ENTRIES:
+            _partials.popitem(last=False)
+    return partial
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_csv(path: str, version: Optional[int] = None, _upload: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Parse an upload (public URL or local path), date-like columns included,
+    once per TTL; callers get their own copy. `version` (the upload's row
+    count) changes when rows are appended, so an appended dataset is never
+    served from a stale entry; while the previous version is cached, only the
+    appended rows of `_upload` are read and added to it.
+    """
+    df = None
+    prev = _versions.get(path)
+    if (_upload and version and prev and prev < version
+            and is_cached(f"csv:{dataset_key({'path': path, 'rows': prev})}")):
+        base = load_csv(path, prev, _upload)
+        extra = appends.read_since(_upload, prev) if len(base) == prev else None
+        if extra is not None:
+            df = pd.concat([base, coerce_date_columns(extra)], ignore_index=True)
+    if df is None:
+        df = coerce_date_columns(pd.read_csv(path))
+    if version and version >= _versions.get(path, 0):
+        _versions[path] = version
+    track_cache(f"csv:{dataset_key({'path': path, 'rows': version})}", df, ttl=300)
+    return df
+
+
+# ---------- Mapped client data ----------
+# Keyed by (content hash, mapping hash); the raw bytes and mapping are passed
+# as underscore args so Streamlit does not hash them on every rerun.
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=16)
+def read_client_csv(content_hash: str, _data: bytes) -> pd.DataFrame:
+    df = client_data.read_client_csv(_data)
+    track_cache(f"client-raw:{content_hash}", df, ttl=3600)
+    return df
+
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=16)
+def load_client_dataset(content_hash: str, mapping_hash: str, _data: bytes, _mapping: dict) -> pd.DataFrame:
+    """Canonical (renamed + typed) frame for one client CSV under one mapping."""
+    cdf = client_data.apply_mapping(read_client_csv(content_hash, _data), _mapping)
+    track_cache(f"client:{content_hash}:{mapping_hash}", cdf, ttl=3600)
+    return cdf
+
+
+def register_client_dataset(name: str, data: bytes, mapping: dict) -> dict:
+    """Remember the mapped client CSV for this session so other pages can offer it."""
+    entry = {
+        "name": name,
+        "content_hash": client_data.content_hash(data),
+        "mapping_hash": client_data.mapping_hash(mapping),
+        "data": data,
+        "mapping": mapping,
+    }
+    st.session_state[CLIENT_SESSION_KEY] = entry
+    return entry
+
+
+def client_dataset_option() -> Optional[dict]:
+    """Upload-like record for the session's mapped client dataset, if any."""
+    entry = st.session_state.get(CLIENT_SESSION_KEY)
+    if not entry:
+        return None
+    return {
+        "uploaded_at": "this session",
+        "filename": f"{entry['name']} (mapped)",
+        "path": f"client:{entry['content_hash']}:{entry['mapping_hash']}",
+        "client": entry,
+    }
+
+
+def load_dataset(ds: dict) -> pd.DataFrame:
+    """Load an upload record or the mapped client dataset entry."""
+    entry = ds.get("client")
+    if entry:
+        return load_client_dataset(entry["content_hash"], entry["mapping_hash"], entry["data"], entry["mapping"])
+    return load_csv(ds.get("path", ""), ds.get("rows"), ds if ds.get("id") is not None else None)
+
+
+def stored_columns(ds: dict) -> Optional[dict]:
+    """
+    What the Dashboard needs of an upload before loading it — rows, columns,
+    numeric / categorical / datetime column names and date ranges — from its
+    stored schema and profile (appends.py); None for datasets without them.
+    """
+    if ds.get("id") is None or ds.get("client"):
+        return None
+    art = appends.artifacts(ds)
+    types, cols = art["schema"]["types"], art["profile"]["columns"]
+    kinds = {k: [c for c in art["schema"]["columns"] if types[c] == k] for k in ("number", "text", "datetime")}
+    return {
+        "rows": int(art["profile"]["rows"]), "columns": list(art["schema"]["columns"]),
+        "numeric": kinds["number"], "categorical": kinds["text"], "datetime": kinds["datetime"],
+        "date_ranges": {c: [cols[c]["min"], cols[c]["max"]] if cols[c].get("min") else None for c in kinds["datetime"]},
+    }
+
+
+def dataset_key(ds: dict) -> str:
+    """Cache key of a dataset version: the path, plus the row count for uploads (appends change it)."""
+    path = ds.get("path", "")
+    if ds.get("client") or ds.get("rows") is None:
+        return path
+    return f"{path}@{ds['rows']}"
+
+
+def _build_sample(df: pd.DataFrame, date_col: Optional[str], cat_col: Optional[str]) -> dict:
+    sample = sampling.build(df, date_col=date_col, cat_col=cat_col)
+    sample["frame"] = coerce_date_columns(sample["frame"])
+    return sample
+
+
+def _sample_rows(sample: dict, extra: pd.DataFrame) -> Optional[dict]:
+    """sample extended with the appended rows; None (draw again) once it has doubled in size."""
+    if len(sample["frame"]) > 2 * sampling.SAMPLE_ROWS:
+        return None
+    return sampling.extend(sample, extra)
+
+
+@st.cache_resource(ttl=900, show_spinner=False, max_entries=8)
+def load_sample(key: str, date_col: Optional[str], cat_col: Optional[str], _ds: dict,
+                _df: Optional[pd.DataFrame] = None) -> dict:
+    """
+    sampling.build() of dataset `_ds` at version `key` (datasets.dataset_key,
+    plus anything else that changes the frame), built once per stratification
+    and held for all sessions: callers share it and must not modify it, and a
+    hit reads nothing else. On a miss the whole upload is loaded (or the
+    previous version's sample extended with the appended rows); pass `_df`
+    when the frame to sample is not the whole upload (e.g. a memory-budget sample).
+    """
+    if _df is not None:
+        sample = _build_sample(_df, date_col, cat_col)
+    else:
+        sample = _extend(("sample", date_col, cat_col), _ds, load_dataset(_ds),
+                         lambda rows: _build_sample(rows, date_col, cat_col), _sample_rows)
+    track_cache(f"sample:{key}:{date_col}:{cat_col}", sample["frame"], ttl=900)
+    return sample
+
+
+@st.cache_data(ttl=900, show_spinner=False, max_entries=16)
+def load_sketches(key: str, _ds: dict, _df: pd.DataFrame, raw: bool = True) -> dict:
+    """
+    sketches.py column sketches of dataset version `key`: for uploads the ones
+    stored with the upload (merged on every append), otherwise built from _df.
+    raw=False when _df no longer holds the upload's rows (e.g. a rollup).
+    """
+    if raw and _ds.get("id") is not None and not _ds.get("client"):
+        return appends.column_sketches(_ds)
+    return sketches.sketch_frame(_df)
+
+
+# ---------- Aggregates of filtered views ----------
+# Keyed by the dataset version and the filters, so every session showing the
+# same view (and the warm-up, see warmup.py) shares one result.
+
+def _aggregate_name(key: str, op: str, filters: dict, column: str, value_col: str) -> str:
+    return f"agg:{key}:{op}:{column}:{value_col}:{json.dumps(filters, sort_keys=True, default=str)}"
+
+
+@st.cache_data(ttl=600, show_spinner=False, max_entries=64)
+def view_aggregate(key: str, op: str, filters: dict, column: str, value_col: str,
+                   _view: pd.DataFrame, _ds: Optional[dict] = None) -> pd.DataFrame:
+    """
+    analytics.category_breakdown (op "breakdown", column = category, top 20) or
+    analytics.time_series (op "timeseries", column = date) of `_view`: the
+    frame of dataset version `key` after analytics.apply_filters(**filters).
+    With `_ds` (_view filters that whole upload) the sums of the previous
+    version are extended with the appended rows.
+    """
+    name = ("agg", op, column, value_col, json.dumps(filters, sort_keys=True, default=str))
+    if op == "breakdown":
+        out = breakdown_from_sums(_extend(name, _ds, _view, lambda v: category_sums(v, column, value_col), add_sums))
+    else:
+        out = series_from_sums(_extend(name, _ds, _view, lambda v: time_sums(v, column, value_col), add_sums))
+    track_cache(_aggregate_name(key, op, filters, column, value_col), out, ttl=600)
+    return out
+
+
+def is_aggregated(key: str, op: str, filters: dict, column: str, value_col: str) -> bool:
+    """True when view_aggregate(...) would be served from the cache."""
+    return is_cached(_aggregate_name(key, op, filters, column, value_col))
+
+
+@st.cache_data(ttl=600, show_spinner=False, max_entries=32)
+def view_pivot(key: str, filters: dict, row_col: str, col_col: str, value_col: Optional[str], agg: str,
+               _view: pd.DataFrame, count_col: Optional[str] = None, _ds: Optional[dict] = None) -> pd.DataFrame:
+    """
+    analytics.pivot of `_view` (dataset version `key` after apply_filters(**filters)),
+    cached and extended after appends like view_aggregate (from analytics.pivot_cells).
+    """
+    if _ds is None or count_col is not None:
+        out = pivot(_view, row_col, col_col, value_col, agg=agg, count_col=count_col)
+    else:
+        name = ("pivot", row_col, col_col, value_col, json.dumps(filters, sort_keys=True, default=str))
+        cells = _extend(name, _ds, _view, lambda v: pivot_cells(v, row_col, col_col, value_col), add_cells)
+        out = pivot_from_cells(cells, row_col, col_col, agg=agg if value_col else "count")
+    track_cache(_aggregate_name(key, "pivot", filters, f"{row_col}×{col_col}", f"{agg}:{value_col}"), out, ttl=600)
+    return out
+
+
+def is_pivoted(key: str, filters: dict, row_col: str, col_col: str, value_col: Optional[str], agg: str) -> bool:
+    """True when view_pivot(...) would be served from the cache."""
+    return is_cached(_aggregate_name(key, "pivot", filters, f"{row_col}×{col_col}", f"{agg}:{value_col}"))
+
+
+def is_loaded(ds: dict) -> bool:
+    """True when load_dataset(ds) would be served from the cache."""
+    return is_cached(ds.get("path", "") if ds.get("client") else f"csv:{dataset_key(ds)}")
+
+
+def load_cost_mb(ds: dict) -> float:
+    """Rough memory cost of loading ds, from the raw size (0 when unknown, e.g. remote URLs)."""
+    entry = ds.get("client")
+    if entry:
+        size = len(entry["data"])
+    else:
+        path = ds.get("path", "")
+        size = os.path.getsize(path) if os.path.isfile(path) else 0
+    return size * CSV_EXPANSION / (1024 * 1024)
+
+
+# ---------- Analytics API ----------
+# With LUMINAIQ_API_URL set, uploads stay in the API process; the pages keep
+# only what their widgets need.
+
+@st.cache_data(ttl=300, show_spinner=False, max_entries=16)
+def remote_columns(key: str, upload_id: int, user_id: str) -> dict:
+    """api_client.columns of dataset version `key` (rows, column kinds, date ranges, sketches)."""
+    return api_client.columns(upload_id, user_id)
@@ -2,7 +2,9 @@
 import os
 import sqlite3
 from contextlib import contextmanager
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+from profiler import traced
 
 DB_PATH = os.getenv("LUMINAIQ_DB_PATH", "luminaiq.db")
 
@@ -17,11 +19,26 @@ def get_conn():
         conn.close()
 
 
+@traced()
 def init_db() -> None:
     """Create required tables if they don't exist."""
     with get_conn() as conn:
         cur = conn.cursor()
 
+        # Accounts (see auth.py)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                password_hash TEXT NOT NULL,
+                role TEXT NOT NULL DEFAULT 'user',
+                company TEXT DEFAULT ''
+            )
+            """
+        )
+
         # Basic uploads table
         cur.execute(
             """
@@ -51,11 +68,88 @@ def init_db() -> None:
             """
         )
 
+        # Incremental forecast state per series (see forecasting.init_state)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS forecast_states (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                series_key TEXT NOT NULL,
+                state_json TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                UNIQUE(user_id, series_key)
+            )
+            """
+        )
+
+        # Derived data kept next to an upload (schema, profile, appended parts; see appends.py)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dataset_artifacts (
+                upload_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                payload_json TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (upload_id, name)
+            )
+            """
+        )
+
+        # Background jobs (see jobs.py); results live in files, deduplicated by input hash
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                input_hash TEXT NOT NULL,
+                label TEXT DEFAULT '',
+                status TEXT NOT NULL DEFAULT 'queued',
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT DEFAULT '',
+                result_path TEXT,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT,
+                owner TEXT NOT NULL
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind_hash ON jobs (kind, input_hash)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, created_at)")
+
+        conn.commit()
+
+
+# ---------- Users ----------
+
+@traced()
+def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT id, email, name, password_hash, role, company FROM users WHERE email = ?",
+            ((email or "").strip().lower(),),
+        ).fetchone()
+    return dict(row) if row else None
+
+
+@traced()
+def insert_user(email: str, name: str, password_hash: str, role: str = "user", company: str = "") -> None:
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO users (email, name, password_hash, role, company)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            ((email or "").strip().lower(), name, password_hash, role, company),
+        )
         conn.commit()
 
 
 # ---------- Uploads ----------
 
+@traced()
 def insert_upload(
     user_id: str,
     filename: str,
@@ -63,9 +157,9 @@ def insert_upload(
     uploaded_at: str,
     rows: int,
     cols: int,
-) -> None:
+) -> int:
     with get_conn() as conn:
-        conn.execute(
+        cur = conn.execute(
             """
             INSERT INTO uploads (user_id, filename, path, uploaded_at, rows, cols)
             VALUES (?, ?, ?, ?, ?, ?)
@@ -73,8 +167,10 @@ def insert_upload(
             (user_id, filename, path, uploaded_at, rows, cols),
         )
         conn.commit()
+    return int(cur.lastrowid)
 
 
+@traced()
 def list_uploads_for_user(user_id: str) -> List[Dict[str, Any]]:
     with get_conn() as conn:
         rows = conn.execute(
@@ -89,8 +185,78 @@ def list_uploads_for_user(user_id: str) -> List[Dict[str, Any]]:
     return [dict(r) for r in rows]
 
 
+@traced()
+def list_recent_uploads(limit: int = 20) -> List[Dict[str, Any]]:
+    """Most recent uploads of all users (cache warm-up)."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT id, user_id, filename, path, uploaded_at, rows, cols
+            FROM uploads
+            ORDER BY uploaded_at DESC, id DESC
+            LIMIT ?
+            """,
+            (limit,),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+@traced()
+def get_upload(upload_id: int) -> Optional[Dict[str, Any]]:
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT id, user_id, filename, path, uploaded_at, rows, cols FROM uploads WHERE id = ?",
+            (upload_id,),
+        ).fetchone()
+    return dict(row) if row else None
+
+
+@traced()
+def set_upload_rows(upload_id: int, rows: int) -> None:
+    with get_conn() as conn:
+        conn.execute("UPDATE uploads SET rows = ? WHERE id = ?", (rows, upload_id))
+        conn.commit()
+
+
+@traced()
+def upload_ids_for_path(path: str) -> List[int]:
+    """Ids of every upload record stored at `path` (one, unless the file is shared)."""
+    with get_conn() as conn:
+        rows = conn.execute("SELECT id FROM uploads WHERE path = ?", (path,)).fetchall()
+    return [int(r[0]) for r in rows]
+
+
+# ---------- Dataset artifacts ----------
+
+@traced()
+def get_artifact(upload_id: int, name: str) -> Optional[str]:
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT payload_json FROM dataset_artifacts WHERE upload_id = ? AND name = ?",
+            (upload_id, name),
+        ).fetchone()
+    return row["payload_json"] if row else None
+
+
+@traced()
+def save_artifact(upload_id: int, name: str, payload_json: str, updated_at: str) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO dataset_artifacts (upload_id, name, payload_json, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(upload_id, name) DO UPDATE SET
+                payload_json = excluded.payload_json,
+                updated_at = excluded.updated_at
+            """,
+            (upload_id, name, payload_json, updated_at),
+        )
+        conn.commit()
+
+
 # ---------- Saved Views ----------
 
+@traced()
 def save_view(user_id: str, page: str, name: str, payload_json: str) -> None:
     """
     Upsert a saved view by (user_id, page, name).
@@ -111,6 +277,7 @@ def save_view(user_id: str, page: str, name: str, payload_json: str) -> None:
         conn.commit()
 
 
+@traced()
 def list_views(user_id: str, page: str) -> List[Dict[str, Any]]:
     with get_conn() as conn:
         rows = conn.execute(
@@ -125,6 +292,18 @@ def list_views(user_id: str, page: str) -> List[Dict[str, Any]]:
     return [dict(r) for r in rows]
 
 
+@traced()
+def list_all_views(page: str) -> List[Dict[str, Any]]:
+    """Saved views of every user on a page (cache warm-up)."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT user_id, name, payload_json as payload FROM saved_views WHERE page = ?",
+            (page,),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+@traced()
 def delete_view(user_id: str, page: str, name: str) -> None:
     with get_conn() as conn:
         conn.execute(
@@ -135,3 +314,179 @@ def delete_view(user_id: str, page: str, name: str) -> None:
             (user_id, page, name),
         )
         conn.commit()
+
+
+# ---------- Forecast states ----------
+
+@traced()
+def get_forecast_state(user_id: str, series_key: str) -> Optional[str]:
+    with get_conn() as conn:
+        row = conn.execute(
+            """
+            SELECT state_json FROM forecast_states
+            WHERE user_id = ? AND series_key = ?
+            """,
+            (user_id, series_key),
+        ).fetchone()
+    return row["state_json"] if row else None
+
+
+@traced()
+def save_forecast_state(user_id: str, series_key: str, state_json: str, updated_at: str) -> None:
+    """
+    Upsert the incremental state of one series by (user_id, series_key).
+    """
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO forecast_states (user_id, series_key, state_json, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, series_key) DO UPDATE SET
+              state_json = excluded.state_json,
+              updated_at = excluded.updated_at
+            """,
+            (user_id, series_key, state_json, updated_at),
+        )
+        conn.commit()
+
+
+@traced()
+def delete_forecast_state(user_id: str, series_key: str) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            """
+            DELETE FROM forecast_states
+            WHERE user_id = ? AND series_key = ?
+            """,
+            (user_id, series_key),
+        )
+        conn.commit()
+
+
+# ---------- Jobs ----------
+
+_JOB_FIELDS = ("status", "progress", "message", "result_path", "error", "started_at", "finished_at")
+
+
+@traced()
+def insert_job(job_id: str, user_id: str, kind: str, input_hash: str, label: str, created_at: str,
+               owner: str, status: str = "queued", result_path: Optional[str] = None, message: str = "",
+               finished_at: Optional[str] = None) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO jobs (id, user_id, kind, input_hash, label, status, progress, message,
+                              result_path, created_at, finished_at, owner)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (job_id, user_id, kind, input_hash, label, status, 1.0 if status == "done" else 0.0,
+             message, result_path, created_at, finished_at, owner),
+        )
+        conn.commit()
+
+
+@traced()
+def update_job(job_id: str, **fields: Any) -> None:
+    """Set any of status/progress/message/result_path/error/started_at/finished_at."""
+    cols = [k for k in fields if k in _JOB_FIELDS]
+    if not cols:
+        return
+    with get_conn() as conn:
+        conn.execute(
+            f"UPDATE jobs SET {', '.join(f'{c} = ?' for c in cols)} WHERE id = ?",
+            [fields[c] for c in cols] + [job_id],
+        )
+        conn.commit()
+
+
+@traced()
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with get_conn() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+@traced()
+def find_job(kind: str, input_hash: str, statuses: tuple = ("done",)) -> Optional[Dict[str, Any]]:
+    """Most recent job with this (kind, input hash) in one of `statuses`."""
+    with get_conn() as conn:
+        row = conn.execute(
+            f"""
+            SELECT * FROM jobs
+            WHERE kind = ? AND input_hash = ? AND status IN ({', '.join('?' * len(statuses))})
+            ORDER BY created_at DESC
+            LIMIT 1
+            """,
+            (kind, input_hash, *statuses),
+        ).fetchone()
+    return dict(row) if row else None
+
+
+@traced()
+def list_jobs_for_user(user_id: str, kind: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    with get_conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT * FROM jobs
+            WHERE user_id = ? AND (? IS NULL OR kind = ?)
+            ORDER BY created_at DESC
+            LIMIT ?
+            """,
+            (user_id, kind, kind, limit),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+@traced()
+def count_active_jobs(user_id: Optional[str] = None) -> int:
+    """Queued/running jobs, of one user or of everyone."""
+    with get_conn() as conn:
+        row = conn.execute(
+            """
+            SELECT COUNT(*) FROM jobs
+            WHERE status IN ('queued', 'running') AND (? IS NULL OR user_id = ?)
+            """,
+            (user_id, user_id),
+        ).fetchone()
+    return int(row[0])
+
+
+@traced()
+def unfinished_job_owners() -> List[str]:
+    """Distinct owners (the process whose pool runs the job) of queued/running jobs."""
+    with get_conn() as conn:
+        rows = conn.execute("SELECT DISTINCT owner FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+    return [r[0] for r in rows]
+
+
+@traced()
+def fail_unfinished_jobs(message: str, finished_at: str, owners: List[str]) -> int:
+    """Mark the queued/running jobs of `owners` as failed (their worker pool is gone); returns how many."""
+    with get_conn() as conn:
+        cur = conn.execute(
+            f"""
+            UPDATE jobs SET status = 'failed', error = ?, finished_at = ?
+            WHERE status IN ('queued', 'running') AND owner IN ({', '.join('?' * len(owners))})
+            """,
+            (message, finished_at, *owners),
+        )
+        conn.commit()
+    return cur.rowcount
+
+
+@traced()
+def delete_jobs(created_before: str) -> List[str]:
+    """
+    Delete finished/failed jobs created before the timestamp; returns the
+    result paths no remaining job points at (reused results share a file).
+    """
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT DISTINCT result_path FROM jobs WHERE created_at < ? AND status IN ('done', 'failed') "
+            "AND result_path IS NOT NULL",
+            (created_before,),
+        ).fetchall()
+        conn.execute("DELETE FROM jobs WHERE created_at < ? AND status IN ('done', 'failed')", (created_before,))
+        kept = {r[0] for r in conn.execute("SELECT DISTINCT result_path FROM jobs WHERE result_path IS NOT NULL")}
+        conn.commit()
+    return [r[0] for r in rows if r[0] not in kept]
@@ -0,0 +1,50 @@
+# deps.py — optional/heavy dependencies without paying for them up front
+#
+# available("plotly") answers "is it installed?" from the import system's
+# metadata (no import). lazy("plotly.express") returns a stand-in that imports
+# the real module on first attribute access, so a page can keep writing
+# `px.line(...)` while users who never reach a chart never load plotly.
+from __future__ import annotations
+
+import importlib
+import importlib.util
+from functools import lru_cache
+from types import ModuleType
+
+
+@lru_cache(maxsize=None)
+def available(name: str) -> bool:
+    """True if the top-level package of `name` is installed (does not import it)."""
+    try:
+        return importlib.util.find_spec(name.split(".", 1)[0]) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyModule(ModuleType):
+    """Module proxy that performs the import on first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self) -> ModuleType:
+        mod = self.__dict__["_lazy_module"]
+        if mod is None:
+            mod = importlib.import_module(self.__name__)
+            self.__dict__["_lazy_module"] = mod
+        return mod
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -0,0 +1,548 @@
+# forecasting.py — NumPy forecasting helpers shared by the Forecasting page
+from __future__ import annotations
+
+import warnings
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+# ---------- Error metrics ----------
+
+def mape(y_true, y_pred) -> float:
+    y_true, y_pred = np.asarray(y_true, dtype=float), np.asarray(y_pred, dtype=float)
+    denom = np.clip(np.abs(y_true), 1e-9, None)
+    return float(np.mean(np.abs((y_true - y_pred) / denom)) * 100.0)
+
+
+def error_metrics(actual: np.ndarray, forecast: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Element-wise error arrays for any shape of actual/forecast.
+    Bias is forecast - actual (positive = over-forecast). NaNs propagate.
+    """
+    actual = np.asarray(actual, dtype=float)
+    forecast = np.asarray(forecast, dtype=float)
+    err = forecast - actual
+    ae = np.abs(err)
+    ape = ae / np.clip(np.abs(actual), 1e-9, None) * 100.0
+    sape = 200.0 * ae / np.clip(np.abs(actual) + np.abs(forecast), 1e-9, None)
+    return {"error": err, "ae": ae, "ape": ape, "sape": sape}
+
+
+# ---------- Linear trend (closed form) ----------
+
+def linear_trend_fit(y: Sequence[float]) -> tuple[float, float]:
+    """OLS fit of y ~ a + b*t with t = 0..n-1. Returns (intercept, slope)."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n == 0:
+        return 0.0, 0.0
+    t = np.arange(n, dtype=float)
+    st, sy = t.sum(), y.sum()
+    denom = n * (t * t).sum() - st * st
+    b = 0.0 if denom == 0 else (n * (t * y).sum() - st * sy) / denom
+    a = (sy - b * st) / n
+    return float(a), float(b)
+
+
+def _linear_backtest_forecasts(
+    y: np.ndarray,
+    cutoffs: np.ndarray,
+    horizons: np.ndarray,
+    window: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Linear-trend forecasts for every (cutoff, horizon) pair at once.
+
+    A cutoff c means "train on y[:c]" (or y[c-window:c] for a sliding window).
+    The OLS coefficients of each fold come from differences of prefix sums,
+    so there is no per-fold refit. Returns an array of shape (folds, horizons).
+    """
+    t = np.arange(len(y), dtype=float)
+    # prefix sums with a leading zero: P[k] = sum over the first k points
+    def _prefix(a):
+        return np.concatenate(([0.0], np.cumsum(a)))
+
+    p_t, p_tt, p_y, p_ty = _prefix(t), _prefix(t * t), _prefix(y), _prefix(t * y)
+    end = cutoffs
+    start = np.zeros_like(end) if window is None else np.maximum(end - window, 0)
+
+    n = (end - start).astype(float)
+    st = p_t[end] - p_t[start]
+    stt = p_tt[end] - p_tt[start]
+    sy = p_y[end] - p_y[start]
+    sty = p_ty[end] - p_ty[start]
+
+    denom = n * stt - st * st
+    with np.errstate(divide="ignore", invalid="ignore"):
+        b = np.where(denom != 0, (n * sty - st * sy) / np.where(denom != 0, denom, 1.0), 0.0)
+        a = (sy - b * st) / n
+
+    target_t = end[:, None] + horizons[None, :] - 1
+    return a[:, None] + b[:, None] * target_t
+
+
+# ---------- Rolling-origin backtest ----------
+
+def backtest_cutoffs(n: int, max_horizon: int, n_folds: int, min_train: int = 3) -> np.ndarray:
+    """
+    The last `n_folds` cutoffs (training sizes) that leave room to score every
+    horizon up to `max_horizon`, so each fold covers the same horizons.
+    Cutoffs run oldest → newest, step 1.
+    """
+    last = n - max(1, int(max_horizon))
+    first = max(min_train, last - n_folds + 1)
+    if first > last:
+        return np.array([], dtype=int)
+    return np.arange(first, last + 1, dtype=int)
+
+
+def rolling_origin_backtest(
+    y: Sequence[float],
+    horizons: Iterable[int] = (1,),
+    n_folds: int = 20,
+    min_train: int = 3,
+    window: Optional[int] = None,
+    fit: Optional[dict] = None,
+) -> pd.DataFrame:
+    """
+    Rolling-origin evaluation of the linear-trend baseline, or of a fitted
+    smoothing model when `fit` (a single-series result of `fit_model` /
+    `auto_fit`) is given; `window` only applies to the linear baseline.
+
+    Every cutoff is scored at every horizon in one vectorized pass; cutoffs
+    stop `max(horizons)` points before the end. Smoothing parameters are
+    refitted on each fold's training points only. Returns one row per
+    (fold, horizon) with columns:
+    fold, cutoff, horizon, target_idx, actual, forecast, error, ae, ape, sape.
+    """
+    y = np.asarray(y, dtype=float)
+    hs = np.array(sorted({int(h) for h in horizons if int(h) >= 1}), dtype=int)
+    if len(hs) == 0:
+        raise ValueError("At least one positive horizon is required.")
+    es = fit is not None and fit["kind"][0] != "linear"
+    if es:
+        # the initial state reads the first two seasons (or two points): keep them in-sample
+        min_train = max(min_train, 2 * fit["m"] if fit["kind"][0] == "hw" else 2)
+    cutoffs = backtest_cutoffs(len(y), int(hs.max()), n_folds, min_train)
+    cols = ["fold", "cutoff", "horizon", "target_idx", "actual", "forecast", "error", "ae", "ape", "sape"]
+    if len(cutoffs) == 0:
+        return pd.DataFrame(columns=cols)
+
+    if es:
+        fc = _es_backtest_forecasts(y, fit, cutoffs, hs)
+    else:
+        fc = _linear_backtest_forecasts(y, cutoffs, hs, window=window)
+    target = cutoffs[:, None] + hs[None, :] - 1
+    valid = target < len(y)
+    actual = np.where(valid, y[np.minimum(target, len(y) - 1)], np.nan)
+    m = error_metrics(actual, fc)
+
+    fold_idx = np.broadcast_to(np.arange(len(cutoffs))[:, None], fc.shape)
+    out = pd.DataFrame({
+        "fold": fold_idx[valid],
+        "cutoff": np.broadcast_to(cutoffs[:, None], fc.shape)[valid],
+        "horizon": np.broadcast_to(hs[None, :], fc.shape)[valid],
+        "target_idx": target[valid],
+        "actual": actual[valid],
+        "forecast": fc[valid],
+        "error": m["error"][valid],
+        "ae": m["ae"][valid],
+        "ape": m["ape"][valid],
+        "sape": m["sape"][valid],
+    })
+    return out[cols]
+
+
+def summarize_backtest(bt: pd.DataFrame, by: str = "horizon") -> pd.DataFrame:
+    """Aggregate backtest rows into MAPE / sMAPE / MAE / bias per `by` group."""
+    if bt.empty:
+        return pd.DataFrame(columns=[by, "folds", "MAPE", "sMAPE", "MAE", "bias"])
+    g = bt.groupby(by, sort=True)
+    return pd.DataFrame({
+        "folds": g["fold"].nunique(),
+        "MAPE": g["ape"].mean(),
+        "sMAPE": g["sape"].mean(),
+        "MAE": g["ae"].mean(),
+        "bias": g["error"].mean(),
+    }).reset_index()
+
+
+# ---------- Exponential smoothing (batched) ----------
+#
+# All fits share one state layout so models can be mixed per series:
+#   level (S,), trend (S,), season (S, m)  with  yhat[n+k] = level + k*trend + season[(n+k-1) % m]
+# SES has trend = 0 and a zero season, Holt a zero season, and the linear
+# baseline is level = a + b*(n-1), trend = b.
+
+SEASON_PERIODS = {"D": 7, "W": 52, "MS": 12}
+MODEL_KINDS = ("linear", "ses", "holt", "hw")
+
+_ALPHAS = np.array([0.05, 0.1, 0.2, 0.3, 0.45, 0.6, 0.8, 0.95])
+_BETAS = np.array([0.01, 0.05, 0.15, 0.3])
+_GAMMAS = np.array([0.01, 0.05, 0.15, 0.3])
+
+
+def _param_grid(kind: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if kind == "ses":
+        return _ALPHAS, np.zeros_like(_ALPHAS), np.zeros_like(_ALPHAS)
+    if kind == "holt":
+        a, b = np.meshgrid(_ALPHAS, _BETAS, indexing="ij")
+        return a.ravel(), b.ravel(), np.zeros(a.size)
+    if kind == "hw":
+        a, b, g = np.meshgrid(_ALPHAS, _BETAS, _GAMMAS, indexing="ij")
+        return a.ravel(), b.ravel(), g.ravel()
+    raise ValueError(f"Unknown smoothing model: {kind}")
+
+
+def _as_matrix(Y) -> np.ndarray:
+    Y = np.asarray(Y, dtype=float)
+    return Y[None, :] if Y.ndim == 1 else Y
+
+
+def _es_init(Y: np.ndarray, kind: str, m: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Heuristic initial states (level, trend, season) per series; NaNs → 0."""
+    S = Y.shape[0]
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN windows
+        if kind == "hw":
+            first = np.nanmean(Y[:, :m], axis=1)
+            second = np.nanmean(Y[:, m:2 * m], axis=1)
+            level = first
+            trend = (second - first) / m
+            season = Y[:, :m] - first[:, None]
+        else:
+            level = Y[:, 0]
+            trend = Y[:, 1] - Y[:, 0] if (kind == "holt" and Y.shape[1] > 1) else np.zeros(S)
+            season = np.zeros((S, 1))
+    return np.nan_to_num(level), np.nan_to_num(trend), np.nan_to_num(season)
+
+
+def _es_filter(
+    Y: np.ndarray,
+    alpha: np.ndarray,
+    beta: np.ndarray,
+    gamma: np.ndarray,
+    level: np.ndarray,
+    trend: np.ndarray,
+    season: np.ndarray,
+    start: int = 0,
+    record_at: Optional[np.ndarray] = None,
+):
+    """
+    Additive error-correction recursion over time, vectorized across series and
+    parameter sets. Y is (S, T); params broadcast against the (S, G) state;
+    season is (S, G, m). Missing observations (NaN) carry the state forward.
+    `start` is the absolute time index of Y[:, 0] (keeps season slots aligned).
+    Returns (sse, level, trend, season, records); records holds the states
+    and the running sse after the first c points for every c in `record_at`.
+    """
+    S, T = Y.shape
+    m = season.shape[-1]
+    level, trend, season = level.copy(), trend.copy(), season.copy()
+    sse = np.zeros(level.shape)
+    pos = None
+    records = None
+    if record_at is not None and len(record_at):
+        pos = np.full(start + T + 1, -1)
+        pos[np.asarray(record_at)] = np.arange(len(record_at))
+        records = (
+            np.empty((len(record_at),) + level.shape),
+            np.empty((len(record_at),) + trend.shape),
+            np.empty((len(record_at),) + season.shape),
+            np.empty((len(record_at),) + sse.shape),
+        )
+
+    for t in range(T):
+        i = (start + t) % m
+        y = Y[:, t][:, None]
+        s = season[..., i]
+        pred = level + trend + s
+        yv = np.where(np.isnan(y), pred, y)
+        err = yv - pred
+        sse += err * err
+        new_level = alpha * (yv - s) + (1.0 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1.0 - beta) * trend
+        season[..., i] = gamma * (yv - new_level) + (1.0 - gamma) * s
+        level = new_level
+        if pos is not None and pos[start + t + 1] >= 0:
+            k = pos[start + t + 1]
+            records[0][k], records[1][k], records[2][k], records[3][k] = level, trend, season, sse
+    return sse, level, trend, season, records
+
+
+def _pad_season(season: np.ndarray, m: int) -> np.ndarray:
+    if season.shape[1] == m:
+        return season
+    return np.zeros((season.shape[0], m))
+
+
+def fit_linear_batch(Y, m: int = 1) -> dict:
+    """Closed-form linear trend for every row of Y (NaNs ignored), as a smoothing state."""
+    Y = _as_matrix(Y)
+    S, T = Y.shape
+    t = np.arange(T, dtype=float)[None, :]
+    mask = ~np.isnan(Y)
+    y0 = np.where(mask, Y, 0.0)
+    n = mask.sum(axis=1).astype(float)
+    st = (t * mask).sum(axis=1)
+    stt = (t * t * mask).sum(axis=1)
+    sy = y0.sum(axis=1)
+    sty = (t * y0).sum(axis=1)
+    denom = n * stt - st * st
+    with np.errstate(divide="ignore", invalid="ignore"):
+        b = np.where(denom != 0, (n * sty - st * sy) / np.where(denom != 0, denom, 1.0), 0.0)
+        a = np.where(n > 0, (sy - b * st) / np.maximum(n, 1.0), 0.0)
+    zeros = np.zeros(S)
+    return {
+        "kind": np.full(S, "linear", dtype=object),
+        "alpha": zeros, "beta": zeros.copy(), "gamma": zeros.copy(),
+        "level": a + b * (T - 1), "trend": b, "season": np.zeros((S, m)),
+        "m": m, "n": T,
+    }
+
+
+def fit_es(Y, kind: str = "ses", m: int = 1, params: Optional[tuple] = None) -> dict:
+    """
+    Fit SES ("ses"), Holt ("holt") or additive Holt-Winters ("hw", period m) to
+    every row of Y. Smoothing parameters are grid-searched for all series at
+    once, minimizing in-sample one-step-ahead SSE, unless fixed
+    `params` = (alpha, beta, gamma) are given.
+    """
+    Y = _as_matrix(Y)
+    S, T = Y.shape
+    mm = m if kind == "hw" else 1
+    if kind == "hw" and (m < 2 or T < 2 * m):
+        raise ValueError(f"Holt-Winters needs a season of 2+ periods and at least {2 * m} points.")
+    if T < 2:
+        raise ValueError("Need at least two points to fit a smoothing model.")
+
+    if params is not None:
+        a, b, g = (np.array([float(v)]) for v in params)
+    else:
+        a, b, g = _param_grid(kind)
+    G = len(a)
+    l0, b0, s0 = _es_init(Y, kind, mm)
+    level = np.repeat(l0[:, None], G, axis=1)
+    trend = np.repeat(b0[:, None], G, axis=1)
+    season = np.repeat(s0[:, None, :], G, axis=1)
+    sse, level, trend, season, _ = _es_filter(Y, a[None, :], b[None, :], g[None, :], level, trend, season)
+
+    best = np.argmin(np.nan_to_num(sse, nan=np.inf), axis=1)
+    rows = np.arange(S)
+    return {
+        "kind": np.full(S, kind, dtype=object),
+        "alpha": a[best], "beta": b[best], "gamma": g[best],
+        "level": level[rows, best], "trend": trend[rows, best],
+        "season": _pad_season(season[rows, best, :], m),
+        "m": m, "n": T,
+    }
+
+
+def fit_model(Y, kind: str, m: int = 1, params: Optional[tuple] = None) -> dict:
+    if kind == "linear":
+        return fit_linear_batch(Y, m=m)
+    return fit_es(Y, kind=kind, m=m, params=params)
+
+
+def es_forecast(fit: dict, horizon: int) -> np.ndarray:
+    """(S, horizon) forecasts from any fit produced by this module."""
+    k = np.arange(1, int(horizon) + 1)
+    slots = (fit["n"] + k - 1) % fit["m"]
+    return fit["level"][:, None] + fit["trend"][:, None] * k[None, :] + fit["season"][:, slots]
+
+
+def _take_rows(fit: dict, rows: np.ndarray) -> dict:
+    return {k: (v[rows] if isinstance(v, np.ndarray) else v) for k, v in fit.items()}
+
+
+def auto_fit(
+    Y,
+    m: int = 1,
+    kinds: Sequence[str] = MODEL_KINDS,
+    holdout: Optional[int] = None,
+) -> dict:
+    """
+    Per-series model selection by backtest error: every candidate is fit on the
+    series minus its last `holdout` points and scored by sMAPE on the holdout;
+    the winner per series is then refit on the full history.
+    The returned fit carries `kind` and `backtest_smape` per series.
+    """
+    Y = _as_matrix(Y)
+    S, T = Y.shape
+    h = holdout or max(1, min(T // 5, 2 * m if m > 1 else 12))
+    n_train = T - h
+    if n_train < 2:
+        raise ValueError("Series too short for automatic model selection.")
+    candidates = [k for k in kinds if k != "hw" or (m >= 2 and n_train >= 2 * m)]
+
+    train, test = Y[:, :n_train], Y[:, n_train:]
+    scores = np.full((len(candidates), S), np.inf)
+    for j, kind in enumerate(candidates):
+        fc = es_forecast(fit_model(train, kind, m), h)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            sc = np.nanmean(error_metrics(test, fc)["sape"], axis=1)
+        scores[j] = np.where(np.isnan(sc), np.inf, sc)
+    best = np.argmin(scores, axis=0)
+
+    out = fit_linear_batch(Y, m=m)
+    for j, kind in enumerate(candidates):
+        rows = np.flatnonzero(best == j)
+        if len(rows) == 0:
+            continue
+        sub = fit_model(Y[rows], kind, m)
+        for key in ("kind", "alpha", "beta", "gamma", "level", "trend", "season"):
+            out[key][rows] = sub[key]
+    out["backtest_smape"] = scores[best, np.arange(S)]
+    return out
+
+
+def _es_backtest_forecasts(y: np.ndarray, fit: dict, cutoffs: np.ndarray, horizons: np.ndarray) -> np.ndarray:
+    """
+    Forecasts of a single-series smoothing model (the kind of `fit`) from
+    every cutoff, with parameters re-searched on each fold's training points.
+    The filter is causal, so one pass of the whole grid records, at every
+    cutoff, the state and in-sample SSE a fit on y[:cutoff] would have seen;
+    each fold keeps its own best grid point. Same result as calling fit_es
+    on every training slice, in one pass.
+    """
+    kind = fit["kind"][0]
+    mm = fit["m"] if kind == "hw" else 1
+    Y = y[None, :]
+    a, b, g = _param_grid(kind)
+    G = len(a)
+    l0, b0, s0 = _es_init(Y, kind, mm)
+    _, _, _, _, rec = _es_filter(
+        Y, a[None, :], b[None, :], g[None, :],
+        np.repeat(l0[:, None], G, axis=1), np.repeat(b0[:, None], G, axis=1),
+        np.repeat(s0[:, None, :], G, axis=1), record_at=cutoffs,
+    )
+    best = np.argmin(np.nan_to_num(rec[3][:, 0, :], nan=np.inf), axis=1)
+    folds = np.arange(len(cutoffs))
+    lev, tr, sea = rec[0][folds, 0, best], rec[1][folds, 0, best], rec[2][folds, 0, best, :]
+    slots = (cutoffs[:, None] + horizons[None, :] - 1) % mm
+    return lev[:, None] + tr[:, None] * horizons[None, :] + np.take_along_axis(sea, slots, axis=1)
+
+
+# ---------- Incremental state ----------
+#
+# A compact, JSON-ready summary of one fitted series: the running least-squares
+# sums (linear) or the smoothing parameters and states (SES/Holt/HW) after the
+# first `n` points. The newest period is never committed because it may still
+# be partial (e.g. the current month); it is applied on top when forecasting.
+# Updating with a longer extract of the same series costs O(new points).
+
+_TAIL = 3  # committed values kept to detect a rewritten history
+
+
+def _linear_sums(y: np.ndarray, t0: int = 0) -> dict:
+    t = np.arange(t0, t0 + len(y), dtype=float)
+    ok = ~np.isnan(y)
+    t, y = t[ok], y[ok]
+    return {"n": float(len(y)), "st": float(t.sum()), "stt": float((t * t).sum()),
+            "sy": float(y.sum()), "sty": float((t * y).sum())}
+
+
+def _add_sums(a: dict, b: dict) -> dict:
+    return {k: a[k] + b[k] for k in a}
+
+
+def _es_advance(state: dict, y: np.ndarray, start: int) -> tuple[float, float, np.ndarray]:
+    """Run the fixed-parameter recursion over y (absolute index `start`)."""
+    mm = state["m"] if state["model"] == "hw" else 1
+    p = lambda key: np.array([[state[key]]])  # noqa: E731
+    _, lev, tr, sea, _ = _es_filter(
+        np.asarray(y, dtype=float)[None, :], p("alpha"), p("beta"), p("gamma"),
+        p("level"), p("trend"), np.asarray(state["season"][:mm], dtype=float)[None, None, :],
+        start=start,
+    )
+    return float(lev[0, 0]), float(tr[0, 0]), sea[0, 0, :]
+
+
+def init_state(y: Sequence[float], kind: str, m: int = 1, params: Optional[tuple] = None) -> dict:
+    """
+    Full fit of one series into an incremental state. `kind` may be any of
+    MODEL_KINDS or "auto"; parameters are searched on the committed history
+    (everything but the last period) unless fixed `params` are given.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y) - 1
+    if n < 2:
+        raise ValueError("Need at least three periods to fit a forecast.")
+    committed = y[:n]
+    state = {"kind": kind, "model": kind, "m": m, "n": n, "tail": committed[-_TAIL:].tolist(),
+             "stats": None, "alpha": 0.0, "beta": 0.0, "gamma": 0.0,
+             "level": 0.0, "trend": 0.0, "season": [0.0] * m}
+    if kind == "auto":
+        fit = auto_fit(committed, m=m)
+        state["backtest_smape"] = float(fit["backtest_smape"][0])
+    else:
+        fit = fit_model(committed, kind, m=m, params=params)
+    state["model"] = str(fit["kind"][0])
+    if state["model"] == "linear":
+        state["stats"] = _linear_sums(committed)
+    else:
+        for key in ("alpha", "beta", "gamma", "level", "trend"):
+            state[key] = float(fit[key][0])
+        state["season"] = fit["season"][0].tolist()
+    return state
+
+
+def update_state(state: dict, y: Sequence[float]) -> Optional[dict]:
+    """
+    Advance a state with a newer extract of the same series (full history as
+    resampled today). Only the points after the committed prefix are touched.
+    Returns None when the series no longer extends the committed history,
+    in which case the caller should refit with `init_state`.
+    """
+    y = np.asarray(y, dtype=float)
+    n_old = state["n"]
+    n_new = len(y) - 1
+    if n_new < n_old:
+        return None
+    tail = np.asarray(state["tail"], dtype=float)
+    if not np.allclose(y[n_old - len(tail):n_old], tail, equal_nan=True):
+        return None
+    new = dict(state, n=n_new, tail=y[:n_new][-_TAIL:].tolist())
+    fresh = y[n_old:n_new]
+    if len(fresh) == 0:
+        return new
+    if state["model"] == "linear":
+        new["stats"] = _add_sums(state["stats"], _linear_sums(fresh, t0=n_old))
+    else:
+        lev, tr, sea = _es_advance(state, fresh, start=n_old)
+        new["level"], new["trend"] = lev, tr
+        season = list(state["season"])
+        season[:len(sea)] = sea.tolist()
+        new["season"] = season
+    return new
+
+
+def state_fit(state: dict, y: Sequence[float]) -> dict:
+    """
+    Single-series fit (same layout as `fit_model`, usable with `es_forecast`
+    and `rolling_origin_backtest`) from a state plus the uncommitted tail of y.
+    """
+    y = np.asarray(y, dtype=float)
+    n_total = len(y)
+    pending = y[state["n"]:]
+    m = state["m"]
+    fit = {"kind": np.array([state["model"]], dtype=object), "m": m, "n": n_total}
+    if state["model"] == "linear":
+        sums = _add_sums(state["stats"], _linear_sums(pending, t0=state["n"]))
+        denom = sums["n"] * sums["stt"] - sums["st"] ** 2
+        b = 0.0 if denom == 0 else (sums["n"] * sums["sty"] - sums["st"] * sums["sy"]) / denom
+        a = (sums["sy"] - b * sums["st"]) / max(sums["n"], 1.0)
+        level, trend, season = a + b * (n_total - 1), b, np.zeros(m)
+    else:
+        level, trend, sea = _es_advance(state, pending, start=state["n"])
+        season = np.zeros(m)
+        season[:len(sea)] = sea
+    for key in ("alpha", "beta", "gamma"):
+        fit[key] = np.array([state[key]])
+    fit["level"], fit["trend"], fit["season"] = np.array([level]), np.array([trend]), season[None, :]
+    if "backtest_smape" in state:
+        fit["backtest_smape"] = np.array([state["backtest_smape"]])
+    return fit
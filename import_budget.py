@@ -0,0 +1,106 @@
+# import_budget.py — cold import cost of each page, checked against a budget
+#
+# Usage:
+#   python import_budget.py                 # table + exit code 1 on a breach
+#   python import_budget.py --json out.json # also write the measurements
+#
+# Every page is executed in a fresh interpreter (Streamlit's AppTest, empty
+# temporary database) so nothing is warm. Streamlit itself is imported before
+# the clock starts; what is timed is the page's own first run and the heavy
+# modules it pulls in. Two visits are measured per page:
+#   anonymous  — not signed in; should stop at the auth guard almost for free
+#   signed-in  — a user with no uploads; the page's unconditional imports
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Modules worth reporting when a visit loads them
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "plotly.express", "sklearn", "yaml", "supabase", "kaleido")
+
+PAGES = (
+    "app.py",
+    "pages/1_Overview.py",
+    "pages/2_Upload_Data.py",
+    "pages/3_Dashboard.py",
+    "pages/4_Predictive_Forecasting.py",
+    "pages/5_Admin.py",
+    "pages/6_Client_Template.py",
+)
+
+# Budgets in milliseconds (cold, single run; includes AppTest's own overhead)
+DEFAULT_BUDGET_MS = {"anonymous": 300, "signed-in": 1200}
+BUDGET_MS = {
+    "app.py": {"anonymous": 500, "signed-in": 500},  # includes one-time schema/admin bootstrap
+}
+
+# Modules a visit must not load: anonymous visits stop at the auth guard, and
+# a signed-in visit without data never draws a chart.
+FORBIDDEN = {"anonymous": HEAVY_MODULES, "signed-in": ("plotly.express", "sklearn", "kaleido")}
+
+_CHILD = r"""
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+os.chdir({root!r})
+from streamlit.testing.v1 import AppTest
+before = set(sys.modules)
+at = AppTest.from_file({page!r}, default_timeout=120)
+if {signed_in!r}:
+    at.session_state["user"] = {{"id": "__budget__", "name": "Budget", "company": "", "email": "budget@local", "role": "user"}}
+t0 = time.perf_counter()
+at.run()
+ms = (time.perf_counter() - t0) * 1000
+loaded = [m for m in {heavy!r} if m in sys.modules and m not in before]
+print(json.dumps({{"ms": round(ms, 1), "heavy": loaded, "exceptions": [str(e.value) for e in at.exception]}}))
+"""
+
+
+def measure(page: str, signed_in: bool, db_path: str) -> dict:
+    code = _CHILD.format(root=ROOT, page=page, signed_in=signed_in, heavy=HEAVY_MODULES)
+    env = dict(os.environ, LUMINAIQ_DB_PATH=db_path, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, cwd=ROOT)
+    lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        return {"ms": None, "heavy": [], "exceptions": [proc.stderr.strip().splitlines()[-1:] or ["failed"]][0]}
+    return json.loads(lines[-1])
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Measure cold page import cost against per-page budgets.")
+    ap.add_argument("--pages", nargs="*", default=list(PAGES))
+    ap.add_argument("--json", help="write measurements to this file")
+    args = ap.parse_args(argv)
+
+    results, breaches = [], 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "budget.db")
+        measure("app.py", False, db_path)  # create the schema so pages see an empty, valid DB
+        for page in args.pages:
+            for mode in ("anonymous", "signed-in"):
+                r = measure(page, mode == "signed-in", db_path)
+                budget = BUDGET_MS.get(page, DEFAULT_BUDGET_MS)[mode]
+                bad = [m for m in r["heavy"] if m in FORBIDDEN[mode]]
+                ok = r["ms"] is not None and r["ms"] <= budget and not bad and not r["exceptions"]
+                breaches += not ok
+                results.append({"page": page, "mode": mode, "budget_ms": budget, "forbidden": bad, "ok": ok, **r})
+                ms = "—" if r["ms"] is None else f"{r['ms']:.0f}"
+                print(f"{'ok  ' if ok else 'OVER'} {page:36s} {mode:10s} {ms:>6s} / {budget} ms"
+                      f"  {', '.join(r['heavy']) or '-'}"
+                      + (f"  !! must not load: {', '.join(bad)}" if bad else "")
+                      + (f"  !! {'; '.join(r['exceptions'])}" if r["exceptions"] else ""))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    print(f"{len(results) - breaches}/{len(results)} within budget")
+    return 1 if breaches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
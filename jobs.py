@@ -0,0 +1,311 @@
+# jobs.py — background jobs: a worker process pool backed by the jobs table
+#
+# submit("dashboard_export", params, user_id=...) returns a job id at once; the
+# work runs in a separate process, so a browser refresh or a widget change no
+# longer throws it away. Workers report progress into the jobs table (db.py)
+# and write their result to JOB_DIR/<id>.pkl. Pages keep the job id in
+# session state (or find it again with db.list_jobs_for_user) and poll.
+#
+# Identical requests are not recomputed: a job's input hash covers its kind
+# and parameters (raw bytes by content), and a finished result — or a job
+# still in flight — with the same hash is reused.
+#
+# Several server processes may share one database. Each job row records the
+# process that queued it (OWNER: host, pid and a per-process boot id); on
+# start-up a process fails only orphans — jobs of its own earlier pool, or of
+# a process on this host that is no longer running — never a live
+# neighbour's. Jobs older than JOB_TTL_DAYS are deleted with their result files.
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import socket
+import sys
+import threading
+import types
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+import db
+from admission import MAX_PER_USER, MAX_QUEUE, AdmissionRefused
+
+JOB_DIR = os.getenv("LUMINAIQ_JOB_DIR", "job_results")
+JOB_WORKERS = int(os.getenv("LUMINAIQ_JOB_WORKERS", "2"))
+JOB_TTL_DAYS = float(os.getenv("LUMINAIQ_JOB_TTL_DAYS", "7"))
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat(timespec="seconds") + "Z"
+
+
+def input_hash(kind: str, params: dict) -> str:
+    """Stable hash of (kind, params); bytes values count by their content."""
+    def _default(o):
+        if isinstance(o, (bytes, bytearray)):
+            return {"sha1": hashlib.sha1(o).hexdigest()}
+        return str(o)
+    blob = json.dumps({"kind": kind, "params": params}, sort_keys=True, default=_default).encode("utf-8")
+    return hashlib.sha1(blob).hexdigest()
+
+
+# ---------- Job kinds (run in worker processes) ----------
+
+def _load_frame(dataset: dict):
+    """Upload record or mapped client entry → DataFrame (uncached; workers have no Streamlit runtime)."""
+    import pandas as pd
+    import client_data
+
+    entry = dataset.get("client")
+    if entry:
+        return client_data.apply_mapping(client_data.read_client_csv(entry["data"]), entry["mapping"])
+    return pd.read_csv(dataset.get("path", ""))
+
+
+def _dashboard_export(params: dict, progress: Callable[[float, str], None]) -> dict:
+    """Filtered CSV + chart PNGs of a Dashboard view, as a ZIP."""
+    import analytics
+    from deps import available
+
+    progress(0.05, "Loading dataset")
+    df = analytics.coerce_date_columns(_load_frame(params["dataset"]))
+    progress(0.35, "Applying filters")
+    view = analytics.apply_filters(df, **params["filters"])
+
+    figures = {}
+    sel_cat, sel_val, sel_dt = params.get("cat_col"), params.get("value_col"), params.get("date_col")
+    if params.get("png") and available("plotly") and available("kaleido"):
+        import plotly.express as px
+        import plotly.io as pio
+        progress(0.5, "Rendering charts")
+        if sel_cat and sel_val:
+            grp = analytics.category_breakdown(view, sel_cat, sel_val, top=20)
+            figures["chart_bar"] = px.bar(grp, x=sel_cat, y=sel_val, title=f"{sel_val} by {sel_cat} (Top 20)")
+        else:
+            num_cols = analytics.column_kinds(view)[0]
+            if num_cols:
+                figures["chart_bar"] = px.histogram(view, x=num_cols[0], title=f"Distribution of {num_cols[0]}")
+        if sel_dt and sel_val:
+            ts = analytics.time_series(view, sel_dt, sel_val)
+            if len(ts):
+                figures["chart_timeseries"] = px.line(ts, x=sel_dt, y=sel_val, title=f"{sel_val} over time")
+    else:
+        pio = None
+    progress(0.8, "Writing ZIP")
+    data = analytics.export_zip(view, figures, pio=pio)
+    return {"bytes": data, "filename": "export.zip", "mime": "application/zip", "rows": int(len(view))}
+
+
+def _forecast_comparison(params: dict, progress: Callable[[float, str], None]) -> dict:
+    """Fit every model family on one series and backtest each at the given horizons."""
+    import numpy as np
+    import pandas as pd
+    from forecasting import MODEL_KINDS, fit_model, rolling_origin_backtest, summarize_backtest
+
+    y = np.asarray(params["values"], dtype=float)
+    m = int(params.get("season_m", 1))
+    kinds = [k for k in MODEL_KINDS if k != "hw" or (m >= 2 and len(y) >= 2 * m + 1)]
+    frames = []
+    for i, kind in enumerate(kinds):
+        progress(0.05 + 0.9 * i / len(kinds), f"Fitting {kind}")
+        fit = fit_model(y, kind, m)
+        bt = rolling_origin_backtest(y, params["horizons"], n_folds=int(params.get("n_folds", 20)), fit=fit)
+        summary = summarize_backtest(bt, by="horizon")
+        summary.insert(0, "model", kind)
+        summary["alpha"] = float(fit["alpha"][0])
+        summary["beta"] = float(fit["beta"][0])
+        summary["gamma"] = float(fit["gamma"][0])
+        frames.append(summary)
+    table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return {"frame": table}
+
+
+JOB_KINDS: Dict[str, Callable[[dict, Callable[[float, str], None]], dict]] = {
+    "dashboard_export": _dashboard_export,
+    "forecast_comparison": _forecast_comparison,
+}
+
+
+def _execute(job_id: str, kind: str, params: dict) -> None:
+    """Worker entry point: run one job and record its outcome (never raises)."""
+    def progress(fraction: float, message: str = "") -> None:
+        db.update_job(job_id, progress=float(min(max(fraction, 0.0), 1.0)), message=message)
+
+    db.update_job(job_id, status="running", started_at=_now(), message="Started")
+    try:
+        result = JOB_KINDS[kind](params, progress)
+        os.makedirs(JOB_DIR, exist_ok=True)
+        path = os.path.join(JOB_DIR, f"{job_id}.pkl")
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+        db.update_job(job_id, status="done", progress=1.0, message="Done", result_path=path, finished_at=_now())
+    except Exception as e:
+        db.update_job(job_id, status="failed", error=f"{type(e).__name__}: {e}", finished_at=_now())
+
+
+# ---------- Housekeeping ----------
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # exists, owned by someone else
+        return True
+    return True
+
+
+def _orphaned(owner: str) -> bool:
+    """True when the process that queued the job can no longer run it."""
+    if owner == OWNER:  # our own pool is being (re)built: its jobs are gone
+        return True
+    host, pid, _ = (owner.split(":") + ["", ""])[:3]
+    if host != socket.gethostname() or not pid.isdigit():
+        return False  # another machine: cannot tell, leave it
+    # same host: dead process, or our pid reused after a restart
+    return int(pid) == os.getpid() or not _pid_alive(int(pid))
+
+
+def expire() -> int:
+    """Delete jobs older than JOB_TTL_DAYS and their result files; returns how many files went."""
+    cutoff = (datetime.utcnow() - timedelta(days=JOB_TTL_DAYS)).isoformat(timespec="seconds") + "Z"
+    removed = 0
+    for path in db.delete_jobs(cutoff):
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+# ---------- Submitting / polling (app process) ----------
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    One pool per server process (call with _pool_lock held). When it is
+    created or rebuilt, orphaned jobs (see _orphaned) are failed and expired
+    jobs deleted; jobs of other live processes are left alone.
+    """
+    global _pool
+    if _pool is None or getattr(_pool, "_broken", False):
+        db.init_db()
+        orphans = [o for o in db.unfinished_job_owners() if _orphaned(o)]
+        if orphans:
+            db.fail_unfinished_jobs("Interrupted: the worker stopped before the job finished.", _now(), orphans)
+        expire()
+        # spawn: the server process is multi-threaded, forking it is unsafe
+        _pool = ProcessPoolExecutor(max_workers=max(1, JOB_WORKERS),
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+@contextmanager
+def _plain_main():
+    """
+    spawn re-runs the parent's __main__ in every new worker, and under
+    Streamlit __main__ is the page script. Hide it while workers start.
+    """
+    main = sys.modules.get("__main__")
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+def submit(kind: str, params: dict, *, user_id: str, label: str = "") -> str:
+    """
+    Queue a job and return its id. A finished job with the same input hash is
+    reused (a new row pointing at the same result, so it shows in this user's
+    history); a queued/running one is joined. Raises AdmissionRefused when
+    the user or the whole queue already has too many jobs waiting.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    h = input_hash(kind, params)
+    with _pool_lock:
+        _get_pool()  # fails leftovers of a previous process before they can be joined
+    expire()
+
+    done = db.find_job(kind, h, statuses=("done",))
+    if done and done.get("result_path") and os.path.exists(done["result_path"]):
+        if done["user_id"] == str(user_id):
+            return done["id"]
+        job_id = uuid.uuid4().hex
+        db.insert_job(job_id, str(user_id), kind, h, label, _now(), OWNER, status="done",
+                      result_path=done["result_path"], message="Reused result of an identical job",
+                      finished_at=_now())
+        return job_id
+
+    pending = db.find_job(kind, h, statuses=("queued", "running"))
+    if pending and pending["user_id"] == str(user_id):
+        return pending["id"]
+
+    job_id = uuid.uuid4().hex
+    with _pool_lock:
+        pool = _get_pool()
+        # the pool runs JOB_WORKERS at a time; the backlog behind it is bounded too
+        mine = db.count_active_jobs(str(user_id))
+        if mine >= MAX_PER_USER:
+            raise AdmissionRefused(f"You already have {mine} background jobs queued or running — "
+                                   "wait for one to finish.")
+        if db.count_active_jobs() >= MAX_QUEUE:
+            raise AdmissionRefused("The job queue is full — please try again in a moment.")
+        db.insert_job(job_id, str(user_id), kind, h, label, _now(), OWNER)
+        with _plain_main():
+            pool.submit(_execute, job_id, kind, params)
+    return job_id
+
+
+def status(job_id: str) -> Optional[Dict[str, Any]]:
+    with _pool_lock:
+        _get_pool()
+    return db.get_job(job_id)
+
+
+def result(job: Dict[str, Any]) -> Optional[dict]:
+    """Load a finished job's result (None if not done or the file is gone)."""
+    path = (job or {}).get("result_path")
+    if not job or job.get("status") != "done" or not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def is_active(job: Optional[Dict[str, Any]]) -> bool:
+    return bool(job) and job["status"] in ("queued", "running")
+
+
+def poll(job_id: str, interval: float = 1.0) -> Optional[Dict[str, Any]]:
+    """
+    While the job is queued/running, show a progress bar that refreshes itself
+    every `interval` seconds (a fragment, not a full rerun) and return None;
+    the page reruns once when the job finishes. Returns the finished job row.
+    """
+    import streamlit as st
+
+    job = status(job_id)
+    if not is_active(job):
+        return job
+
+    @st.fragment(run_every=interval)
+    def _progress():
+        j = status(job_id)
+        if not is_active(j):
+            st.rerun()
+        st.progress(j["progress"], text=f"{j['label'] or j['kind']} — {j['message'] or j['status']}")
+
+    _progress()
+    return None
@@ -0,0 +1,207 @@
+# kpi_engine.py — safe, compiled KPI formulas for client mappings
+#
+# Formulas such as  (df['margin'].sum() / df['revenue'].sum()) * 100  are parsed
+# once into a small expression tree. Only column reductions, numeric constants
+# and arithmetic are accepted; nothing is ever passed to eval(). Identical
+# reductions across all KPIs of a mapping are computed once, and each column is
+# converted to a float array a single time.
+from __future__ import annotations
+
+import ast
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+REDUCTIONS = ("sum", "mean", "count", "min", "max")
+
+_BINOPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.FloorDiv: np.floor_divide,
+    ast.Mod: np.mod,
+    ast.Pow: np.power,
+}
+
+
+class FormulaError(ValueError):
+    """A KPI formula uses syntax outside the supported subset."""
+
+
+# ---------- Compile ----------
+# Tree nodes are plain tuples:
+#   ("const", float) | ("leaf", i) | ("neg", node) | ("bin", op, left, right)
+# where leaf i indexes the plan's shared (column, reduction) list.
+
+def _column_ref(node: ast.AST) -> Optional[str]:
+    """df['col'] → 'col'."""
+    if (
+        isinstance(node, ast.Subscript)
+        and isinstance(node.value, ast.Name) and node.value.id == "df"
+        and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str)
+    ):
+        return node.slice.value
+    return None
+
+
+def _build(node: ast.AST, leaves: Dict[Tuple[str, str], int]):
+    if isinstance(node, ast.Expression):
+        return _build(node.body, leaves)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return ("const", float(node.value))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        inner = _build(node.operand, leaves)
+        return ("neg", inner) if isinstance(node.op, ast.USub) else inner
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+        return ("bin", type(node.op), _build(node.left, leaves), _build(node.right, leaves))
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and not node.args and not node.keywords:
+        col = _column_ref(node.func.value)
+        fn = node.func.attr
+        if col is not None and fn in REDUCTIONS:
+            key = (col, fn)
+            if key not in leaves:
+                leaves[key] = len(leaves)
+            return ("leaf", leaves[key])
+    raise FormulaError(f"Unsupported expression: {ast.unparse(node)}")
+
+
+def compile_formula(formula: str, leaves: Optional[Dict[Tuple[str, str], int]] = None):
+    """Parse one formula; new (column, reduction) pairs are appended to `leaves`."""
+    leaves = {} if leaves is None else leaves
+    try:
+        tree = ast.parse(str(formula).strip(), mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"Invalid formula syntax: {e.msg}") from None
+    return _build(tree, leaves)
+
+
+@lru_cache(maxsize=256)
+def compile_plan(kpis: Tuple[Tuple[str, str, str], ...]) -> dict:
+    """
+    Compile (id, label, formula) triples into a shared evaluation plan.
+    Cached, so a mapping is parsed once per process.
+    """
+    leaves: Dict[Tuple[str, str], int] = {}
+    items = []
+    for kid, label, formula in kpis:
+        try:
+            items.append({"id": kid, "label": label, "tree": compile_formula(formula, leaves), "error": None})
+        except FormulaError as e:
+            items.append({"id": kid, "label": label, "tree": None, "error": str(e)})
+    by_column: Dict[str, List[Tuple[str, int]]] = {}
+    for (col, fn), i in leaves.items():
+        by_column.setdefault(col, []).append((fn, i))
+    return {"kpis": items, "n_leaves": len(leaves), "by_column": by_column}
+
+
+def plan_for_mapping(kpi_items: Iterable[dict]) -> dict:
+    """Plan for the `kpis:` list of a client mapping (YAML)."""
+    key = tuple(
+        (str(k.get("id", "")), str(k.get("label", k.get("id", "KPI"))), str(k.get("formula", "")))
+        for k in (kpi_items or [])
+        if isinstance(k, dict)
+    )
+    return compile_plan(key)
+
+
+# ---------- Evaluate ----------
+
+def _reduce_column(s: pd.Series, fns: List[Tuple[str, int]], out: np.ndarray) -> None:
+    """All requested reductions of one column from a single float conversion."""
+    wanted = {fn for fn, _ in fns}
+    vals: Dict[str, Any] = {}
+    if "count" in wanted:
+        vals["count"] = int(s.notna().sum())
+    if wanted - {"count"}:
+        arr = pd.to_numeric(s, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        arr = arr[~np.isnan(arr)]
+        total = float(arr.sum())
+        vals["sum"] = total
+        vals["mean"] = total / len(arr) if len(arr) else np.nan
+        if "min" in wanted or "max" in wanted:
+            vals["min"] = float(arr.min()) if len(arr) else np.nan
+            vals["max"] = float(arr.max()) if len(arr) else np.nan
+    for fn, i in fns:
+        out[i] = vals[fn]
+
+
+def _eval_tree(node, leaf_vals: np.ndarray):
+    kind = node[0]
+    if kind == "const":
+        return np.float64(node[1])
+    if kind == "leaf":
+        return leaf_vals[node[1]]
+    if kind == "neg":
+        return -_eval_tree(node[1], leaf_vals)
+    _, op, left, right = node
+    return _BINOPS[op](_eval_tree(left, leaf_vals), _eval_tree(right, leaf_vals))
+
+
+def evaluate_plan(
+    plan: dict,
+    df: pd.DataFrame,
+    aliases: Optional[Dict[str, str]] = None,
+    fallback: Optional[pd.DataFrame] = None,
+) -> List[dict]:
+    """
+    Evaluate every KPI of a plan against df. Returns [{id, label, value, error}];
+    a KPI that fails (bad syntax, missing column) does not affect the others.
+    `aliases` maps formula column names onto df columns (client name → canonical
+    field); columns found in neither are looked up in `fallback`.
+    """
+    aliases = aliases or {}
+    leaf_vals = np.full(plan["n_leaves"], np.nan)
+    missing = set()
+    for col, fns in plan["by_column"].items():
+        name = aliases.get(col, col)
+        if name in df.columns:
+            _reduce_column(df[name], fns, leaf_vals)
+        elif fallback is not None and col in fallback.columns:
+            _reduce_column(fallback[col], fns, leaf_vals)
+        else:
+            missing.add(col)
+
+    results = []
+    for item in plan["kpis"]:
+        error, value = item["error"], None
+        if error is None:
+            used = _leaves_of(item["tree"])
+            gone = sorted(c for c in missing if any(i in used for _, i in plan["by_column"][c]))
+            if gone:
+                error = f"Missing column(s): {', '.join(gone)}"
+            else:
+                with np.errstate(all="ignore"):
+                    v = _eval_tree(item["tree"], leaf_vals)
+                value = int(v) if _is_count_only(item["tree"], plan) else float(v)
+        results.append({"id": item["id"], "label": item["label"], "value": value, "error": error})
+    return results
+
+
+def _leaves_of(node) -> set:
+    kind = node[0]
+    if kind == "leaf":
+        return {node[1]}
+    if kind == "neg":
+        return _leaves_of(node[1])
+    if kind == "bin":
+        return _leaves_of(node[2]) | _leaves_of(node[3])
+    return set()
+
+
+def _is_count_only(node, plan: dict) -> bool:
+    """A bare df[col].count() stays an integer."""
+    if node[0] != "leaf":
+        return False
+    return any(fn == "count" and i == node[1] for fns in plan["by_column"].values() for fn, i in fns)
+
+
+def evaluate_kpis(
+    kpi_items: Iterable[dict],
+    df: pd.DataFrame,
+    aliases: Optional[Dict[str, str]] = None,
+    fallback: Optional[pd.DataFrame] = None,
+) -> List[dict]:
+    return evaluate_plan(plan_for_mapping(kpi_items), df, aliases=aliases, fallback=fallback)
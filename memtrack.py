@@ -0,0 +1,248 @@
+# memtrack.py — memory accounting per session, user and page
+#
+# Pages register the frames and buffers they hold (track("df", df, page=...)),
+# loaders register their cache entries (track_cache(...)). The registry is
+# process-wide, so an admin can see which sessions and datasets hold memory
+# (pages/5_Admin.py) and counters() can be scraped. fit_to_budget() enforces a
+# per-session limit by degrading a frame to a sample or a rollup instead of
+# letting the worker run out of memory.
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+SESSION_LIMIT_MB = float(os.getenv("LUMINAIQ_SESSION_MEM_MB", "1024"))
+MIN_SAMPLE_FRACTION = float(os.getenv("LUMINAIQ_MIN_SAMPLE_FRACTION", "0.25"))
+SESSION_IDLE_S = 1800  # session entries not refreshed for this long are dropped
+_SAMPLE_VALUES = 2000  # object columns: bytes estimated from this many values
+
+_lock = threading.Lock()
+_entries: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+_counters: Dict[str, float] = {
+    "tracked_updates_total": 0,
+    "degraded_sampled_total": 0,
+    "degraded_aggregated_total": 0,
+    "peak_tracked_bytes": 0,
+}
+
+
+# ---------- Sizing ----------
+
+def _object_bytes(values: np.ndarray) -> int:
+    n = len(values)
+    if n == 0:
+        return 0
+    if n <= _SAMPLE_VALUES:
+        sample = values
+    else:
+        sample = values[np.linspace(0, n - 1, _SAMPLE_VALUES).astype(np.int64)]
+    per_value = sum(sys.getsizeof(v) for v in sample) / len(sample)
+    return int(per_value * n) + values.nbytes
+
+
+def deep_bytes(obj) -> int:
+    """
+    Deep memory of a frame/series/array/bytes. Numeric and categorical columns
+    are exact; object columns are extrapolated from an evenly spaced sample,
+    so the cost stays flat on million-row frames.
+    """
+    if obj is None:
+        return 0
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return len(obj)
+    if isinstance(obj, np.ndarray):
+        return _object_bytes(obj) if obj.dtype == object else int(obj.nbytes)
+    if isinstance(obj, pd.Series):
+        obj = obj.to_frame()
+    if isinstance(obj, pd.DataFrame):
+        total = int(obj.index.memory_usage(deep=False))
+        for _, s in obj.items():
+            if s.dtype == object:
+                total += _object_bytes(s.to_numpy())
+            else:
+                total += int(s.memory_usage(index=False, deep=True))
+        return total
+    return sys.getsizeof(obj)
+
+
+def process_rss() -> Optional[int]:
+    """Resident set size of this process in bytes (Linux /proc, else peak RSS)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return int(peak if sys.platform == "darwin" else peak * 1024)
+    except Exception:
+        return None
+
+
+# ---------- Registry ----------
+
+def _session() -> Tuple[str, Optional[str]]:
+    """(session id, user id) of the running script; ("local", None) outside Streamlit."""
+    try:
+        import streamlit as st
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is None:
+            return "local", None
+        user = (st.session_state.get("user") or {}).get("id")
+        return ctx.session_id, None if user is None else str(user)
+    except Exception:
+        return "local", None
+
+
+def _put(key: Tuple[str, str, str], rec: Dict[str, Any]) -> None:
+    with _lock:
+        _entries[key] = rec
+        _counters["tracked_updates_total"] += 1
+        total = sum(e["bytes"] for e in _entries.values())
+        _counters["peak_tracked_bytes"] = max(_counters["peak_tracked_bytes"], total)
+
+
+def _shape(obj) -> Tuple[Optional[int], Optional[int]]:
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.shape[0]), int(obj.shape[1])
+    if isinstance(obj, (pd.Series, np.ndarray)):
+        return int(len(obj)), 1
+    return None, None
+
+
+def track(name: str, obj, *, page: str, kind: str = "dataset", nbytes: Optional[int] = None) -> int:
+    """Record what this session holds under (page, name); replaces the previous value."""
+    session, user = _session()
+    size = deep_bytes(obj) if nbytes is None else int(nbytes)
+    rows, cols = _shape(obj)
+    _put((session, page, name), {
+        "session": session, "user": user, "page": page, "name": name, "kind": kind,
+        "bytes": size, "rows": rows, "cols": cols, "updated": time.time(), "expires": None,
+    })
+    return size
+
+
+def track_cache(name: str, obj, *, ttl: Optional[float] = None) -> int:
+    """Record a shared cache entry (call on a cache miss); attributed to the user who caused it."""
+    _, user = _session()
+    size = deep_bytes(obj)
+    rows, cols = _shape(obj)
+    now = time.time()
+    _put(("cache", "cache", name), {
+        "session": "cache", "user": user, "page": "cache", "name": name, "kind": "cache",
+        "bytes": size, "rows": rows, "cols": cols, "updated": now, "expires": now + ttl if ttl else None,
+    })
+    return size
+
+
+def is_cached(name: str) -> bool:
+    """True while a track_cache() entry of that name is live (i.e. the cached value is warm)."""
+    with _lock:
+        e = _entries.get(("cache", "cache", name))
+        return e is not None and (e["expires"] is None or e["expires"] > time.time())
+
+
+def untrack(name: str, *, page: str) -> None:
+    session, _ = _session()
+    with _lock:
+        _entries.pop((session, page, name), None)
+
+
+def _prune(now: float) -> None:
+    stale = [
+        k for k, e in _entries.items()
+        if (e["expires"] is not None and e["expires"] < now)
+        or (e["expires"] is None and e["session"] != "cache" and now - e["updated"] > SESSION_IDLE_S)
+    ]
+    for k in stale:
+        del _entries[k]
+
+
+def snapshot() -> List[Dict[str, Any]]:
+    """All live entries (stale sessions and expired cache entries are dropped first)."""
+    with _lock:
+        _prune(time.time())
+        return [dict(e) for e in _entries.values()]
+
+
+def session_bytes(session: Optional[str] = None, exclude: Tuple[str, ...] = ()) -> int:
+    """Bytes held by one session (the current one by default), cache entries excluded."""
+    session = session or _session()[0]
+    with _lock:
+        return sum(
+            e["bytes"] for (s, p, n), e in _entries.items()
+            if s == session and (p, n) not in exclude
+        )
+
+
+def counters() -> Dict[str, float]:
+    """Counters/gauges for scraping: totals by kind, sessions, degradations, RSS."""
+    entries = snapshot()
+    out: Dict[str, float] = dict(_counters)
+    out["tracked_bytes"] = sum(e["bytes"] for e in entries)
+    for kind in ("dataset", "view", "cache", "export"):
+        out[f"tracked_bytes_{kind}"] = sum(e["bytes"] for e in entries if e["kind"] == kind)
+    out["sessions"] = len({e["session"] for e in entries if e["session"] != "cache"})
+    out["session_limit_bytes"] = SESSION_LIMIT_MB * 1024 * 1024
+    rss = process_rss()
+    if rss is not None:
+        out["process_rss_bytes"] = rss
+    return out
+
+
+def counters_text(prefix: str = "luminaiq_memory_") -> str:
+    """counters() in the Prometheus text exposition format."""
+    return "".join(f"{prefix}{k} {v:g}\n" for k, v in counters().items())
+
+
+# ---------- Budget ----------
+
+def _count(name: str) -> None:
+    with _lock:
+        _counters[name] += 1
+
+
+def fit_to_budget(df: pd.DataFrame, *, page: str, name: str = "df", rollup=None) -> Tuple[pd.DataFrame, dict]:
+    """
+    Keep the session under SESSION_LIMIT_MB. Returns (frame, info) where
+    info["mode"] is:
+      "full"       — df fits as is
+      "sampled"    — a reproducible row sample of at least MIN_SAMPLE_FRACTION fits
+      "aggregated" — rollup(df) (e.g. analytics.rollup) when even the sample would not fit
+    The result is tracked under (page, name).
+    """
+    limit = SESSION_LIMIT_MB * 1024 * 1024
+    size = deep_bytes(df)
+    others = session_bytes(exclude=((page, name),))
+    room = max(0.0, limit - others)
+    info = {"mode": "full", "bytes": size, "limit": int(limit), "other_bytes": others, "fraction": 1.0}
+
+    if size > room and len(df):
+        # a sample's index is a materialised int64 index, not a RangeIndex
+        sampled_size = size + (8 * len(df) if isinstance(df.index, pd.RangeIndex) else 0)
+        fraction = room / sampled_size * 0.9  # headroom for views derived from it
+        if fraction >= MIN_SAMPLE_FRACTION:
+            df = df.sample(frac=fraction, random_state=0).sort_index()
+            info.update(mode="sampled", fraction=round(fraction, 4))
+            _count("degraded_sampled_total")
+        elif rollup is not None:
+            df = rollup(df)
+            info.update(mode="aggregated", fraction=None)
+            _count("degraded_aggregated_total")
+        else:
+            fraction = max(fraction, 0.01)
+            df = df.sample(frac=fraction, random_state=0).sort_index()
+            info.update(mode="sampled", fraction=round(fraction, 4))
+            _count("degraded_sampled_total")
+        info["bytes"] = deep_bytes(df)
+
+    track(name, df, page=page, kind="dataset", nbytes=info["bytes"])
+    return df, info
@@ -1,23 +1,12 @@
 # pages/1_Overview.py
-import pandas as pd
 import streamlit as st
 from db import list_uploads_for_user
-from components import kpi
-
-try:
-    from components import kpi
-except Exception:
-    import streamlit as st
-    def kpi(label, value, delta=None, help=None):
-        st.metric(label, value, delta=delta, help=help)
+from deps import available, lazy
+from profiler import start_run, stage, render_panel
 
-
-# Plotly optional
-try:
-    import plotly.express as px
-    HAS_PLOTLY = True
-except Exception:
-    HAS_PLOTLY = False
+# Plotly optional (imported on first chart, not with the page)
+HAS_PLOTLY = available("plotly")
+px = lazy("plotly.express")
 
 st.set_page_config(page_title="Overview • LuminaIQ", page_icon="📈", layout="wide")
 
@@ -26,17 +15,36 @@ if not user:
     st.warning("Please sign in from the Home page.")
     st.stop()
 
+start_run("Overview")
+
+# heavy: loaded after the auth guard
+stage("imports")
+import pandas as pd
+from memtrack import track
+from admission import heavy
+from datasets import load_cost_mb
+from appends import preview, build_preview
+
+try:
+    from components import kpi_row
+except Exception:
+    def kpi_row(items):
+        for col, it in zip(st.columns(len(items)), items):
+            col.metric(it.get("label", ""), it.get("value", ""), delta=it.get("delta"), help=it.get("help"))
+
 st.title("📈 Overview")
 
+stage("uploads")
 uploads = list_uploads_for_user(user_id=user["id"])
 rows_total = sum(u.get("rows", 0) or 0 for u in uploads) if uploads else 0
 last_upload = uploads[0]["uploaded_at"] if uploads else "—"
 
-# --- KPI header ---
-c1, c2, c3 = st.columns(3)
-with c1: kpi("Total datasets", f"{len(uploads):,}")
-with c2: kpi("Total rows", f"{rows_total:,}")
-with c3: kpi("Last upload", f"{last_upload}")
+# --- KPI header (one element) ---
+kpi_row([
+    {"label": "Total datasets", "value": f"{len(uploads):,}"},
+    {"label": "Total rows", "value": f"{rows_total:,}"},
+    {"label": "Last upload", "value": f"{last_upload}"},
+])
 
 st.divider()
 st.subheader("Recent uploads")
@@ -54,17 +62,29 @@ latest = uploads[0]
 st.subheader(f"Quick glance: {latest['filename']}")
 
 try:
-    # Read from URL or local path
-    path = latest.get("path", "")
-    df = pd.read_csv(path)
+    # From the preview stored with the upload (first rows, column kinds,
+    # pre-binned histograms), so the page never reads the dataset itself;
+    # uploads older than previews are read once to build theirs
+    stage("read preview")
+    snap = preview(latest)
+    if snap is None:
+        with heavy("dataset load", cost_mb=load_cost_mb(latest)):
+            snap = build_preview(latest)
+    head = snap["head"]
+    track("latest", head, page="Overview")
 
-    st.dataframe(df.head(10), use_container_width=True)
+    st.dataframe(head, use_container_width=True)
+    st.caption(" · ".join(f"{c}: {kind}" for c, kind in snap["types"].items()))
 
     # Try a quick chart if any numeric column exists
-    num_cols = df.select_dtypes("number").columns.tolist()
+    stage("chart")
+    num_cols = list(snap["histograms"])
     if num_cols:
+        hist = snap["histograms"][num_cols[0]]
         if HAS_PLOTLY:
-            fig = px.histogram(df, x=num_cols[0])
+            fig = px.bar(hist, x=(hist["from"] + hist["to"]) / 2, y="rows",
+                         labels={"x": num_cols[0]}, title=f"Distribution of {num_cols[0]}")
+            fig.update_traces(width=float((hist["to"] - hist["from"]).iloc[0]) or None)
             st.plotly_chart(fig, use_container_width=True)
             # PNG export button (enabled in section B below)
             from io import BytesIO
@@ -77,6 +97,8 @@ try:
             except Exception as e:
                 st.caption("Tip: add `kaleido` to requirements.txt to enable PNG export.")
         else:
-            st.bar_chart(df[num_cols[0]])
+            st.bar_chart(hist.set_index("from")["rows"])
 except Exception as e:
     st.warning(f"Could not preview latest dataset: {e}")
+
+render_panel()
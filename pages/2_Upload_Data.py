@@ -1,12 +1,12 @@
 # pages/2_Upload_Data.py
 from __future__ import annotations
-import io, os, hashlib
+import io, os, hashlib, uuid
 from datetime import datetime
 
-import pandas as pd
 import streamlit as st
 
 from db import insert_upload, list_uploads_for_user
+from profiler import start_run, stage, render_panel
 
 # Try storage upload (Supabase); if not available we fall back to local
 try:
@@ -23,6 +23,13 @@ if not user:
     st.warning("Please sign in from the Home page.")
     st.stop()
 
+start_run("Upload Data")
+
+stage("imports")
+import pandas as pd  # heavy: loaded after the auth guard
+from memtrack import track
+from appends import SchemaMismatch, append_rows, record_upload
+
 st.title("📤 Upload Data")
 
 # ---------- helpers ----------
@@ -33,17 +40,42 @@ def _read_csv_bytes(b: bytes) -> pd.DataFrame:
 def _md5_digest(b: bytes) -> str:
     return hashlib.md5(b).hexdigest()[:8]
 
+def _save_local(name: str, b: bytes) -> str:
+    """Write the upload under its own file name (appends write to it in place, so never share one)."""
+    os.makedirs("uploads", exist_ok=True)
+    path = os.path.join("uploads", f"{uuid.uuid4().hex[:12]}__{name.replace(' ', '_')}")
+    pd.read_csv(io.BytesIO(b)).to_csv(path, index=False)
+    return path
+
 # (optional) enforce schema here if needed
 REQUIRED_COLUMNS: list[str] = []   # e.g. ["Year", "Median_Value_ZAR"]
 
 # ---------- uploader ----------
-uploaded = st.file_uploader("Upload a CSV file", type=["csv"], key="csv_uploader")
+stage("uploader")
+# Append mode: a delta extract is validated against the stored schema and added
+# to an existing dataset (only its own rows are processed; see appends.py)
+mode = st.radio("Mode", ["New dataset", "Append to existing dataset"], horizontal=True, key="upload_mode")
+target = None
+if mode == "Append to existing dataset":
+    appendable = {r["id"]: r for r in list_uploads_for_user(user_id=user["id"]) if os.path.isfile(r["path"])}
+    if not appendable:
+        st.info("Appending needs a dataset stored on this server — upload the first full file as a new dataset.")
+        st.stop()
+    target = appendable[st.selectbox(
+        "Dataset to append to", list(appendable), key="append_target",
+        format_func=lambda i: f"{appendable[i]['filename']} — {appendable[i]['rows']:,} rows · "
+                              f"uploaded {appendable[i]['uploaded_at']}",
+    )]
+uploaded = st.file_uploader("Upload a CSV file" if target is None else "Upload the new rows (CSV with the same columns)",
+                            type=["csv"], key="csv_uploader")
 
 if uploaded is not None:
     try:
         # read once
+        stage("parse csv")
         file_bytes = uploaded.read()
         df = _read_csv_bytes(file_bytes)
+        track("upload", df, page="Upload Data")
 
         # metadata for user feedback
         digest = _md5_digest(file_bytes)
@@ -57,48 +89,66 @@ if uploaded is not None:
             st.error(f"Missing required columns: {', '.join(missing)}")
             st.stop()
 
-        # try cloud first
-        save_path_for_db: str
-        if HAS_CLOUD:
+        full_digest = hashlib.md5(file_bytes).hexdigest()
+        saved_key = f"uploaded:{full_digest}"
+        if target is not None:
+            stage("append")
+            done_key = f"appended:{target['id']}:{full_digest}"
             try:
-                _, public_url = upload_bytes(
-                    filename=uploaded.name,
-                    content=file_bytes,
-                    content_type="text/csv",
-                )
-                save_path_for_db = public_url
-                st.toast("✅ Upload saved to cloud storage", icon="✅")
-            except Exception as e:
-                st.warning(f"Cloud storage unavailable ({e}). Saving locally for now.")
-                os.makedirs("uploads", exist_ok=True)
-                local_path = os.path.join("uploads", uploaded.name.replace(" ", "_"))
-                # Reconstruct CSV bytes to disk
-                pd.read_csv(io.BytesIO(file_bytes)).to_csv(local_path, index=False)
-                save_path_for_db = local_path
+                if done_key not in st.session_state:  # the uploader keeps the file across reruns
+                    st.session_state[done_key] = append_rows(target, df, digest=full_digest)
+                res = st.session_state[done_key]
+                st.success(f"Appended {res['rows']:,} rows to **{target['filename']}** — "
+                           f"{res['total_rows']:,} rows in total.")
+            except SchemaMismatch as e:
+                st.error(f"These rows don't match **{target['filename']}**:\n"
+                         + "\n".join(f"- {p}" for p in e.problems))
+            except ValueError as e:
+                st.warning(str(e))
+        elif saved_key in st.session_state:  # the uploader keeps the file across reruns: store it once
+            st.caption(f"Saved as upload #{st.session_state[saved_key]}.")
         else:
-            # local fallback
-            os.makedirs("uploads", exist_ok=True)
-            local_path = os.path.join("uploads", uploaded.name.replace(" ", "_"))
-            pd.read_csv(io.BytesIO(file_bytes)).to_csv(local_path, index=False)
-            save_path_for_db = local_path
-            st.info("Saving locally (cloud storage not configured).")
-
-        # record in DB (path will be public URL or local path as above)
-        insert_upload(
-            user_id=user["id"],
-            filename=uploaded.name,
-            path=save_path_for_db,
-            uploaded_at=datetime.utcnow().isoformat(timespec="seconds") + "Z",
-            rows=int(rows),
-            cols=int(cols),
-        )
-        st.toast("Upload recorded", icon="📦")
+            # try cloud first
+            stage("store")
+            save_path_for_db: str
+            if HAS_CLOUD:
+                try:
+                    _, public_url = upload_bytes(
+                        filename=uploaded.name,
+                        content=file_bytes,
+                        content_type="text/csv",
+                    )
+                    save_path_for_db = public_url
+                    st.toast("✅ Upload saved to cloud storage", icon="✅")
+                except Exception as e:
+                    st.warning(f"Cloud storage unavailable ({e}). Saving locally for now.")
+                    save_path_for_db = _save_local(uploaded.name, file_bytes)
+            else:
+                # local fallback
+                save_path_for_db = _save_local(uploaded.name, file_bytes)
+                st.info("Saving locally (cloud storage not configured).")
+
+            # record in DB (path will be public URL or local path as above)
+            upload_id = insert_upload(
+                user_id=user["id"],
+                filename=uploaded.name,
+                path=save_path_for_db,
+                uploaded_at=datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                rows=int(rows),
+                cols=int(cols),
+            )
+            # schema + profile for later appends
+            nbytes = os.path.getsize(save_path_for_db) if os.path.isfile(save_path_for_db) else len(file_bytes)
+            record_upload(upload_id, df, nbytes)
+            st.session_state[saved_key] = upload_id
+            st.toast("Upload recorded", icon="📦")
 
     except Exception as e:
         st.error(f"Failed to process file: {e}")
 
 st.divider()
 st.subheader("Your uploads")
+stage("uploads list")
 
 records = list_uploads_for_user(user_id=user["id"])
 if not records:
@@ -108,3 +158,5 @@ else:
     df_up = pd.DataFrame(records)
     keep_cols = [c for c in ["filename", "uploaded_at", "rows", "cols", "path"] if c in df_up.columns]
     st.dataframe(df_up[keep_cols], use_container_width=True)
+
+render_panel()
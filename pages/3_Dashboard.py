@@ -1,28 +1,19 @@
 # pages/3_Dashboard.py
 import json
-from io import BytesIO
-from zipfile import ZipFile, ZIP_DEFLATED
 
-import pandas as pd
 import streamlit as st
 
-from db import list_uploads_for_user, save_view, list_views, delete_view
+from db import list_uploads_for_user, save_view, list_views, delete_view, list_jobs_for_user
+from deps import available, lazy
+from profiler import start_run, stage, span, render_panel
 
-# --- Plotly optional ---
-try:
-    import plotly.express as px
-    HAS_PLOTLY = True
-except Exception:
-    HAS_PLOTLY = False
+# --- Plotly optional (imported on first chart, not with the page) ---
+HAS_PLOTLY = available("plotly")
+px = lazy("plotly.express")
+go = lazy("plotly.graph_objects")
 
 # --- Kaleido (for PNG export) optional ---
-try:
-    import kaleido  # noqa: F401
-    import plotly.io as pio
-    HAS_KALEIDO = True
-except Exception:
-    HAS_KALEIDO = False
-    pio = None  # type: ignore
+HAS_KALEIDO = HAS_PLOTLY and available("kaleido")
 
 st.set_page_config(page_title="Dashboards • LuminaIQ", page_icon="📊", layout="wide")
 
@@ -57,10 +48,35 @@ if not user:
     st.warning("Please sign in from the Home page.")
     st.stop()
 
+start_run("Dashboard")
+
+# heavy: loaded after the auth guard
+stage("imports")
+import pandas as pd
+from datasets import (
+    load_dataset, client_dataset_option, is_loaded, load_cost_mb, dataset_key, load_sample, load_sketches,
+    view_aggregate, is_aggregated, view_pivot, is_pivoted, remote_columns, stored_columns,
+)
+from analytics import coerce_date_columns, column_kinds, apply_filters, rollup, pivot, ROLLUP_COUNT
+from memtrack import fit_to_budget, track, is_cached
+import rolling
+import sampling
+import sketches
+from admission import heavy, AdmissionRefused
+import api_client as api
+from jobs import submit as submit_job, poll as poll_job, result as job_result
+import warmup
+
+warmup.start()  # no-op once running; covers deep links that skip the Home page's bootstrap
+
 st.title("📊 Dashboards")
 
 # ---------- Dataset picker ----------
+stage("dataset picker")
 uploads = list_uploads_for_user(user_id=user["id"])
+client_ds = client_dataset_option()  # mapped CSV from the Client Template page
+if client_ds:
+    uploads = uploads + [client_ds]
 if not uploads:
     st.info("Upload a dataset first.")
     st.stop()
@@ -83,35 +99,136 @@ _set_qp({"dataset": choice})
 
 ds = options[choice]  # <- FIX: define ds from selection
 
-# ---------- Load data (URL or local path) ----------
-@st.cache_data(ttl=300, show_spinner=False)
-def _load_csv(path: str) -> pd.DataFrame:
-    return pd.read_csv(path)
-
-path = ds.get("path", "")
-try:
-    df = _load_csv(path)
-except Exception as e:
-    st.error(f"Could not read dataset: {e}")
-    st.stop()
-
-# Try to coerce any date-like columns
-for c in df.columns:
-    if any(k in c.lower() for k in ("date", "day", "time")):
-        try:
-            df[c] = pd.to_datetime(df[c], errors="ignore")
-        except Exception:
-            pass
-
-num_cols = df.select_dtypes("number").columns.tolist()
-cat_cols = df.select_dtypes(include=["object", "category"]).columns.tolist()
-dt_cols  = df.select_dtypes(include=["datetime", "datetimetz"]).columns.tolist()
+# ---------- Analytics API ----------
+# With LUMINAIQ_API_URL set, uploads are computed by the analytics API (full
+# dataset, shared warm cache): this process never parses or holds the rows.
+# The widgets are built from the API's column list, date ranges and stored
+# column sketches; totals, charts and pivots come back already aggregated.
+remote = None
+if api.enabled() and ds.get("id") is not None:
+    stage("api columns")
+    try:
+        remote = remote_columns(dataset_key(ds), ds["id"], str(user["id"]))
+    except AdmissionRefused as e:
+        st.warning(f"⏸️ {e}")
+        st.stop()
+    except api.ApiError as e:
+        st.caption(f"Analytics API unavailable — computed locally ({e}).")
+
+# On large uploads approximate mode (below) answers from a stratified sample
+# held once per process (datasets.load_sample): the page then takes the column
+# list from the upload's stored schema and profile and never loads the rows.
+# "Exact answer" loads them for one run.
+exact_once = st.session_state.pop("dash_exact_once", False)
+meta = remote
+if (not remote and (ds.get("rows") or 0) > 2 * sampling.SAMPLE_ROWS
+        and st.session_state.get("dash_approx", True) and not exact_once):
+    meta = stored_columns(ds)
+sample_only = meta is not None and not remote
+
+if remote or sample_only:
+    df = None
+    mem = {"mode": "remote" if remote else "full", "fraction": 1.0}
+    n_rows, n_cols = meta["rows"], len(meta["columns"])
+    num_cols, cat_cols, dt_cols = list(meta["numeric"]), list(meta["categorical"]), list(meta["datetime"])
+else:
+    # ---------- Load data (URL or local path) ----------
+    stage("load dataset")
+    try:
+        with heavy("dataset load", cost_mb=load_cost_mb(ds), skip=is_loaded(ds)):
+            df = load_dataset(ds)
+    except Exception as e:
+        st.error(f"Could not read dataset: {e}")
+        st.stop()
+
+    # Try to coerce any date-like columns
+    stage("date coercion")
+    df = coerce_date_columns(df)
+
+    # Per-session memory limit: degrade to a row sample, or to a rollup, instead of
+    # holding more than the session is allowed
+    df, mem = fit_to_budget(df, page="Dashboard", rollup=rollup)
+    if mem["mode"] == "sampled":
+        st.warning(f"This dataset is larger than this session's memory limit — showing a "
+                   f"{mem['fraction']:.0%} row sample. Totals cover the sample only.")
+    elif mem["mode"] == "aggregated":
+        st.warning("This dataset is larger than this session's memory limit — showing values summed per "
+                   "date and category. Row-level columns (IDs) are not available.")
+    n_rows, n_cols = df.shape
+    num_cols, cat_cols, dt_cols = column_kinds(df)
+    num_cols = [c for c in num_cols if c != ROLLUP_COUNT]
 
 if not num_cols:
     st.info("No numeric columns detected — some charts and KPIs may be limited.")
 
+# Column sketches (sketches.py): cardinality and most frequent values of the
+# text columns without listing their distinct values, bounds and percentiles
+# of the numeric ones without scanning them; identifier-like columns (order
+# ids, emails) are not offered as categories
+stage("column sketches")
+frame_key = f"{dataset_key(ds)}~{mem['fraction']}"  # the dataset version, as held by this session
+# the whole upload, row positions as index: caches extend the previous version's results after an append
+whole_ds = ds if mem["mode"] == "full" else None
+if remote:
+    col_sketches = remote["sketches"]
+else:
+    col_sketches = load_sketches(frame_key, ds, df, raw=mem["mode"] != "aggregated")
+col_info = {c: sketches.summary(col_sketches[c]) for c in cat_cols if c in col_sketches}
+id_cols = [c for c in cat_cols if col_info.get(c, {}).get("kind") == "identifier"]
+cat_cols = [c for c in cat_cols if c not in id_cols]
+
+if st.session_state.get("dash_cat", "—") not in ["—"] + cat_cols:
+    st.session_state["dash_cat"] = "—"  # e.g. a saved view on a column now classified as an identifier
+
+# ---------- Approximate mode ----------
+# On large datasets the KPIs and charts are estimated from a cached stratified
+# sample (sampling.py), so filtering costs the same at any dataset size;
+# "Exact answer" computes the current view on the full data for one run.
+can_approx = mem["mode"] not in ("aggregated", "remote") and n_rows > 2 * sampling.SAMPLE_ROWS
+approx = can_approx and st.toggle(
+    "Approximate mode", value=True, key="dash_approx",
+    help=f"Estimate from a ~{sampling.SAMPLE_ROWS:,}-row sample stratified by date and category, "
+         "with 95% error bars.",
+) and not exact_once
+if approx:
+    # stratify by the selected date/category, else the first of each kind
+    strat_dt = st.session_state.get("dash_dt", "—")
+    strat_dt = strat_dt if strat_dt in dt_cols else (dt_cols[0] if dt_cols else None)
+    strat_cat = st.session_state["dash_cat"] if st.session_state.get("dash_cat", "—") != "—" else next(
+        (c for c in cat_cols if col_info.get(c, {}).get("kind") == "categorical"), None)
+    # building reads the whole upload once (unless this session holds it): stratum keys + draw ≈ 24 bytes a row
+    stage("sample")
+    with heavy("sample build", cost_mb=n_rows * 24 / (1024 * 1024) + (load_cost_mb(ds) if df is None else 0),
+               skip=is_cached(f"sample:{frame_key}:{strat_dt}:{strat_cat}")):
+        sample = load_sample(frame_key, strat_dt, strat_cat, ds, None if mem["mode"] == "full" else df)
+
 # ---------- Filters ----------
+stage("filter widgets")
 MAX_CAT_OPTIONS = 500  # guard against huge pickers
+# rows the widgets fall back on when a column has no stored sketch: the loaded
+# frame, or the sample when only the sample is held
+base = df if df is not None or not approx else sample["frame"]
+
+
+def _api(fn, **kwargs):
+    """fn on the analytics API for this upload; a refusal or an outage stops the page with a message."""
+    try:
+        return fn(ds["id"], str(user["id"]), **kwargs)
+    except AdmissionRefused as e:
+        st.warning(f"⏸️ {e}")
+    except api.ApiError as e:
+        st.warning(f"Analytics API unavailable ({e}) — reload the page to compute locally.")
+    st.stop()
+
+
+def _distinct_values(col: str, query: str = "") -> list:
+    """Sorted distinct values of col containing query (case-insensitive), at most MAX_CAT_OPTIONS."""
+    if remote:
+        return _api(api.values, column=col, query=query, limit=MAX_CAT_OPTIONS)
+    uniq = pd.Series(base[col].dropna().unique()).astype(str)
+    if query:
+        uniq = uniq[uniq.str.lower().str.contains(query.lower(), regex=False)]
+    return sorted(uniq)[:MAX_CAT_OPTIONS]
 
 with st.expander("Filters", True):
     colf1, colf2, colf3, colf4 = st.columns(4)
@@ -120,8 +237,12 @@ with st.expander("Filters", True):
     sel_dt  = colf3.selectbox("Date (optional)", ["—"] + dt_cols, key="dash_dt")
 
     # Safer date-range: handle NaT/mixed/empty gracefully
-    if sel_dt != "—" and len(df):
-        s = pd.to_datetime(df[sel_dt], errors="coerce")
+    if sel_dt != "—" and n_rows:
+        if meta is not None:
+            bounds = meta["date_ranges"].get(sel_dt)
+            s = pd.to_datetime(pd.Series(bounds or [], dtype=object), errors="coerce")
+        else:
+            s = pd.to_datetime(df[sel_dt], errors="coerce")
         if s.notna().any():
             dmin, dmax = s.min().date(), s.max().date()
             drange = colf4.date_input("Date range", (dmin, dmax), key="dash_drange")
@@ -131,14 +252,31 @@ with st.expander("Filters", True):
     else:
         drange = None
 
+    if id_cols:
+        st.caption(f"Identifier-like columns (not offered as categories): {', '.join(id_cols)}")
+
     # Searchable category values (with cardinality guard)
     cat_query = ""
     keep_vals = []
     if sel_cat != "—":
-        all_vals = sorted(v for v in df[sel_cat].dropna().astype(str).unique())
-        if len(all_vals) > MAX_CAT_OPTIONS:
-            st.warning(f"{sel_cat} has {len(all_vals):,} unique values; showing first {MAX_CAT_OPTIONS}. Use search to narrow.")
+        info = col_info.get(sel_cat)
+        if info is None:  # not sketched (e.g. the aggregated frame)
+            all_vals = _distinct_values(sel_cat)
+            n_vals = len(all_vals) if remote else int(base[sel_cat].nunique())
+        else:
+            # every value while the sketch still counts each one, else the most frequent first
+            all_vals = [v for v, _ in sketches.top_values(col_sketches[sel_cat])]
+            if info["exact"]:
+                all_vals.sort()
+            n_vals = info["distinct"]
+        if n_vals > MAX_CAT_OPTIONS:
+            approx_n = "" if info is None or info["exact"] else "about "
+            st.warning(f"{sel_cat} has {approx_n}{n_vals:,} unique values; showing the "
+                       f"{'first' if info is None else 'most frequent'} {MAX_CAT_OPTIONS}. Use search to find others.")
             all_vals = all_vals[:MAX_CAT_OPTIONS]
+            if info is not None and info["kind"] != "categorical":
+                rows_nn = max(1, info["rows"] - info["nulls"])
+                st.caption("Most frequent: " + ", ".join(f"{v} ({c / rows_nn:.1%})" for v, c in info["top"]))
 
         cat_query = st.text_input(
             f"Search {sel_cat} values",
@@ -148,7 +286,11 @@ with st.expander("Filters", True):
         )
         if cat_query:
             q = cat_query.lower()
-            all_vals = [v for v in all_vals if q in v.lower()]
+            if n_vals > len(all_vals):
+                # values beyond the list: search the column's distinct values
+                all_vals = _distinct_values(sel_cat, cat_query)
+            else:
+                all_vals = [v for v in all_vals if q in v.lower()]
 
         # Preserve previously selected values if still present
         default_sel = [v for v in st.session_state.get("dash_keep_vals", []) if v in all_vals]
@@ -163,98 +305,225 @@ with st.expander("Filters", True):
     # Numeric range filter for selected value
     num_range = None
     if sel_val:
-        series_numeric = pd.to_numeric(df[sel_val], errors="coerce")
-        col_min = float(series_numeric.min()) if series_numeric.notna().any() else 0.0
-        col_max = float(series_numeric.max()) if series_numeric.notna().any() else 0.0
+        val_sketch = col_sketches.get(sel_val)
+        if val_sketch is None or val_sketch.get("kind") != "number":
+            val_sketch = (_api(api.sketch, column=sel_val) if remote
+                          else sketches.sketch_column(pd.to_numeric(base[sel_val], errors="coerce")))
+        col_min = val_sketch["min"] if val_sketch["min"] is not None else 0.0
+        col_max = val_sketch["max"] if val_sketch["max"] is not None else 0.0
         num_range = st.slider(
             f"{sel_val} range",
             min_value=float(col_min),
             max_value=float(col_max),
-            value=st.session_state.get("dash_val_range", (float(col_min), float(col_max))),
             key="dash_val_range",
+            # the default only until the range is set (by the user, a saved view or the percentile button)
+            **({} if "dash_val_range" in st.session_state else {"value": (float(col_min), float(col_max))}),
         )
+        if val_sketch["min"] is not None:
+            p01, p25, p50, p75, p99 = sketches.quantile(val_sketch, [0.01, 0.25, 0.5, 0.75, 0.99])
+            cq, cp = st.columns([4, 1])
+            cq.caption(f"Percentiles (≈): 1% {p01:,.2f} · 25% {p25:,.2f} · median {p50:,.2f} · "
+                       f"75% {p75:,.2f} · 99% {p99:,.2f}")
 
-# ---------- Apply filters ----------
-df_view = df.copy()
-
-# Date
-if sel_dt != "—" and drange:
-    d0, d1 = pd.to_datetime(drange[0]), pd.to_datetime(drange[1])
-    sdt = pd.to_datetime(df_view[sel_dt], errors="coerce")
-    df_view = df_view[(sdt.dt.date >= d0.date()) & (sdt.dt.date <= d1.date())]
+            def _trim(lo=float(p01), hi=float(p99)):
+                st.session_state["dash_val_range"] = (lo, hi)
 
-# Category
-if sel_cat != "—" and keep_vals:
-    df_view = df_view[df_view[sel_cat].astype(str).isin(keep_vals)]
+            cp.button("1st–99th percentile", key="dash_val_trim", on_click=_trim, use_container_width=True,
+                      help="Set the range to exclude the top and bottom 1% of values.")
 
-# Numeric range
-if sel_val and num_range:
-    v0, v1 = num_range
-    sv = pd.to_numeric(df_view[sel_val], errors="coerce")
-    df_view = df_view[(sv >= v0) & (sv <= v1)]
+# ---------- Apply filters ----------
+stage("apply filters")
+filters = dict(
+    date_col=sel_dt if sel_dt != "—" else None, drange=drange,
+    cat_col=sel_cat if sel_cat != "—" else None, keep_vals=keep_vals,
+    value_col=sel_val, num_range=num_range,
+)
+if approx:
+    ca, cb = st.columns([5, 1])
+    ca.caption(f"≈ Estimated from a {len(sample['frame']):,}-row stratified sample of {n_rows:,} rows "
+               f"(by {', '.join(sample['by']) or 'row'}); ± and error bars are 95% intervals.")
+    cb.button("Exact answer", key="dash_exact", use_container_width=True,
+              on_click=lambda: st.session_state.update(dash_exact_once=True),
+              help="Load the full data and compute this view exactly, for one run.")
+if remote:
+    df_view = None  # filtered by the API, per request
+else:
+    df_view = apply_filters(sample["frame"] if approx else df, **filters)
+    track("df_view", df_view, page="Dashboard", kind="view", nbytes=0 if df_view is df else None)
 
 # ---------- KPIs ----------
-from components import kpi
-rows, cols = df_view.shape
-c1, c2, c3 = st.columns(3)
-with c1:
-    kpi("Rows", f"{rows:,}")
-with c2:
-    kpi("Columns", f"{cols:,}")
-with c3:
-    if sel_val:
-        kpi(f"Total {sel_val}", f"{pd.to_numeric(df_view[sel_val], errors='coerce').sum():,.2f}")
-    else:
-        kpi("Total", "—")
+stage("kpis")
+from components import kpi_row, rolling_controls
+if remote:
+    totals = _api(api.totals, value_col=sel_val, filters=filters)
+    rows, cols = totals["rows"], n_cols
+else:
+    rows, cols = df_view.shape
+if mem["mode"] == "aggregated":
+    rows, cols = int(df_view[ROLLUP_COUNT].sum()), cols - 1
+if approx:
+    cols -= 2  # sampling.STRATUM, sampling.WEIGHT
+    est_rows = sampling.total(sample, df_view)
+    est_total = sampling.total(sample, df_view, sel_val) if sel_val else None
+    kpi_row([
+        {"label": "Rows", "value": f"≈ {est_rows['estimate']:,.0f}", "delta": f"± {est_rows[sampling.CI]:,.0f}"},
+        {"label": "Columns", "value": f"{cols:,}"},
+        {"label": f"Total {sel_val}", "value": f"≈ {est_total['estimate']:,.2f}",
+         "delta": f"± {est_total[sampling.CI]:,.2f}"}
+        if sel_val else {"label": "Total", "value": "—"},
+    ])
+else:
+    kpi_row([
+        {"label": "Rows", "value": f"{rows:,}"},
+        {"label": "Columns", "value": f"{cols:,}"},
+        {"label": f"Total {sel_val}",
+         "value": f"{totals['total'] if remote else pd.to_numeric(df_view[sel_val], errors='coerce').sum():,.2f}"}
+        if sel_val else {"label": "Total", "value": "—"},
+    ])
 
 st.divider()
 
 # ---------- Charts ----------
-bar_fig = None
-line_fig = None
+# Groupbys run under admission control; they allocate roughly key codes +
+# values + result per row of the view
+agg_cost_mb = 0 if remote else len(df_view) * 24 / (1024 * 1024)
+
+# Remote uploads are aggregated by the analytics API (see above); when the API
+# could not list the columns the page loaded the rows and computes here
+use_api = remote is not None
+
+
+def _via_api(fn, **kwargs):
+    """fn on the analytics API over the filtered upload; None (→ compute here) when the API is unreachable."""
+    if remote:
+        return _api(fn, filters=filters, **kwargs)
+    try:
+        return fn(ds["id"], str(user["id"]), filters=filters, **kwargs)
+    except AdmissionRefused as e:
+        st.warning(f"⏸️ {e}")
+        st.stop()
+    except api.ApiError as e:
+        st.caption(f"Analytics API unavailable — computed locally ({e}).")
+        return None
+
 
 # Category breakdown
+stage("breakdown")
 if sel_cat != "—" and sel_val:
-    grp = (
-        df_view.groupby(sel_cat, dropna=False)[sel_val]
-               .apply(lambda s: pd.to_numeric(s, errors="coerce").sum())
-               .reset_index()
-               .sort_values(sel_val, ascending=False)
-               .head(20)
-    )
+    with span("groupby"):
+        grp = _via_api(api.aggregate, cat_col=sel_cat, value_col=sel_val, top=20) if use_api else None
+        if approx:
+            grp = sampling.category_breakdown(sample, df_view, sel_cat, sel_val, top=20)
+        elif grp is None:
+            agg = (frame_key, "breakdown", filters, sel_cat, sel_val)
+            with heavy("breakdown", cost_mb=agg_cost_mb, skip=is_aggregated(*agg)):
+                grp = view_aggregate(*agg, df_view, whole_ds)
     if HAS_PLOTLY:
-        bar_fig = px.bar(grp, x=sel_cat, y=sel_val, title=f"{sel_val} by {sel_cat} (Top 20)")
+        with span("plotly figure"):
+            bar_fig = px.bar(grp, x=sel_cat, y=sel_val, title=f"{sel_val} by {sel_cat} (Top 20)",
+                             error_y=sampling.CI if approx else None)
         st.plotly_chart(bar_fig, use_container_width=True)
     else:
         st.bar_chart(grp.set_index(sel_cat)[sel_val])
-else:
-    # Fallback: simple histogram of first numeric
-    if HAS_PLOTLY and len(num_cols) > 0:
-        first_num = num_cols[0]
-        bar_fig = px.histogram(df_view, x=first_num, title=f"Distribution of {first_num}")
-        st.plotly_chart(bar_fig, use_container_width=True)
-    elif len(num_cols) > 0:
-        st.bar_chart(df_view[num_cols[0]].value_counts().sort_index())
+elif len(num_cols) > 0:
+    # Fallback: distribution of the first numeric, binned from its quantile
+    # sketch (the stored one when unfiltered) instead of charting every value
+    first_num = num_cols[0]
+    unfiltered = not any((drange, keep_vals, num_range)) if remote else df_view is df
+    dist = col_sketches.get(first_num) if unfiltered else None
+    if (dist is None or dist.get("kind") != "number") and remote:
+        dist = _via_api(api.sketch, column=first_num)
+    elif dist is None or dist.get("kind") != "number":
+        # approximate: sampled rows count with their weight (estimated row counts)
+        dist = sketches.sketch_column(pd.to_numeric(df_view[first_num], errors="coerce"),
+                                      weights=df_view[sampling.WEIGHT].to_numpy() if approx else None)
+    hist = sketches.histogram(dist, bins=30)
+    summary = sketches.box(dist)
+    if HAS_PLOTLY and summary is not None:
+        with span("plotly figure"):
+            bar_fig = px.bar(hist, x=(hist["from"] + hist["to"]) / 2, y="rows",
+                             title=f"Distribution of {first_num}", labels={"x": first_num})
+            bar_fig.update_traces(width=float((hist["to"] - hist["from"]).iloc[0]) or None)
+            box_fig = go.Figure(go.Box(
+                name=first_num, q1=[summary["q1"]], median=[summary["median"]], q3=[summary["q3"]],
+                lowerfence=[summary["lowerfence"]], upperfence=[summary["upperfence"]],
+            ))
+            box_fig.update_layout(title="Spread", showlegend=False)
+        ch, cb = st.columns([3, 1])
+        ch.plotly_chart(bar_fig, use_container_width=True)
+        cb.plotly_chart(box_fig, use_container_width=True)
+    elif len(hist):
+        st.bar_chart(hist.set_index("from")["rows"])
 
 # Time series
+stage("time series")
 if sel_dt != "—" and sel_val:
-    ts = (
-        df_view[[sel_dt, sel_val]]
-        .dropna()
-        .assign(**{
-            sel_dt: pd.to_datetime(df_view[sel_dt], errors="coerce"),
-            sel_val: pd.to_numeric(df_view[sel_val], errors="coerce")
-        })
-        .dropna()
-        .groupby(sel_dt, as_index=False)[sel_val].sum()
-        .sort_values(sel_dt)
-    )
+    with span("groupby"):
+        ts = _via_api(api.time_series, date_col=sel_dt, value_col=sel_val) if use_api else None
+        if approx:
+            ts = sampling.time_series(sample, df_view, sel_dt, sel_val)
+        elif ts is None:
+            agg = (frame_key, "timeseries", filters, sel_dt, sel_val)
+            with heavy("time series", cost_mb=agg_cost_mb, skip=is_aggregated(*agg)):
+                ts = view_aggregate(*agg, df_view, whole_ds)
     if len(ts):
+        roll = rolling_controls("dash")
+        if roll:
+            with span("rolling", points=len(ts)):
+                ts = rolling.frame(ts, sel_dt, sel_val, roll["window"], z=roll["z"])
         if HAS_PLOTLY:
-            line_fig = px.line(ts, x=sel_dt, y=sel_val, title=f"{sel_val} over time")
+            with span("plotly figure"):
+                line_fig = px.line(ts, x=sel_dt, y=sel_val, title=f"{sel_val} over time",
+                                   error_y=sampling.CI if approx else None)
+                if roll:
+                    for trace in rolling.band_traces(ts, sel_dt, sel_val):
+                        line_fig.add_trace(trace)
             st.plotly_chart(line_fig, use_container_width=True)
         else:
-            st.line_chart(ts.set_index(sel_dt)[sel_val])
+            st.line_chart(ts.set_index(sel_dt)[[sel_val, rolling.MEAN] if roll else sel_val])
+        if roll:
+            st.caption(f"{int(ts[rolling.ANOMALY].sum()):,} of {len(ts):,} points outside "
+                       f"mean ± {roll['z']:g}σ of the previous {roll['window']} points.")
+
+# Pivot: two categories × one measure, filled by one bincount pass (analytics.pivot)
+stage("pivot")
+if len(cat_cols) >= 2 and st.toggle("Pivot table", key="dash_pivot",
+                                    help="Rows × columns of two categories, like an Excel pivot."):
+    pr, pc, pv, pa = st.columns(4)
+    pv_rows = pr.selectbox("Rows", cat_cols, key="dash_pv_rows")
+    pv_cols = pc.selectbox("Columns", [c for c in cat_cols if c != pv_rows], key="dash_pv_cols")
+    pv_val = pv.selectbox("Value", ["(row count)"] + num_cols, key="dash_pv_val")
+    pv_val = None if pv_val == "(row count)" else pv_val
+    pv_agg = pa.radio("Aggregate", ["sum", "mean"], horizontal=True, key="dash_pv_agg", disabled=pv_val is None)
+    pv_agg = pv_agg if pv_val else "count"
+    with span("pivot", rows=n_rows if remote else len(df_view)):
+        if remote:
+            table = _via_api(api.pivot, row_col=pv_rows, col_col=pv_cols, value_col=pv_val, agg=pv_agg)
+        elif approx:
+            table = pivot(df_view, pv_rows, pv_cols, pv_val, agg=pv_agg, weights=df_view[sampling.WEIGHT].to_numpy())
+        else:
+            pv_args = (frame_key, filters, pv_rows, pv_cols, pv_val, pv_agg)
+            with heavy("pivot", cost_mb=agg_cost_mb, skip=is_pivoted(*pv_args)):
+                table = view_pivot(*pv_args, df_view,
+                                   count_col=ROLLUP_COUNT if mem["mode"] == "aggregated" else None, _ds=whole_ds)
+    what = f"{pv_agg} of {pv_val}" if pv_val else "rows"
+    if approx:
+        st.caption(f"≈ Estimated from the sample: {what} by {pv_rows} × {pv_cols}.")
+    tab_heat, tab_table = st.tabs(["Heatmap", "Table"])
+    with tab_heat:
+        if HAS_PLOTLY:
+            with span("plotly figure"):
+                heat_fig = px.imshow(table, aspect="auto", color_continuous_scale="Blues",
+                                     labels={"color": what}, title=f"{what} by {pv_rows} × {pv_cols}")
+                heat_fig.update_xaxes(type="category")
+                heat_fig.update_yaxes(type="category")
+            st.plotly_chart(heat_fig, use_container_width=True)
+        else:
+            st.caption("Install plotly for the heatmap; the table is on the next tab.")
+    with tab_table:
+        st.dataframe(table, use_container_width=True)
+        st.download_button("Download pivot (CSV)", table.to_csv().encode("utf-8"),
+                           file_name=f"pivot_{pv_rows}_{pv_cols}.csv", mime="text/csv", key="dash_pv_csv")
 
 st.divider()
 
@@ -268,11 +537,15 @@ with st.expander("Debug", False):
         "drange": st.session_state.get("dash_drange"),
         "keep_vals": st.session_state.get("dash_keep_vals"),
         "val_range": st.session_state.get("dash_val_range"),
-        "df_shape": df.shape,
-        "df_view_shape": df_view.shape,
+        "df_shape": (n_rows, n_cols),
+        "df_view_shape": (rows, cols) if remote else df_view.shape,
+        "columns": {c: {"kind": i["kind"], "distinct": i["distinct"]} for c, i in col_info.items()},
+        "approximate": approx,
+        "sample_rows": len(sample["frame"]) if approx else None,
     })
 
 # ---------- 6) Saved Views ----------
+stage("saved views")
 st.subheader("Saved views")
 
 # Compose payload (what defines this view)
@@ -353,6 +626,7 @@ st.caption("Tip: copy the URL from your browser after setting filters — it inc
 st.divider()
 
 # ---------- 7) One-click Export (ZIP) ----------
+stage("export")
 st.subheader("Export")
 exp_note = []
 if not HAS_PLOTLY:
@@ -362,29 +636,53 @@ if HAS_PLOTLY and not HAS_KALEIDO:
 if exp_note:
     st.info(" ".join(exp_note))
 
-if st.button("Download ZIP (filtered CSV + charts PNGs)", type="primary"):
-    mem = BytesIO()
-    with ZipFile(mem, mode="w", compression=ZIP_DEFLATED) as zf:
-        # CSV
-        zf.writestr("filtered.csv", df_view.to_csv(index=False))
-
-        # Charts (if possible)
-        if HAS_PLOTLY and HAS_KALEIDO and pio is not None:
-            try:
-                if bar_fig is not None:
-                    buf = BytesIO()
-                    pio.write_image(bar_fig, buf, format="png", scale=2)
-                    zf.writestr("chart_bar.png", buf.getvalue())
-                if line_fig is not None:
-                    buf = BytesIO()
-                    pio.write_image(line_fig, buf, format="png", scale=2)
-                    zf.writestr("chart_timeseries.png", buf.getvalue())
-            except Exception as e:
-                zf.writestr("export_warning.txt", f"PNG export failed: {e}")
-
-    st.download_button(
-        "Download export.zip",
-        data=mem.getvalue(),
-        file_name="export.zip",
-        mime="application/zip",
-    )
+# Built by a background job from the full dataset (not the in-session copy,
+# which may be sampled); it survives reruns and page changes.
+if st.button("Prepare ZIP (filtered CSV + charts PNGs)", type="primary"):
+    try:
+        st.session_state["dash_export_job"] = submit_job(
+            "dashboard_export",
+            {
+                "dataset": ds,
+                "filters": filters,
+                "cat_col": sel_cat if sel_cat != "—" else None,
+                "value_col": sel_val,
+                "date_col": sel_dt if sel_dt != "—" else None,
+                "png": HAS_KALEIDO,
+            },
+            user_id=str(user["id"]),
+            label=f"Export {ds.get('filename', '')}",
+        )
+    except AdmissionRefused as e:
+        st.warning(f"⏸️ {e}")
+
+export_job = st.session_state.get("dash_export_job")
+if export_job:
+    job = poll_job(export_job)
+    if job and job["status"] == "failed":
+        st.error(f"Export failed: {job['error']}")
+    elif job and job["status"] == "done":
+        res = job_result(job)
+        if res is None:
+            st.warning("The export file is no longer available — prepare it again.")
+        else:
+            track("export_zip", res["bytes"], page="Dashboard", kind="export")
+            st.download_button(
+                f"Download {res['filename']} ({res['rows']:,} rows)",
+                data=res["bytes"],
+                file_name=res["filename"],
+                mime=res["mime"],
+            )
+
+recent = list_jobs_for_user(str(user["id"]), kind="dashboard_export", limit=5)
+if recent:
+    with st.expander("Recent exports"):
+        for j in recent:
+            c1, c2 = st.columns([4, 1])
+            c1.caption(f"{j['created_at']} · {j['label'] or j['kind']} · **{j['status']}**")
+            if j["status"] == "done" and j["id"] != export_job:
+                if c2.button("Open", key=f"dash_job_{j['id']}"):
+                    st.session_state["dash_export_job"] = j["id"]
+                    st.rerun()
+
+render_panel()
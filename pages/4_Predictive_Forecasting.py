@@ -1,24 +1,20 @@
 # pages/4_Predictive_Forecasting.py
-import numpy as np
-import pandas as pd
+import json
+from datetime import datetime, timezone
+from io import BytesIO
+
 import streamlit as st
-from db import list_uploads_for_user
-from sklearn.linear_model import LinearRegression
+from db import list_uploads_for_user, get_forecast_state, save_forecast_state, delete_forecast_state
+from deps import available, lazy
+from profiler import start_run, stage, span, render_panel
 
-# Plotly optional
-try:
-    import plotly.express as px
-    HAS_PLOTLY = True
-except Exception:
-    HAS_PLOTLY = False
+# Plotly optional (imported on first chart, not with the page)
+HAS_PLOTLY = available("plotly")
+px = lazy("plotly.express")
 
 # Kaleido (for PNG export) optional
-try:
-    import plotly.io as pio  # requires kaleido for static image export
-    from io import BytesIO
-    HAS_KALEIDO = True
-except Exception:
-    HAS_KALEIDO = False
+HAS_KALEIDO = HAS_PLOTLY and available("kaleido")
+pio = lazy("plotly.io")  # requires kaleido for static image export
 
 st.set_page_config(page_title="Forecasting • LuminaIQ", page_icon="🔮", layout="wide")
 
@@ -28,10 +24,29 @@ if not user:
     st.warning("Please sign in from the Home page.")
     st.stop()
 
+start_run("Forecasting")
+
+# heavy: loaded after the auth guard
+stage("imports")
+import pandas as pd
+import api_client as api
+from datasets import load_dataset, client_dataset_option, load_cost_mb, dataset_key, remote_columns
+from memtrack import track, track_cache, is_cached
+from admission import heavy, AdmissionRefused
+from jobs import submit as submit_job, poll as poll_job, result as job_result
+from forecasting import (
+    SEASON_PERIODS, es_forecast, init_state, update_state, state_fit,
+    rolling_origin_backtest, summarize_backtest,
+)
+
 st.title("🔮 Predictive Forecasting (Baseline)")
 
 # ---------- Dataset picker ----------
+stage("dataset picker")
 uploads = list_uploads_for_user(user_id=user["id"])
+client_ds = client_dataset_option()  # mapped CSV from the Client Template page
+if client_ds:
+    uploads = uploads + [client_ds]
 if not uploads:
     st.info("Upload a dataset first.")
     st.stop()
@@ -40,14 +55,6 @@ options = {f"{u['uploaded_at']} — {u['filename']}": u for u in uploads}
 choice = st.selectbox("Choose a dataset", list(options.keys()))
 ds = options[choice]
 
-# ---------- Load ----------
-path = ds.get("path", "")
-try:
-    df = pd.read_csv(path)
-except Exception as e:
-    st.error(f"Could not read dataset: {e}")
-    st.stop()
-
 # ---------- Find/create date cols (accept 'Year') ----------
 def find_date_cols(df: pd.DataFrame):
     name_hits = [c for c in df.columns if any(k in c.lower() for k in ("date", "day", "time", "year"))]
@@ -78,13 +85,89 @@ def find_date_cols(df: pd.DataFrame):
     date_like = list(df.select_dtypes(include=["datetime", "datetimetz"]).columns)
     return df, date_like
 
-df, date_cols = find_date_cols(df)
+# ---------- Cached stages ----------
+# dataset (per path) → resampled series (per date/target/freq) → fit (per series + model).
+# The horizon slider only feeds the prediction step below. `_ds` (the upload
+# record) is not hashed; `path` (datasets.dataset_key) identifies the dataset version.
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_dataset(path: str, _ds: dict):
+    df, date_cols = find_date_cols(load_dataset(_ds))
+    track_cache(f"forecast-dataset:{path}", df, ttl=300)
+    return df, date_cols
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _dataset_columns(path: str, _ds: dict):
+    df, date_cols = _load_dataset(path, _ds)
+    # Build numeric list, but exclude 'Year' if we're using synthesized date from Year
+    num_cols = df.select_dtypes("number").columns.tolist()
+    if "__date_from_year__" in df.columns and "Year" in num_cols:
+        # Avoid forecasting "Year" as the target numeric!
+        num_cols.remove("Year")
+    return date_cols, num_cols
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _resampled_series(path: str, date_col: str, target_col: str, freq: str, _ds: dict,
+                      _api_user: str = "") -> pd.DataFrame:
+    # uploads on the analytics API are resampled there (same series, so not part of the key)
+    if _api_user:
+        return api.series(_ds["id"], _api_user, date_col=date_col, target_col=target_col, freq=freq)
+    df, _ = _load_dataset(path, _ds)
+    df = df[[date_col, target_col]].dropna().copy()
+    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
+    df = df.dropna(subset=[date_col]).sort_values(date_col)
+    # Reindex evenly by the selected frequency to stabilize baseline trend
+    return df.set_index(date_col).resample(freq).sum(numeric_only=True).reset_index()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _fit_series(path: str, date_col: str, target_col: str, freq: str, model_kind: str, season_m: int,
+                user_id: str, series_key: str, stored: str, refit: int, _ds: dict, _api_user: str = ""):
+    """
+    Fit via the stored incremental state (JSON, "" for none) when this upload
+    extends the history it saw (O(new periods)); otherwise full fit. Pure:
+    the caller loads and saves the state. `refit` (bumped by "Re-search")
+    only changes the cache key. Returns (fit, state, mode).
+    """
+    series = _resampled_series(path, date_col, target_col, freq, _ds, _api_user)
+    y = series[target_col].values.astype(float)
+    start = series[date_col].iloc[0].isoformat()
+
+    state, mode = None, "full refit"
+    if stored:
+        prev = json.loads(stored)
+        if prev.get("start") == start:
+            state = update_state(prev, y)
+            if state is not None:
+                mode = f"incremental (+{state['n'] - prev['n']} periods)"
+    if state is None:
+        state = init_state(y, model_kind, m=season_m)
+        state["start"] = start
+    fit = state_fit(state, y)
+    track_cache(f"forecast-fit:{user_id}:{path}:{series_key}", fit, ttl=300)
+    return fit, state, mode
+
+stage("load dataset")
+path = dataset_key(ds)  # changes when rows are appended to the upload
 
-# Build numeric list, but exclude 'Year' if we're using synthesized date from Year
-num_cols = df.select_dtypes("number").columns.tolist()
-if "__date_from_year__" in df.columns and "Year" in num_cols:
-    # Avoid forecasting "Year" as the target numeric!
-    num_cols.remove("Year")
+# With LUMINAIQ_API_URL set, uploads stay in the analytics API: this page gets
+# the column list and the resampled history from it and fits here
+api_user = ""
+if api.enabled() and ds.get("id") is not None:
+    try:
+        remote = remote_columns(path, ds["id"], str(user["id"]))
+        date_cols, num_cols = list(remote["datetime"]), list(remote["numeric"])
+        api_user = str(user["id"])
+    except AdmissionRefused as e:
+        st.warning(f"⏸️ {e}")
+        st.stop()
+    except api.ApiError as e:
+        st.caption(f"Analytics API unavailable — computed locally ({e}).")
+if not api_user:
+    try:
+        with heavy("dataset load", cost_mb=load_cost_mb(ds), skip=is_cached(f"forecast-dataset:{path}")):
+            date_cols, num_cols = _dataset_columns(path, ds)
+    except Exception as e:
+        st.error(f"Could not read dataset: {e}")
+        st.stop()
 
 if not date_cols or not num_cols:
     st.warning("Need at least one 'date'-like column and one numeric column.")
@@ -105,25 +188,66 @@ periods = st.slider(
     30 if freq == "D" else 12
 )
 
+# ---------- Model ----------
+model_map = {
+    "Linear trend (baseline)": "linear",
+    "Simple exponential smoothing": "ses",
+    "Holt (level + trend)": "holt",
+    "Holt-Winters (additive seasonality)": "hw",
+    "Auto (best backtest)": "auto",
+}
+model_name = st.selectbox("Model", list(model_map.keys()), index=0)
+model_kind = model_map[model_name]
+season_m = SEASON_PERIODS[freq]
+
 # ---------- Prep ----------
-df = df.dropna(subset=[date_col, target_col]).copy()
-df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-df = df.dropna(subset=[date_col]).sort_values(date_col)
+stage("resample")
+try:
+    df = _resampled_series(path, date_col, target_col, freq, ds, api_user)
+except (AdmissionRefused, api.ApiError) as e:
+    st.warning(f"⏸️ {e}" if isinstance(e, AdmissionRefused) else f"Analytics API unavailable ({e}).")
+    st.stop()
+track("series", df, page="Forecasting")
+if df.empty:
+    st.warning("No valid rows for the selected date and target columns.")
+    st.stop()
 
-# Reindex evenly by the selected frequency to stabilize baseline trend
-df = df.set_index(date_col).resample(freq).sum(numeric_only=True).reset_index()
+# ---------- Fit ----------
+stage("fit")
+if model_kind == "hw" and len(df) < 2 * season_m + 1:
+    st.warning(f"Holt-Winters needs at least {2 * season_m + 1} {freq_name.lower()} periods; using Holt instead.")
+    model_kind = "holt"
+series_key = "|".join([ds.get("filename", ""), date_col, target_col, freq, model_kind])
+stored = get_forecast_state(str(user["id"]), series_key) or ""
+refit = st.session_state.get("fc_refit", {}).get(series_key, 0)
+try:
+    with heavy("forecast fit", skip=is_cached(f"forecast-fit:{user['id']}:{path}:{series_key}")):
+        es_fit, fit_state, fit_mode = _fit_series(
+            path, date_col, target_col, freq, model_kind, season_m, str(user["id"]), series_key,
+            stored, refit, ds, api_user,
+        )
+except ValueError as e:
+    st.error(f"Could not fit model: {e}")
+    st.stop()
+state_json = json.dumps(fit_state)
+if state_json != stored:
+    save_forecast_state(str(user["id"]), series_key, state_json,
+                        datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
+yhat = es_forecast(es_fit, periods)[0]
 
-# Simple linear-trend baseline
-df["t"] = np.arange(len(df))
-X = df[["t"]].values
-y = df[target_col].values
-model = LinearRegression().fit(X, y)
+chosen = es_fit["kind"][0]
+params = f"α={es_fit['alpha'][0]:.2f}"
+if chosen in ("holt", "hw"):
+    params += f", β={es_fit['beta'][0]:.2f}"
+if chosen == "hw":
+    params += f", γ={es_fit['gamma'][0]:.2f}, season={season_m}"
+if chosen == "linear":
+    params = "closed-form OLS"
+note = f" · holdout sMAPE {es_fit['backtest_smape'][0]:.2f}%" if "backtest_smape" in es_fit else ""
+st.caption(f"Model: **{chosen}** ({params}){note} · {fit_mode}")
 
 # ---------- Forecast ----------
-last_t = df["t"].iloc[-1]
-future_t = np.arange(last_t + 1, last_t + periods + 1).reshape(-1, 1)
-yhat = model.predict(future_t)
-
+stage("forecast")
 future_dates = pd.date_range(
     start=df[date_col].iloc[-1] + pd.tseries.frequencies.to_offset(freq),
     periods=periods,
@@ -134,29 +258,89 @@ hist_df = df[[date_col, target_col]].copy()
 hist_df["type"] = "history"
 both = pd.concat([hist_df, forecast_df], ignore_index=True)
 
-# ---------- Backtest (MAPE) ----------
-def mape(y_true, y_pred):
-    y_true, y_pred = np.array(y_true), np.array(y_pred)
-    denom = np.clip(np.abs(y_true), 1e-9, None)
-    return float(np.mean(np.abs((y_true - y_pred) / denom)) * 100.0)
-
+# ---------- Backtest (rolling origin) ----------
+stage("backtest")
 with st.expander("Advanced (Backtest)", False):
-    do_bt = st.checkbox("Evaluate last 20% (MAPE)")
+    if st.button("Re-search parameters (full refit)"):
+        # only this user's state; the new cache key skips the cached fit of the old one
+        delete_forecast_state(str(user["id"]), series_key)
+        bumps = st.session_state.setdefault("fc_refit", {})
+        bumps[series_key] = bumps.get(series_key, 0) + 1
+        st.rerun()
+    do_bt = st.checkbox("Rolling-origin backtest (MAPE, sMAPE, MAE, bias)")
     if do_bt and len(df) > 10:
-        n = max(1, int(len(df) * 0.2))
-        train, test = df.iloc[:-n].copy(), df.iloc[-n:].copy()
-        train["t"] = np.arange(len(train))
-        test["t"]  = np.arange(len(train), len(train) + len(test))
-        m = LinearRegression().fit(train[["t"]], train[target_col].values)
-        pred = m.predict(test[["t"]])
-        st.info(f"MAPE on holdout: **{mape(test[target_col].values, pred):.2f}%**")
+        bc1, bc2, bc3 = st.columns(3)
+        max_folds = max(1, min(200, len(df) - 4))
+        n_folds = bc1.slider("Folds (cutoffs)", 1, max_folds, min(20, max_folds))
+        h_opts = sorted({1, 2, 3, 7, 14, 30} if freq == "D" else {1, 2, 4, 8, 12})
+        horizons = bc2.multiselect("Horizons (periods ahead)", h_opts, default=[h_opts[0], h_opts[2]])
+        win_name = bc3.selectbox("Training window", ["Expanding", "Sliding (last 80%)"])
+        window = None if win_name == "Expanding" else max(3, int(len(df) * 0.8))
+
+        if horizons:
+            with span("rolling_origin_backtest", folds=n_folds), heavy("backtest"):
+                bt = rolling_origin_backtest(
+                    df[target_col].values, horizons, n_folds=n_folds, window=window, fit=es_fit,
+                )
+            if bt.empty:
+                st.caption("Not enough history for the selected folds.")
+            else:
+                bt["cutoff_date"] = df[date_col].values[bt["cutoff"].values]
+                overall = summarize_backtest(bt.assign(all="all"), by="all").iloc[0]
+                st.info(
+                    f"MAPE **{overall['MAPE']:.2f}%** · sMAPE **{overall['sMAPE']:.2f}%** · "
+                    f"MAE **{overall['MAE']:,.2f}** · bias **{overall['bias']:+,.2f}** "
+                    f"over {int(overall['folds'])} folds"
+                )
+                st.dataframe(summarize_backtest(bt, by="horizon"), use_container_width=True)
+
+                per_fold = (
+                    bt.groupby(["cutoff_date", "horizon"], as_index=False)
+                      .agg(actual=("actual", "first"), forecast=("forecast", "first"),
+                           APE=("ape", "mean"), sAPE=("sape", "mean"),
+                           AE=("ae", "mean"), error=("error", "mean"))
+                )
+                st.dataframe(per_fold, use_container_width=True, height=260)
+                if HAS_PLOTLY:
+                    fig_bt = px.line(
+                        per_fold, x="cutoff_date", y="APE", color="horizon", markers=True,
+                        title="Absolute % error by forecast origin",
+                    )
+                    st.plotly_chart(fig_bt, use_container_width=True)
+                else:
+                    st.line_chart(per_fold.pivot(index="cutoff_date", columns="horizon", values="APE"))
+
+            # Every model family on the same folds; runs as a background job.
+            if st.button("Compare all models (background)"):
+                try:
+                    st.session_state["fc_compare_job"] = submit_job(
+                        "forecast_comparison",
+                        {"values": df[target_col].astype(float).tolist(), "season_m": season_m,
+                         "horizons": [int(h) for h in horizons], "n_folds": n_folds},
+                        user_id=str(user["id"]),
+                        label=f"Model comparison {series_key}",
+                    )
+                except AdmissionRefused as e:
+                    st.warning(f"⏸️ {e}")
+            cmp_job = st.session_state.get("fc_compare_job")
+            if cmp_job:
+                job = poll_job(cmp_job)
+                if job and job["status"] == "failed":
+                    st.error(f"Model comparison failed: {job['error']}")
+                elif job and job["status"] == "done":
+                    res = job_result(job)
+                    if res is not None:
+                        st.caption(job["label"])
+                        st.dataframe(res["frame"], use_container_width=True, hide_index=True)
 
 # ---------- Plot ----------
+stage("plot")
 if HAS_PLOTLY:
-    fig_ts = px.line(
-        both, x=date_col, y=target_col, color="type",
-        title=f"{target_col} forecast ({freq_name})"
-    )
+    with span("plotly figure"):
+        fig_ts = px.line(
+            both, x=date_col, y=target_col, color="type",
+            title=f"{target_col} forecast ({freq_name})"
+        )
     st.plotly_chart(fig_ts, use_container_width=True)
 
     # Optional PNG export
@@ -180,4 +364,10 @@ st.download_button(
     mime="text/csv",
 )
 
-st.caption("Baseline linear trend with frequency control. For seasonality/holidays, upgrade to Prophet/ARIMA.")
+st.caption(
+    "Models: linear trend baseline, simple/Holt/additive Holt-Winters exponential smoothing "
+    "(season 7 daily, 52 weekly, 12 monthly) with grid-searched smoothing weights. "
+    "Auto picks the lowest holdout sMAPE."
+)
+
+render_panel()
@@ -0,0 +1,105 @@
+# pages/5_Admin.py
+import streamlit as st
+
+st.set_page_config(page_title="Admin • LuminaIQ", page_icon="🛠️", layout="wide")
+
+# ---------- Auth (admins only) ----------
+user = st.session_state.get("user")
+if not user:
+    st.warning("Please sign in from the Home page.")
+    st.stop()
+if user.get("role") != "admin":
+    st.error("Admin tools are restricted to administrators.")
+    st.stop()
+
+import pandas as pd  # heavy: loaded after the auth guard
+import memtrack
+import admission
+import warmup
+
+st.title("🛠️ Admin tools")
+
+# ---------- Memory ----------
+st.subheader("Memory")
+c = memtrack.counters()
+mb = 1024 * 1024
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("Process RSS", f"{c['process_rss_bytes'] / mb:,.0f} MB" if "process_rss_bytes" in c else "—")
+m2.metric("Tracked", f"{c['tracked_bytes'] / mb:,.1f} MB", help=f"Peak {c['peak_tracked_bytes'] / mb:,.1f} MB")
+m3.metric("Active sessions", f"{c['sessions']:,.0f}")
+m4.metric("Degraded loads", f"{c['degraded_sampled_total'] + c['degraded_aggregated_total']:,.0f}",
+          help=f"sampled {c['degraded_sampled_total']:.0f} · aggregated {c['degraded_aggregated_total']:.0f}")
+st.caption(f"Per-session limit: {memtrack.SESSION_LIMIT_MB:,.0f} MB (LUMINAIQ_SESSION_MEM_MB) · "
+           f"sessions idle for {memtrack.SESSION_IDLE_S // 60} min are dropped from the registry.")
+
+entries = memtrack.snapshot()
+if not entries:
+    st.info("Nothing tracked yet in this process.")
+else:
+    ent = pd.DataFrame(entries)
+    ent["MB"] = ent["bytes"] / mb
+    ent["updated"] = pd.to_datetime(ent["updated"], unit="s").dt.strftime("%H:%M:%S")
+
+    by_session = (
+        ent[ent["kind"] != "cache"]
+        .groupby(["session", "user"], dropna=False)
+        .agg(MB=("MB", "sum"), items=("name", "count"), pages=("page", lambda p: ", ".join(sorted(set(p)))))
+        .reset_index()
+        .sort_values("MB", ascending=False)
+    )
+    by_session["limit %"] = by_session["MB"] / memtrack.SESSION_LIMIT_MB * 100
+
+    t1, t2, t3 = st.tabs(["By session", "All entries", "Shared cache"])
+    with t1:
+        st.dataframe(by_session, use_container_width=True, hide_index=True,
+                     column_config={"MB": st.column_config.NumberColumn(format="%.1f"),
+                                    "limit %": st.column_config.ProgressColumn(min_value=0, max_value=100,
+                                                                               format="%.0f%%")})
+    with t2:
+        cols = ["user", "page", "name", "kind", "MB", "rows", "cols", "updated", "session"]
+        st.dataframe(ent.sort_values("MB", ascending=False)[cols], use_container_width=True, hide_index=True,
+                     column_config={"MB": st.column_config.NumberColumn(format="%.2f")})
+    with t3:
+        cache = ent[ent["kind"] == "cache"]
+        if cache.empty:
+            st.caption("No cache entries tracked.")
+        else:
+            cache = cache.assign(expires=pd.to_datetime(cache["expires"], unit="s").dt.strftime("%H:%M:%S"))
+            st.dataframe(cache.sort_values("MB", ascending=False)[["name", "user", "MB", "rows", "cols", "updated", "expires"]],
+                         use_container_width=True, hide_index=True)
+
+# ---------- Admission ----------
+st.subheader("Admission control")
+a = admission.stats()
+a1, a2, a3, a4 = st.columns(4)
+a1.metric("Running", f"{a['running']} / {admission.MAX_CONCURRENT}",
+          help=f"{a['memory_mb_in_use']:,.0f} / {admission.MEMORY_MB:,.0f} MB declared")
+a2.metric("Waiting", f"{a['waiting']:,}")
+a3.metric("Admitted", f"{a['admitted_total']:,.0f}",
+          help=f"{a['queued_total']:,.0f} had to queue · "
+               f"avg wait {a['wait_seconds_total'] / max(1, a['admitted_total']):,.2f}s")
+a4.metric("Refused", f"{a['refused_total']:,.0f}")
+st.caption(f"LUMINAIQ_MAX_CONCURRENT={admission.MAX_CONCURRENT} · LUMINAIQ_ADMISSION_MEM_MB={admission.MEMORY_MB:,.0f} · "
+           f"LUMINAIQ_MAX_PER_USER={admission.MAX_PER_USER} · LUMINAIQ_MAX_QUEUE={admission.MAX_QUEUE} · "
+           f"LUMINAIQ_MAX_WAIT_S={admission.MAX_WAIT_S:,.0f}")
+if a["requests"]:
+    st.dataframe(pd.DataFrame(a["requests"]), use_container_width=True, hide_index=True)
+if a["expected_seconds"]:
+    st.caption("Typical duration: " + " · ".join(f"{op} {s:,.2f}s" for op, s in a["expected_seconds"].items()))
+
+# ---------- Cache warm-up ----------
+st.subheader("Cache warm-up")
+w = warmup.status()
+w1, w2, w3 = st.columns(3)
+w1.metric("Status", w["status"], help=f"started {w['started_at'] or '—'} · finished {w['finished_at'] or '—'}")
+w2.metric("Datasets", f"{w['done']} / {w['total']}", help=f"now: {w['current']}" if w["current"] else None)
+w3.metric("Warmed", f"{w['warmed_mb']:,.0f} MB", help=f"budget {w['budget_mb']:,.0f} MB")
+if w["status"] == "running" and w["total"]:
+    st.progress(w["done"] / w["total"], text=f"Warming {w['current'] or '…'}")
+if w["datasets"]:
+    st.dataframe(pd.DataFrame(w["datasets"]), use_container_width=True, hide_index=True)
+st.caption(f"LUMINAIQ_WARMUP={'1' if warmup.WARM_ENABLED else '0'} · LUMINAIQ_WARM_MB={warmup.WARM_MB:,.0f} · "
+           f"LUMINAIQ_WARM_DATASETS={warmup.WARM_DATASETS} · LUMINAIQ_WARM_DELAY_S={warmup.WARM_DELAY_S:g}")
+
+with st.expander("Counters (Prometheus text format)"):
+    st.code(memtrack.counters_text(), language="text")
@@ -1,17 +1,13 @@
 # pages/6_Client_Template.py
 import os
-import io
-import yaml
-import pandas as pd
 import streamlit as st
 from db import list_uploads_for_user  # not used yet but handy for future reuse
+from deps import available, lazy
+from profiler import start_run, stage, span, render_panel
 
-# Plotly optional
-try:
-    import plotly.express as px
-    HAS_PLOTLY = True
-except Exception:
-    HAS_PLOTLY = False
+# Plotly optional (imported on first chart, not with the page)
+HAS_PLOTLY = available("plotly")
+px = lazy("plotly.express")
 
 st.set_page_config(page_title="Client Template • LuminaIQ", page_icon="🧩", layout="wide")
 
@@ -20,6 +16,19 @@ if not user:
     st.warning("Please sign in from the Home page.")
     st.stop()
 
+start_run("Client Template")
+
+# heavy: loaded after the auth guard
+stage("imports")
+import yaml
+from kpi_engine import evaluate_kpis
+from client_data import content_hash, mapping_hash, source_aliases, chart_fields, time_series, breakdown
+from datasets import CSV_EXPANSION, read_client_csv, load_client_dataset, register_client_dataset
+from memtrack import track, is_cached
+from admission import heavy
+from components import rolling_controls
+import rolling
+
 st.title("🧩 Client Template & Column Mapping")
 st.caption("Upload the client's CSV and (optionally) a YAML mapping to wire up dashboards in minutes.")
 
@@ -52,11 +61,17 @@ if data_file is None:
     st.info("Upload a CSV to continue.")
     st.stop()
 
-# Read CSV (BytesIO keeps it reusable)
-data_bytes = data_file.read()
-df = pd.read_csv(io.BytesIO(data_bytes))
+# Raw CSV is parsed once per content hash (cached across reruns)
+stage("read csv")
+data_bytes = data_file.getvalue()
+data_hash = content_hash(data_bytes)
+with heavy("dataset load", cost_mb=len(data_bytes) * CSV_EXPANSION / (1024 * 1024),
+           skip=is_cached(f"client-raw:{data_hash}")):
+    df = read_client_csv(data_hash, data_bytes)
+track("raw", df, page="Client Template")
 
 # Load default mapping if present
+stage("mapping")
 mapping: dict | None = None
 default_map_path = os.path.join("config", "client_config.yaml")
 if os.path.exists(default_map_path):
@@ -80,53 +95,64 @@ mapping = mapping or {}
 st.subheader("Preview (first 10 rows)")
 st.dataframe(df.head(10), use_container_width=True)
 
-def get_col(key_name: str) -> str | None:
-    """Return mapped column if it exists in df, else None."""
-    col = mapping.get(key_name)
-    return col if isinstance(col, str) and col in df.columns else None
-
-# Resolve columns from mapping with sensible fallbacks
-date_col = get_col("date")
-
-# time-series metric
-value_key = mapping.get("charts", {}).get("time_series", {}).get("metric") or "amount"
-value_col = get_col(value_key) or get_col("amount")
-
-# breakdown metric
-category_key = mapping.get("charts", {}).get("breakdown", {}).get("by") or "category"
-category_col = get_col(category_key) or get_col("category")
-break_val_key = mapping.get("charts", {}).get("breakdown", {}).get("value") or "amount"
-break_val_col = get_col(break_val_key) or get_col("amount")
+# Canonical frame (date, amount, cost, ... renamed and typed), cached per
+# (content hash, mapping hash) and shared with the Dashboard/Forecasting pages
+with span("load_client_dataset"):
+    cdf = load_client_dataset(data_hash, mapping_hash(mapping), data_bytes, mapping)
+track("mapped", cdf, page="Client Template")
+register_client_dataset(data_file.name, data_bytes, mapping)
+st.caption(f"Mapped fields: {', '.join(cdf.columns) or '—'} · also available as "
+           f"“{data_file.name} (mapped)” in Dashboards and Forecasting.")
+
+# Resolve chart fields (canonical names, or client column names) with sensible fallbacks
+fields = chart_fields(mapping, df.columns)
+date_col, value_col = fields["date"], fields["value"]
+category_col, break_val_col = fields["category"], fields["break_value"]
+labels = {field: mapping.get(field, field) for field in cdf.columns}
 
 st.divider()
 st.subheader("KPIs")
+stage("kpis")
 
 try:
-    kpi_items = mapping.get("kpis", [])
+    kpi_items = mapping.get("kpis", []) or []
     cols = st.columns(min(4, max(1, len(kpi_items)))) if kpi_items else st.columns(1)
-    for i, k in enumerate(kpi_items):
-        env = {"df": df, "pd": pd}
-        formula = k.get("formula", "None")
-        val = eval(formula, {"__builtins__": {}}, env)  # guarded: no builtins
-        label = k.get("label", k.get("id", "KPI"))
-        cols[i if i < len(cols) else -1].metric(label, f"{val:,.2f}" if isinstance(val, (int, float)) else f"{val}")
+    # formulas are compiled once per mapping (restricted syntax, no eval) and
+    # shared column reductions are computed a single time
+    aliases = source_aliases(mapping, df.columns)
+    for i, res in enumerate(evaluate_kpis(kpi_items, cdf, aliases=aliases, fallback=df)):
+        val = res["value"]
+        target = cols[i % len(cols)]
+        if res["error"]:
+            target.metric(res["label"], "—", help=res["error"])
+            st.caption(f"⚠️ {res['label']}: {res['error']}")
+        else:
+            target.metric(res["label"], f"{val:,.2f}" if isinstance(val, float) else f"{val:,}")
 except Exception as e:
     st.warning(f"KPI evaluation issue: {e}")
 
 # --- Time-series ---
 st.divider()
 st.subheader("Time-series")
+stage("time series")
 if date_col and value_col:
     try:
-        df_ts = df[[date_col, value_col]].copy()
-        df_ts[date_col] = pd.to_datetime(df_ts[date_col], errors="coerce")
-        df_ts = df_ts.dropna(subset=[date_col])
-        df_ts = df_ts.groupby(date_col, as_index=False)[value_col].sum().sort_values(date_col)
+        df_ts = time_series(cdf, value_col, date_col)
+        roll = rolling_controls("client") if len(df_ts) else None
+        if roll:
+            df_ts = rolling.frame(df_ts, date_col, value_col, roll["window"], z=roll["z"])
 
         if HAS_PLOTLY:
-            st.plotly_chart(px.line(df_ts, x=date_col, y=value_col), use_container_width=True)
+            fig = px.line(df_ts, x=date_col, y=value_col, labels=labels)
+            if roll:
+                for trace in rolling.band_traces(df_ts, date_col, value_col):
+                    fig.add_trace(trace)
+            st.plotly_chart(fig, use_container_width=True)
         else:
-            st.line_chart(df_ts.set_index(date_col)[value_col])
+            st.line_chart(df_ts.set_index(date_col)[[value_col, rolling.MEAN] if roll else value_col])
+        if roll:
+            st.caption(f"{int(df_ts[rolling.ANOMALY].sum()):,} of {len(df_ts):,} points outside "
+                       f"mean ± {roll['z']:g}σ of the previous {roll['window']} points.")
     except Exception as e:
         st.warning(f"Time-series not available: {e}")
 else:
@@ -135,17 +161,12 @@ else:
 # --- Category breakdown ---
 st.divider()
 st.subheader("Category breakdown")
+stage("breakdown")
 if category_col and break_val_col:
     try:
-        grp = (
-            df.groupby(category_col, dropna=False)[break_val_col]
-              .sum()
-              .reset_index()
-              .sort_values(break_val_col, ascending=False)
-              .head(20)
-        )
+        grp = breakdown(cdf, category_col, break_val_col)
         if HAS_PLOTLY:
-            st.plotly_chart(px.bar(grp, x=category_col, y=break_val_col), use_container_width=True)
+            st.plotly_chart(px.bar(grp, x=category_col, y=break_val_col, labels=labels), use_container_width=True)
         else:
             st.bar_chart(grp.set_index(category_col)[break_val_col])
     except Exception as e:
@@ -153,3 +174,4 @@ if category_col and break_val_col:
 else:
     st.info("Specify a categorical column (e.g., category/region) and a numeric value to aggregate.")
 
+render_panel()
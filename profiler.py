@@ -0,0 +1,241 @@
+# profiler.py — per-rerun stage timing (spans), waterfall panel, JSONL log
+#
+# A page calls start_run("Dashboard") after set_page_config. When profiling is
+# on for the session (sidebar toggle, or LUMINAIQ_PROFILE=1 for everyone) the
+# run is recorded on the script thread:
+#   with span("groupby"): ...            # nested block
+#   stage("filters")                     # linear page flow: closes the previous stage
+#   @traced("db.list_views")             # library functions (db.py, storage.py)
+# render_panel() at the end of the page closes the run, shows a waterfall and
+# appends one JSON line to the log. When profiling is off, span()/stage()
+# return a shared no-op after one thread-local lookup.
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+ENV_FLAG = "LUMINAIQ_PROFILE"
+LOG_PATH = os.getenv("LUMINAIQ_PROFILE_LOG", "profile_log.jsonl")
+SESSION_KEY = "profiler_enabled"
+
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+class _Noop:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _Noop()
+
+
+class _Run:
+    __slots__ = ("page", "user", "started_at", "t0", "spans", "depth", "open_stage")
+
+    def __init__(self, page: str, user: Optional[str]):
+        self.page = page
+        self.user = user
+        self.started_at = datetime.utcnow().isoformat(timespec="milliseconds")
+        self.t0 = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.depth = 0
+        self.open_stage: Optional[_Span] = None
+
+
+class _Span:
+    __slots__ = ("run", "name", "meta", "t0", "depth")
+
+    def __init__(self, run: _Run, name: str, meta: Optional[dict] = None):
+        self.run = run
+        self.name = name
+        self.meta = meta
+
+    def __enter__(self):
+        self.depth = self.run.depth
+        self.run.depth += 1
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        t1 = time.perf_counter()
+        self.run.depth -= 1
+        rec = {
+            "name": self.name,
+            "start_ms": round((self.t0 - self.run.t0) * 1000, 3),
+            "ms": round((t1 - self.t0) * 1000, 3),
+            "depth": self.depth,
+        }
+        if self.meta:
+            rec["meta"] = self.meta
+        if exc_type is not None:
+            rec["error"] = exc_type.__name__
+        self.run.spans.append(rec)
+        return False
+
+
+# ---------- Recording ----------
+
+def _enabled(st) -> bool:
+    if os.getenv(ENV_FLAG, "") not in ("", "0", "false", "False"):
+        return True
+    return bool(st.session_state.get(SESSION_KEY, False))
+
+
+def start_run(page: str, *, toggle: bool = True) -> bool:
+    """
+    Begin a profiled rerun of `page` on this thread (if enabled). Renders the
+    sidebar toggle unless toggle=False. A previous run on this thread that never
+    reached render_panel() (st.stop) is logged first.
+    """
+    import streamlit as st
+
+    prev = getattr(_local, "run", None)
+    if prev is not None:
+        _close_stage(prev)
+        _append_log(prev, stopped=True)
+    _local.run = None
+
+    if toggle:
+        on = st.sidebar.toggle("⏱ Profile this page", value=bool(st.session_state.get(SESSION_KEY, False)),
+                               key=f"_profiler_toggle_{page}")
+        st.session_state[SESSION_KEY] = on
+    if not _enabled(st):
+        return False
+    user = (st.session_state.get("user") or {}).get("id")
+    _local.run = _Run(page, None if user is None else str(user))
+    return True
+
+
+def active() -> bool:
+    return getattr(_local, "run", None) is not None
+
+
+def span(name: str, **meta):
+    """Time a block; a no-op when this thread is not profiling."""
+    run = getattr(_local, "run", None)
+    if run is None:
+        return _NOOP
+    return _Span(run, name, meta or None)
+
+
+def _close_stage(run: _Run) -> None:
+    if run.open_stage is not None:
+        run.open_stage.__exit__(None, None, None)
+        run.open_stage = None
+
+
+def stage(name: str) -> None:
+    """Close the current top-level page stage (if any) and open `name`."""
+    run = getattr(_local, "run", None)
+    if run is None:
+        return
+    _close_stage(run)
+    run.open_stage = _Span(run, name).__enter__()
+
+
+def traced(name: Optional[str] = None):
+    """Decorator: record each call of the function as a span."""
+    def deco(fn):
+        label = name or f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            run = getattr(_local, "run", None)
+            if run is None:
+                return fn(*args, **kwargs)
+            with _Span(run, label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+# ---------- Log ----------
+
+def _record(run: _Run, stopped: bool = False) -> dict:
+    total = round((time.perf_counter() - run.t0) * 1000, 3)
+    return {
+        "ts": run.started_at,
+        "page": run.page,
+        "user": run.user,
+        "total_ms": total,
+        "stopped": stopped,
+        "spans": sorted(run.spans, key=lambda s: (s["start_ms"], s["depth"])),
+    }
+
+
+def _append_log(run: _Run, stopped: bool = False) -> dict:
+    rec = _record(run, stopped)
+    try:
+        with _log_lock, open(LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, default=str) + "\n")
+    except OSError:
+        pass  # profiling must never break a page
+    return rec
+
+
+def read_log(limit: int = 200, page: Optional[str] = None) -> List[dict]:
+    """Most recent records from the log (newest last)."""
+    if not os.path.exists(LOG_PATH):
+        return []
+    with open(LOG_PATH, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    out = []
+    for line in reversed(lines):
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            continue
+        if page is None or rec.get("page") == page:
+            out.append(rec)
+            if len(out) >= limit:
+                break
+    return out[::-1]
+
+
+# ---------- Panel ----------
+
+def render_panel() -> Optional[dict]:
+    """Finish this thread's run: log it and show the waterfall (no-op when off)."""
+    run = getattr(_local, "run", None)
+    if run is None:
+        return None
+    _close_stage(run)
+    _local.run = None
+    rec = _append_log(run)
+
+    import streamlit as st
+    from deps import available
+
+    spans = rec["spans"]
+    with st.expander(f"⏱ Profiler — {rec['total_ms']:,.0f} ms this run", expanded=False):
+        if not spans:
+            st.caption("No stages recorded.")
+            return rec
+        import pandas as pd
+        tbl = pd.DataFrame(spans)
+        tbl["stage"] = ["  " * d + n for d, n in zip(tbl["depth"], tbl["name"])]
+        if available("plotly"):
+            import plotly.graph_objects as go
+            fig = go.Figure(go.Bar(
+                y=tbl["stage"], x=tbl["ms"], base=tbl["start_ms"], orientation="h",
+                hovertemplate="%{y}<br>start %{base:.1f} ms · %{x:.1f} ms<extra></extra>",
+            ))
+            fig.update_layout(
+                height=max(160, 24 * len(tbl) + 60), margin=dict(l=10, r=10, t=10, b=30),
+                xaxis_title="ms since start of rerun", yaxis=dict(autorange="reversed"),
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(tbl[["stage", "start_ms", "ms"]], use_container_width=True, hide_index=True)
+        st.caption(f"Appended to {LOG_PATH}")
+    return rec
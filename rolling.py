@@ -0,0 +1,147 @@
+# rolling.py — rolling statistics and anomaly bands for time series
+#
+# Every statistic costs O(n) whatever the window: sums and sums of squares
+# come from cumulative sums (window sum = two lookups), and rolling min / max
+# use the van Herk–Gil-Werman block scheme (running max from each block's
+# left and right edge, one np.maximum per point), which needs no per-window
+# loop. Many series are handled in one pass: rows are ordered by group, and
+# windows never reach back past the start of their group.
+#
+# Windows count points, not calendar time: a 7-point window over a daily
+# series is a week. The anomaly band of a point comes from the window before
+# it (mean ± z·std of the previous `window` points), so an outlier does not
+# widen its own band. No Streamlit here.
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+WINDOW = 7
+BAND_Z = 3.0
+
+MEAN, STD, MIN, MAX = "roll_mean", "roll_std", "roll_min", "roll_max"
+LOWER, UPPER, ZSCORE, ANOMALY = "band_lower", "band_upper", "zscore", "anomaly"
+
+
+# ---------- Engine ----------
+
+def _group_starts(n: int, groups: Optional[np.ndarray]) -> np.ndarray:
+    """Index of the first row of each row's group (groups must be contiguous)."""
+    if groups is None or n == 0:
+        return np.zeros(n, dtype=np.int64)
+    codes = pd.factorize(groups)[0]
+    new = np.empty(n, dtype=bool)
+    new[0] = True
+    new[1:] = codes[1:] != codes[:-1]
+    return np.maximum.accumulate(np.where(new, np.arange(n), 0))
+
+
+def _window_sum(x: np.ndarray, lo: np.ndarray) -> np.ndarray:
+    """Sum of x[lo[i] .. i] for every i, from one cumulative sum."""
+    c = np.concatenate(([0.0], np.cumsum(x, dtype=float)))
+    return c[np.arange(1, len(x) + 1)] - c[lo]
+
+
+def _window_max(x: np.ndarray, window: int, starts: np.ndarray) -> np.ndarray:
+    """Max of the last `window` values up to each row (NaN ignored; NaN when all are)."""
+    n = len(x)
+    if n == 0:
+        return np.empty(0)
+    # lay each group out after window-1 fill slots, so no window crosses a group start
+    group_no = np.cumsum(starts == np.arange(n))
+    pos = np.arange(n) + (window - 1) * group_no
+    size = -(-(pos[-1] + 1) // window) * window
+    padded = np.full(size, -np.inf)
+    padded[pos] = np.where(np.isnan(x), -np.inf, x)
+    blocks = padded.reshape(-1, window)
+    left = np.maximum.accumulate(blocks, axis=1).ravel()                       # block start .. p
+    right = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()   # p .. block end
+    out = np.maximum(right[pos - window + 1], left[pos])
+    return np.where(np.isneginf(out), np.nan, out)
+
+
+def _lag(x: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """x shifted one row down within each group (NaN on each group's first row)."""
+    out = np.empty(len(x))
+    out[1:] = x[:-1]
+    out[starts == np.arange(len(x))] = np.nan
+    return out
+
+
+def rolling(values, window: int = WINDOW, *, groups=None, min_periods: int = 1) -> Dict[str, np.ndarray]:
+    """
+    Trailing-window {"count", "mean", "std", "min", "max"} of each row over the
+    last `window` rows of its group (rows must be ordered within contiguous
+    groups). NaNs are skipped; fewer than min_periods values give NaN.
+    """
+    v = np.asarray(values, dtype=float)
+    n = len(v)
+    window = max(1, int(window))
+    starts = _group_starts(n, None if groups is None else np.asarray(groups))
+    lo = np.maximum(np.arange(n) - window + 1, starts)
+    ok = ~np.isnan(v)
+
+    # centre each group on its mean so the sum-of-squares difference keeps its precision
+    first = np.flatnonzero(starts == np.arange(n))
+    centre = np.zeros(n)
+    if n:
+        means = np.add.reduceat(np.where(ok, v, 0.0), first) / np.maximum(np.add.reduceat(ok, first), 1)
+        centre = np.repeat(means, np.diff(np.append(first, n)))
+    z = np.where(ok, v - centre, 0.0)
+    count = _window_sum(ok, lo)
+    s1, s2 = _window_sum(z, lo), _window_sum(z * z, lo)
+    enough = count >= max(1, min_periods)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s1 / count
+        var = np.where(count > 1, (s2 - count * mean * mean) / (count - 1), np.nan)
+    mean = mean + centre
+    std = np.sqrt(np.maximum(var, 0.0))
+    return {
+        "count": count,
+        "mean": np.where(enough, mean, np.nan),
+        "std": np.where(enough, std, np.nan),
+        "min": np.where(enough, -_window_max(-v, window, starts), np.nan),
+        "max": np.where(enough, _window_max(v, window, starts), np.nan),
+    }
+
+
+# ---------- Frames ----------
+
+def frame(ts: pd.DataFrame, x: str, value_col: str, window: int = WINDOW, *, by: Optional[str] = None,
+          z: float = BAND_Z, min_periods: Optional[int] = None) -> pd.DataFrame:
+    """
+    ts ordered by (by, x) with the rolling mean / std / min / max of value_col,
+    the anomaly band from the preceding window, the z-score against it and an
+    anomaly flag (|z| > z). One series, or one per value of `by`, in one pass.
+    """
+    out = ts.sort_values([by, x] if by else [x], kind="stable").reset_index(drop=True)
+    groups = out[by].to_numpy() if by else None
+    if min_periods is None:
+        min_periods = max(2, window // 2)
+    v = pd.to_numeric(out[value_col], errors="coerce").to_numpy(dtype=float)
+    stats = rolling(v, window, groups=groups, min_periods=min_periods)
+    starts = _group_starts(len(v), groups)
+    prev_mean, prev_std = _lag(stats["mean"], starts), _lag(stats["std"], starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        score = np.where(prev_std > 0, (v - prev_mean) / prev_std, np.nan)
+    out[MEAN], out[STD], out[MIN], out[MAX] = stats["mean"], stats["std"], stats["min"], stats["max"]
+    out[LOWER], out[UPPER] = prev_mean - z * prev_std, prev_mean + z * prev_std
+    out[ZSCORE] = score
+    out[ANOMALY] = np.abs(np.nan_to_num(score)) > z
+    return out
+
+
+def band_traces(rf: pd.DataFrame, x: str, value_col: str) -> List[dict]:
+    """Plotly traces (plain dicts) for one series of frame(): moving average, band, anomalies."""
+    hits = rf[rf[ANOMALY]]
+    return [
+        dict(type="scatter", x=rf[x], y=rf[UPPER], mode="lines", line=dict(width=0),
+             showlegend=False, hoverinfo="skip"),
+        dict(type="scatter", x=rf[x], y=rf[LOWER], mode="lines", line=dict(width=0), fill="tonexty",
+             fillcolor="rgba(99,110,250,0.15)", name="expected range"),
+        dict(type="scatter", x=rf[x], y=rf[MEAN], mode="lines", line=dict(dash="dot"), name="moving average"),
+        dict(type="scatter", x=hits[x], y=hits[value_col], mode="markers", name="anomaly",
+             marker=dict(color="crimson", size=9, symbol="circle-open", line=dict(width=2))),
+    ]
@@ -0,0 +1,229 @@
+# sampling.py — stratified samples and scaled estimates for approximate mode
+#
+# On very large uploads the Dashboard can answer from a sample instead of the
+# full frame. build() draws one per dataset, stratified by a date bucket and
+# the main category (its top values; the rest share one stratum), so small
+# categories and quiet periods are still represented. Every sampled row
+# carries the weight N_h / n_h of its stratum.
+#
+# Estimates are totals over the rows a filter keeps (domain estimation): per
+# stratum, the mean of value × in-domain times N_h, with the usual stratified
+# variance N_h² (1 − n_h/N_h) s_h² / n_h. Filters run on the sample, so the
+# cost of an estimate depends on the sample size, not the dataset size.
+# extend() adds appended rows to a sample with the same strata and draw
+# probabilities instead of drawing it again. No Streamlit here.
+from __future__ import annotations
+
+import os
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_ROWS = int(os.getenv("LUMINAIQ_SAMPLE_ROWS", "100000"))
+MIN_PER_STRATUM = 30     # strata smaller than this are taken whole
+MAX_DATE_BUCKETS = 48    # finest of day/week/month/year with at most this many buckets
+MAX_CATEGORIES = 30      # category values stratified individually; the rest are pooled
+Z95 = 1.96
+
+STRATUM = "_stratum"
+WEIGHT = "_weight"
+CI = "ci95"  # ± half-width of the 95% interval, in the units of the estimate
+
+
+# ---------- Strata ----------
+
+def _dates(s: pd.Series) -> np.ndarray:
+    d = pd.to_datetime(s, errors="coerce")
+    if getattr(d.dt, "tz", None) is not None:
+        d = d.dt.tz_localize(None)
+    return d.to_numpy(dtype="datetime64[ns]")
+
+
+def _date_unit(s: pd.Series) -> str:
+    """Finest of day / week / month / year giving at most MAX_DATE_BUCKETS buckets over s."""
+    values = _dates(s)
+    valid = ~np.isnat(values)
+    if not valid.any():
+        return "Y"
+    lo, hi = values[valid].min(), values[valid].max()
+    for u in ("D", "W", "M"):
+        if (hi.astype(f"datetime64[{u}]") - lo.astype(f"datetime64[{u}]")).astype(np.int64) < MAX_DATE_BUCKETS:
+            return u
+    return "Y"
+
+
+def _date_codes(s: pd.Series, unit: str) -> np.ndarray:
+    """Bucket codes for a date column (buckets since the epoch; NaT gets -1)."""
+    values = _dates(s)
+    codes = values.astype(f"datetime64[{unit}]").astype(np.int64)
+    codes[np.isnat(values)] = -1
+    return codes
+
+
+def _top_categories(s: pd.Series) -> list:
+    """The MAX_CATEGORIES most frequent values of s."""
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    counts = np.bincount(codes[codes >= 0], minlength=1)
+    return list(pd.Index(uniques)[np.argsort(counts)[::-1][:MAX_CATEGORIES]]) if len(uniques) else []
+
+
+def _category_codes(s: pd.Series, top: list) -> np.ndarray:
+    """Position of each value in `top`; all others (and missing) share code MAX_CATEGORIES."""
+    codes = pd.Index(top, dtype=object).get_indexer(s.astype(object))
+    return np.where(codes < 0, MAX_CATEGORIES, codes).astype(np.int64)
+
+
+def _stratum_keys(df: pd.DataFrame, spec: Dict[str, object]) -> np.ndarray:
+    key = np.zeros(len(df), dtype=np.int64)
+    if spec["date_col"]:
+        key = _date_codes(df[spec["date_col"]], spec["unit"])
+    if spec["cat_col"]:
+        key = key * (MAX_CATEGORIES + 1) + _category_codes(df[spec["cat_col"]], spec["categories"])
+    return key
+
+
+def _draw(strata: np.ndarray, p: np.ndarray, first_new: int, seed) -> np.ndarray:
+    """
+    Bernoulli draw of each row with its stratum's p; a stratum from first_new
+    on that drew nothing keeps its first row, so it is still represented.
+    """
+    rng = np.random.default_rng(seed)
+    keep = rng.random(len(strata), dtype=np.float32) < p[strata]
+    ids, first = np.unique(strata, return_index=True)
+    missed = (ids >= first_new) & (np.bincount(strata[keep], minlength=len(p))[ids] == 0)
+    keep[first[missed]] = True
+    return keep
+
+
+def _probabilities(population: np.ndarray, rows: int, size: int) -> np.ndarray:
+    """p_h = target_h / N_h, target_h proportional to N_h with a floor of MIN_PER_STRATUM."""
+    target = np.maximum(population * (size / max(rows, 1)), MIN_PER_STRATUM)
+    return np.minimum(1.0, target / np.maximum(population, 1))
+
+
+# ---------- Sample ----------
+
+def build(df: pd.DataFrame, *, date_col: Optional[str] = None, cat_col: Optional[str] = None,
+          size: int = SAMPLE_ROWS, seed: int = 0) -> Dict[str, object]:
+    """
+    Stratified sample of about `size` rows. Returns {"frame": sample with
+    STRATUM and WEIGHT columns and a fresh RangeIndex, "population": N_h,
+    "drawn": n_h, "rows": len(df), "by": the stratifying columns}, plus what
+    extend() needs to add rows. Each stratum gets its proportional share, at
+    least MIN_PER_STRATUM rows.
+    """
+    n = len(df)
+    spec = {
+        "date_col": date_col, "cat_col": cat_col, "size": size, "seed": seed,
+        "unit": _date_unit(df[date_col]) if date_col else None,
+        "categories": _top_categories(df[cat_col]) if cat_col else [],
+    }
+    keys, strata = np.unique(_stratum_keys(df, spec), return_inverse=True)
+    population = np.bincount(strata, minlength=len(keys))
+    p = _probabilities(population, n, size)
+    keep = _draw(strata, p, 0, seed)
+
+    idx = np.flatnonzero(keep)
+    drawn = np.bincount(strata[idx], minlength=len(population))
+    frame = df.iloc[idx].reset_index(drop=True)
+    frame[STRATUM] = strata[idx]
+    frame[WEIGHT] = population[strata[idx]] / drawn[strata[idx]]
+    return {"frame": frame, "population": population, "drawn": drawn, "rows": n,
+            "by": [c for c in (date_col, cat_col) if c], "spec": spec, "keys": keys, "p": p}
+
+
+def extend(sample: Dict[str, object], extra: pd.DataFrame) -> Dict[str, object]:
+    """
+    The sample of the rows it was drawn from plus `extra` (appended rows):
+    extra's rows are drawn with the probability of their stratum (new strata,
+    e.g. a new month, get their own), and every weight becomes N_h / n_h of
+    the grown strata. Only the new rows are read.
+    """
+    if not len(extra):
+        return sample
+    spec, keys = sample["spec"], sample["keys"]
+    new_keys = _stratum_keys(extra, spec)
+    strata = pd.Index(keys).get_indexer(new_keys)
+    unseen = np.unique(new_keys[strata < 0])
+    keys = np.concatenate([keys, unseen])
+    strata[strata < 0] = len(sample["keys"]) + np.searchsorted(unseen, new_keys[strata < 0])
+    rows = sample["rows"] + len(extra)
+    population = np.bincount(strata, minlength=len(keys))
+    population[: len(sample["population"])] += sample["population"]
+    p = np.concatenate([sample["p"], _probabilities(population[len(sample["p"]):], rows, spec["size"])])
+    keep = _draw(strata, p, len(sample["p"]), [spec["seed"], sample["rows"]])
+
+    idx = np.flatnonzero(keep)
+    drawn = np.bincount(strata[idx], minlength=len(keys))
+    drawn[: len(sample["drawn"])] += sample["drawn"]
+    added = extra.iloc[idx].reset_index(drop=True)
+    added[STRATUM] = strata[idx]
+    frame = pd.concat([sample["frame"], added], ignore_index=True)
+    h = frame[STRATUM].to_numpy()
+    frame[WEIGHT] = population[h] / drawn[h]
+    return {**sample, "frame": frame, "population": population, "drawn": drawn, "rows": rows,
+            "keys": keys, "p": p}
+
+
+# ---------- Estimates ----------
+
+def _totals(sample: Dict[str, object], view: pd.DataFrame, values: np.ndarray,
+            keys: Optional[pd.Series] = None) -> pd.DataFrame:
+    """
+    Estimated population total of `values` (aligned with view) over the rows
+    of `view` — per value of `keys` when given — with the 95% half-width.
+    """
+    h = view[STRATUM].to_numpy()
+    z = np.nan_to_num(np.asarray(values, dtype=float))
+    parts = pd.DataFrame({"h": h, "z": z, "z2": z * z})
+    if keys is None:
+        parts["key"] = 0
+    else:
+        parts["key"] = keys.to_numpy()
+    s = parts.groupby(["key", "h"], sort=False, dropna=False, observed=True)[["z", "z2"]].sum()
+    hh = s.index.get_level_values("h").to_numpy()
+    N = sample["population"][hh].astype(float)
+    n = sample["drawn"][hh].astype(float)
+    mean = s["z"].to_numpy() / n
+    var = np.where(n > 1, (s["z2"].to_numpy() - n * mean * mean) / np.maximum(n - 1, 1), 0.0)
+    var = np.maximum(var, 0.0)
+    est = pd.DataFrame({
+        "estimate": N * mean,
+        "variance": N * N * (1 - n / N) * var / n,
+    }, index=s.index.get_level_values("key"))
+    out = est.groupby(level=0, sort=False, dropna=False).sum()
+    out[CI] = Z95 * np.sqrt(out.pop("variance"))
+    return out
+
+
+def total(sample: Dict[str, object], view: pd.DataFrame, value_col: Optional[str] = None) -> Dict[str, float]:
+    """{"estimate", "ci95"} of the row count (value_col None) or of value_col's sum over view."""
+    if value_col is None:
+        values = np.ones(len(view))
+    else:
+        values = pd.to_numeric(view[value_col], errors="coerce").to_numpy()
+    if not len(view):
+        return {"estimate": 0.0, CI: 0.0}
+    row = _totals(sample, view, values).iloc[0]
+    return {"estimate": float(row["estimate"]), CI: float(row[CI])}
+
+
+def category_breakdown(sample: Dict[str, object], view: pd.DataFrame, cat_col: str, value_col: str,
+                       top: int = 20) -> pd.DataFrame:
+    """Estimated analytics.category_breakdown, plus the CI column."""
+    values = pd.to_numeric(view[value_col], errors="coerce").to_numpy()
+    out = _totals(sample, view, values, keys=view[cat_col]).rename(columns={"estimate": value_col})
+    out.index.name = cat_col
+    return out.reset_index().sort_values(value_col, ascending=False).head(top)
+
+
+def time_series(sample: Dict[str, object], view: pd.DataFrame, date_col: str, value_col: str) -> pd.DataFrame:
+    """Estimated analytics.time_series, plus the CI column."""
+    dates = pd.to_datetime(view[date_col], errors="coerce")
+    ok = dates.notna().to_numpy()
+    sub = view[ok]
+    values = pd.to_numeric(sub[value_col], errors="coerce").to_numpy()
+    out = _totals(sample, sub, values, keys=dates[ok]).rename(columns={"estimate": value_col})
+    out.index.name = date_col
+    return out.reset_index().sort_values(date_col)
@@ -0,0 +1,299 @@
+# sketches.py — fixed-size, mergeable column summaries
+#
+# Per text column: a HyperLogLog distinct count and a Misra-Gries heavy-hitter
+# table. Per numeric column: a quantile digest (t-digest style centroids) plus
+# exact count, sum, min and max. All are built chunk by chunk and merged, so
+# memory stays the same however many rows there are, and the sketch of an
+# appended dataset is the merge of the stored sketch and the delta's. They
+# tell the Dashboard whether a column is a category or identifier-like, which
+# values are most frequent, and a numeric column's bounds, percentiles and
+# distribution, without materializing, sorting or charting every value.
+#   HyperLogLog   2^HLL_P one-byte registers; ±1.04/√(2^HLL_P) (≈1.6%) relative error
+#   Misra-Gries   at most TOP_K counters; each count is low by at most top_error
+#   digest        about COMPRESSION/2 centroids, smallest in the tails, so
+#                 extreme percentiles are the most precise
+# Sketches are dicts (column → sketch); to_json/from_json store them as
+# dataset artifacts (appends.py). No Streamlit here.
+from __future__ import annotations
+
+import base64
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+HLL_P = 12
+TOP_K = 512
+CHUNK_ROWS = 1_000_000
+CATEGORICAL_MAX = 1000   # at most this many distinct values: a category
+ID_RATIO = 0.9           # distinct / non-null at least this (and > ID_MIN_DISTINCT): identifier-like
+ID_MIN_DISTINCT = 100
+COMPRESSION = 400
+
+
+# ---------- HyperLogLog ----------
+
+def _hashes(s: pd.Series) -> np.ndarray:
+    """64-bit hashes of the non-null values; numbers hash by value, so 3 and 3.0 agree."""
+    s = s.dropna()
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        return pd.util.hash_array(s.to_numpy(dtype="float64"))
+    return pd.util.hash_array(s.to_numpy(dtype=object), categorize=True)
+
+
+def hll_add(registers: np.ndarray, s: pd.Series) -> np.ndarray:
+    """Registers updated with the values of s (in place; also returned)."""
+    h = _hashes(s)
+    if not len(h):
+        return registers
+    idx = (h >> np.uint64(64 - HLL_P)).astype(np.intp)
+    rest = (h << np.uint64(HLL_P)) | np.uint64(1 << (HLL_P - 1))  # sentinel bit bounds the rank
+    rank = (64 - np.floor(np.log2(rest.astype(np.float64)))).astype(np.uint8)
+    np.maximum.at(registers, idx, rank)
+    return registers
+
+
+def hll_count(registers: np.ndarray) -> float:
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)  # linear counting for small cardinalities
+    return float(estimate)
+
+
+# ---------- Misra-Gries ----------
+
+def _top_reduce(counts: Dict[str, int], k: int) -> Tuple[Dict[str, int], int]:
+    """Keep the k largest counters, each less the (k+1)-th count; returns (counters, amount subtracted)."""
+    if len(counts) <= k:
+        return counts, 0
+    ranked = sorted(counts.items(), key=lambda kv: kv[1], reverse=True)
+    cut = ranked[k][1]
+    return {v: c - cut for v, c in ranked[:k] if c > cut}, cut
+
+
+def _top_merge(a: Dict[str, int], b: Dict[str, int], k: int) -> Tuple[Dict[str, int], int]:
+    counts = dict(a)
+    for v, c in b.items():
+        counts[v] = counts.get(v, 0) + c
+    return _top_reduce(counts, k)
+
+
+# ---------- Quantile digest ----------
+
+def _scale(q: np.ndarray) -> np.ndarray:
+    """t-digest k1 scale: one unit of k per centroid, so centroids shrink towards q = 0 and 1."""
+    return COMPRESSION / (2 * np.pi) * np.arcsin(2 * np.clip(q, 0.0, 1.0) - 1)
+
+
+def _compress(means: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge sorted-by-mean centroids that fall in the same unit of k (vectorized, one pass)."""
+    if not len(means):
+        return means, weights
+    order = np.argsort(means, kind="stable")
+    means, weights = means[order], weights[order]
+    left = (np.cumsum(weights) - weights) / weights.sum()
+    bucket = np.floor(_scale(left)).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    w = np.add.reduceat(weights, starts)
+    return np.add.reduceat(means * weights, starts) / w, w
+
+
+def _digest_merge(a: dict, b: dict) -> dict:
+    means, weights = _compress(np.concatenate([a["means"], b["means"]]),
+                               np.concatenate([a["weights"], b["weights"]]))
+    bounds = [v for v in (a["min"], b["min"]) if v is not None]
+    tops = [v for v in (a["max"], b["max"]) if v is not None]
+    return {
+        "kind": "number",
+        "rows": a["rows"] + b["rows"],
+        "nulls": a["nulls"] + b["nulls"],
+        "sum": a["sum"] + b["sum"],
+        "min": min(bounds) if bounds else None,
+        "max": max(tops) if tops else None,
+        "means": means,
+        "weights": weights,
+    }
+
+
+def _digest(s: pd.Series, weights: Optional[np.ndarray] = None) -> dict:
+    values = pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64")
+    ok = np.isfinite(values)
+    w = np.ones(int(ok.sum())) if weights is None else np.asarray(weights, dtype="float64")[ok]
+    v = values[ok]
+    means, cw = _compress(v, w)
+    return {
+        "kind": "number", "rows": int(len(values)), "nulls": int((~ok).sum()), "sum": float(np.dot(v, w)),
+        "min": float(v.min()) if len(v) else None, "max": float(v.max()) if len(v) else None,
+        "means": means, "weights": cw,
+    }
+
+
+def quantile(sk: dict, q):
+    """Estimated value at quantile(s) q in [0, 1] (exact at 0 and 1); None for an empty column."""
+    total = sk["weights"].sum()
+    if not total:
+        return None
+    centers = np.cumsum(sk["weights"]) - sk["weights"] / 2
+    out = np.interp(np.asarray(q, dtype=float) * total,
+                    np.r_[0.0, centers, total], np.r_[sk["min"], sk["means"], sk["max"]])
+    return float(out) if np.ndim(out) == 0 else out
+
+
+def cdf(sk: dict, x) -> np.ndarray:
+    """Estimated fraction of the values at or below x."""
+    total = sk["weights"].sum()
+    centers = np.cumsum(sk["weights"]) - sk["weights"] / 2
+    xs, idx = np.unique(np.r_[sk["min"], sk["means"], sk["max"]], return_index=True)
+    ys = np.r_[0.0, centers, total][idx]
+    return np.interp(x, xs, ys, left=0.0, right=total) / total
+
+
+def histogram(sk: dict, bins: int = 30) -> pd.DataFrame:
+    """Equal-width bins over [min, max] with estimated (weighted) row counts: columns from, to, rows."""
+    if sk["min"] is None:
+        return pd.DataFrame(columns=["from", "to", "rows"])
+    total = sk["weights"].sum()
+    if sk["max"] == sk["min"]:
+        return pd.DataFrame({"from": [sk["min"]], "to": [sk["max"]], "rows": [total]})
+    edges = np.linspace(sk["min"], sk["max"], bins + 1)
+    cum = cdf(sk, edges)
+    cum[0], cum[-1] = 0.0, 1.0  # every value lies in [min, max]
+    return pd.DataFrame({"from": edges[:-1], "to": edges[1:], "rows": np.diff(cum) * total})
+
+
+def box(sk: dict) -> Optional[Dict[str, float]]:
+    """Box-plot summary: quartiles and 1.5·IQR fences clipped to the observed range."""
+    if sk["min"] is None:
+        return None
+    q1, median, q3 = quantile(sk, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    return {"min": sk["min"], "q1": float(q1), "median": float(median), "q3": float(q3), "max": sk["max"],
+            "lowerfence": max(sk["min"], float(q1 - 1.5 * iqr)), "upperfence": min(sk["max"], float(q3 + 1.5 * iqr))}
+
+
+# ---------- Column sketches ----------
+
+def _empty(kind: str = "text") -> dict:
+    if kind == "number":
+        return {"kind": "number", "rows": 0, "nulls": 0, "sum": 0.0, "min": None, "max": None,
+                "means": np.zeros(0), "weights": np.zeros(0)}
+    return {"kind": "text", "rows": 0, "nulls": 0, "hll": np.zeros(1 << HLL_P, dtype=np.uint8),
+            "top": {}, "top_error": 0, "exact": True}
+
+
+def merge(a: dict, b: dict) -> dict:
+    """Sketch of the rows of both (a and b are left unchanged)."""
+    if a.get("kind") == "number":
+        return _digest_merge(a, b)
+    top, cut = _top_merge(a["top"], b["top"], TOP_K)
+    return {
+        "kind": "text",
+        "rows": a["rows"] + b["rows"],
+        "nulls": a["nulls"] + b["nulls"],
+        "hll": np.maximum(a["hll"], b["hll"]),
+        "top": top,
+        "top_error": a["top_error"] + b["top_error"] + cut,
+        "exact": a["exact"] and b["exact"] and not cut,
+    }
+
+
+def _is_number(s: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s)
+
+
+def sketch_column(s: pd.Series, chunk_rows: int = CHUNK_ROWS, weights: Optional[np.ndarray] = None) -> dict:
+    """
+    Sketch of one column, built per chunk of chunk_rows and merged: a digest
+    for numbers (rows counted with `weights` when given), else HLL + top values.
+    """
+    if _is_number(s):
+        out = _empty("number")
+        for start in range(0, len(s), chunk_rows):
+            w = None if weights is None else np.asarray(weights)[start:start + chunk_rows]
+            out = merge(out, _digest(s.iloc[start:start + chunk_rows], w))
+        return out
+    out = _empty()
+    for start in range(0, len(s), chunk_rows):
+        part = s.iloc[start:start + chunk_rows]
+        counts = part.value_counts(dropna=True, sort=True)  # largest first
+        cut = int(counts.iloc[TOP_K]) if len(counts) > TOP_K else 0
+        counts = counts.iloc[:TOP_K] - cut
+        top = {str(v): int(c) for v, c in counts[counts > 0].items()}
+        out = merge(out, {
+            "kind": "text", "rows": int(len(part)), "nulls": int(part.isna().sum()),
+            "hll": hll_add(np.zeros(1 << HLL_P, dtype=np.uint8), part),
+            "top": top, "top_error": cut, "exact": not cut,
+        })
+    return out
+
+
+def sketch_frame(df: pd.DataFrame, columns: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+    """{column: sketch} for `columns` (default: the text and numeric columns)."""
+    if columns is None:
+        columns = df.select_dtypes(include=["number", "object", "category", "bool"]).columns
+    return {c: sketch_column(df[c]) for c in columns}
+
+
+def merge_frames(a: Dict[str, dict], b: Dict[str, dict]) -> Dict[str, dict]:
+    """Column-wise merge; a column sketched on one side only keeps that sketch."""
+    return {c: merge(a[c], b[c]) if c in a and c in b else a.get(c) or b[c] for c in {**a, **b}}
+
+
+# ---------- Reading a sketch ----------
+
+def distinct(sk: dict) -> int:
+    """Distinct non-null values: exact while every value still has a counter, else the HLL estimate."""
+    if sk["exact"]:
+        return len(sk["top"])
+    return max(int(round(hll_count(sk["hll"]))), len(sk["top"]))
+
+
+def classify(sk: dict) -> str:
+    """"categorical", "identifier" (nearly one value per row) or "high-cardinality"."""
+    d = distinct(sk)
+    non_null = sk["rows"] - sk["nulls"]
+    if d > ID_MIN_DISTINCT and d >= ID_RATIO * non_null:
+        return "identifier"
+    return "categorical" if d <= CATEGORICAL_MAX else "high-cardinality"
+
+
+def top_values(sk: dict, n: int = TOP_K) -> List[Tuple[str, int]]:
+    """Most frequent values with their counts (lower bounds unless the sketch is exact), largest first."""
+    return sorted(sk["top"].items(), key=lambda kv: kv[1], reverse=True)[:n]
+
+
+def summary(sk: dict, n: int = 5) -> dict:
+    return {
+        "kind": classify(sk),
+        "distinct": distinct(sk),
+        "exact": sk["exact"],
+        "rows": sk["rows"],
+        "nulls": sk["nulls"],
+        "top": top_values(sk, n),
+    }
+
+
+# ---------- Storage ----------
+
+def _encode(sk: dict) -> dict:
+    if sk.get("kind") == "number":
+        return {**sk, "means": sk["means"].tolist(), "weights": sk["weights"].tolist()}
+    return {**sk, "hll": base64.b64encode(sk["hll"].tobytes()).decode("ascii")}
+
+
+def _decode(sk: dict) -> dict:
+    if sk.get("kind") == "number":
+        return {**sk, "means": np.asarray(sk["means"], dtype="float64"),
+                "weights": np.asarray(sk["weights"], dtype="float64")}
+    return {"kind": "text", **sk, "hll": np.frombuffer(base64.b64decode(sk["hll"]), dtype=np.uint8).copy()}
+
+
+def to_json(sketches: Dict[str, dict]) -> dict:
+    return {c: _encode(sk) for c, sk in sketches.items()}
+
+
+def from_json(payload: dict) -> Dict[str, dict]:
+    return {c: _decode(sk) for c, sk in payload.items()}
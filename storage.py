@@ -4,6 +4,8 @@ import os
 from datetime import datetime
 from typing import Optional, Tuple
 
+from profiler import traced
+
 SUPABASE_URL = os.environ.get("SUPABASE_URL") or ""
 SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY") or ""
 SUPABASE_BUCKET = os.environ.get("SUPABASE_BUCKET", "luminaiq-uploads")
@@ -33,6 +35,7 @@ def supabase():
         _client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
     return _client
 
+@traced()
 def upload_bytes(filename: str, content: bytes, content_type: str = "text/csv") -> Tuple[str, str]:
     """Upload bytes to Supabase Storage and return (path_in_bucket, public_url)."""
     _check_config()
@@ -48,6 +51,7 @@ def upload_bytes(filename: str, content: bytes, content_type: str = "text/csv")
     public_url = sb.get_public_url(path)
     return path, public_url
 
+@traced()
 def create_signed_url(path: str, expires_in: int = 3600) -> str:
     _check_config()
     _import_supabase()
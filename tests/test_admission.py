@@ -0,0 +1,156 @@
+# tests/test_admission.py — concurrency, memory and per-user limits of admission control
+import threading
+import time
+
+import pytest
+
+import admission
+from admission import AdmissionRefused, admit
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    """Small limits and a clean scheduler for every test."""
+    monkeypatch.setattr(admission, "MAX_CONCURRENT", 2)
+    monkeypatch.setattr(admission, "MEMORY_MB", 1000.0)
+    monkeypatch.setattr(admission, "MAX_QUEUE", 4)
+    monkeypatch.setattr(admission, "MAX_PER_USER", 2)
+    monkeypatch.setattr(admission, "MAX_WAIT_S", 30.0)
+    for state in (admission._requests, admission._running, admission._waiting, admission._durations):
+        state.clear()
+    yield
+    assert not admission._requests and not admission._waiting  # nothing leaks
+
+
+class _Holder:
+    """A thread that enters admit() and stays inside until release()."""
+
+    def __init__(self, op: str, user: str, cost_mb: float = 0.0):
+        self.entered, self._release = threading.Event(), threading.Event()
+        self.positions, self.error = [], None
+        self._thread = threading.Thread(target=self._run, args=(op, user, cost_mb), daemon=True)
+        self._thread.start()
+
+    def _run(self, op, user, cost_mb):
+        try:
+            with admit(op, user=user, cost_mb=cost_mb, on_wait=lambda pos, eta: self.positions.append(pos)):
+                self.entered.set()
+                self._release.wait(10)
+        except AdmissionRefused as e:
+            self.error = e
+
+    def release(self) -> None:
+        self._release.set()
+        self._thread.join(10)
+
+
+def _settle(running: int, waiting: int) -> None:
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        s = admission.stats()
+        if (s["running"], s["waiting"]) == (running, waiting):
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"expected {running} running / {waiting} waiting, got {admission.stats()['requests']}")
+
+
+# ---------- Per-user limit ----------
+
+def test_user_over_its_limit_is_refused():
+    held = [_Holder("load", "alice") for _ in range(2)]
+    _settle(2, 0)
+    with pytest.raises(AdmissionRefused, match="already have 2"):
+        with admit("load", user="alice"):
+            pass
+    for h in held:
+        h.release()
+
+
+def test_per_user_limit_counts_waiting_requests():
+    others = [_Holder("load", "bob"), _Holder("load", "carol")]
+    _settle(2, 0)
+    queued = [_Holder("load", "alice"), _Holder("load", "alice")]
+    _settle(2, 2)
+    with pytest.raises(AdmissionRefused, match="already have 2"):
+        with admit("load", user="alice"):
+            pass
+    for h in others + queued:
+        h.release()
+    assert all(h.error is None and h.entered.is_set() for h in others + queued)
+
+
+# ---------- Global limits ----------
+
+def test_requests_over_the_concurrency_limit_wait_for_a_slot():
+    first, second = _Holder("fit", "alice"), _Holder("fit", "bob")
+    _settle(2, 0)
+    third = _Holder("fit", "carol")
+    _settle(2, 1)
+    assert not third.entered.is_set() and third.positions == [0]
+    first.release()
+    assert third.entered.wait(5)
+    second.release()
+    third.release()
+    assert admission.stats()["queued_total"] >= 1
+
+
+def test_memory_budget_holds_back_a_request_that_does_not_fit():
+    big = _Holder("backtest", "alice", cost_mb=700)
+    _settle(1, 0)
+    small = _Holder("backtest", "bob", cost_mb=400)
+    _settle(1, 1)  # a slot is free but 700 + 400 MB is over the budget
+    big.release()
+    assert small.entered.wait(5)
+    small.release()
+
+
+def test_request_larger_than_the_budget_is_refused_up_front():
+    with pytest.raises(AdmissionRefused, match="more than the server allows"):
+        with admit("backtest", user="alice", cost_mb=1500):
+            pass
+
+
+def test_full_queue_is_refused():
+    running = [_Holder("load", f"u{i}") for i in range(2)]
+    _settle(2, 0)
+    waiting = [_Holder("load", f"w{i}") for i in range(4)]
+    _settle(2, 4)
+    with pytest.raises(AdmissionRefused, match="at capacity"):
+        with admit("load", user="late"):
+            pass
+    for h in running + waiting:
+        h.release()
+
+
+def test_slow_operation_is_refused_when_the_wait_would_be_too_long():
+    admission._durations["backtest"] = 25.0
+    running = [_Holder("backtest", f"u{i}") for i in range(2)]
+    _settle(2, 0)
+    refused = admission.stats()["refused_total"]
+    with pytest.raises(AdmissionRefused, match="usually takes 25s"):
+        with admit("backtest", user="late"):
+            pass
+    assert admission.stats()["refused_total"] == refused + 1
+    for h in running:
+        h.release()
+
+
+# ---------- Fair queueing ----------
+
+def test_waiting_requests_are_served_round_robin_per_user():
+    running = [_Holder("load", "x"), _Holder("load", "y")]
+    _settle(2, 0)
+    a1 = _Holder("load", "alice")
+    _settle(2, 1)
+    a2 = _Holder("load", "alice")
+    _settle(2, 2)
+    b1 = _Holder("load", "bob")
+    _settle(2, 3)
+    assert [r["user"] for r in admission.stats()["requests"] if r["state"].startswith("waiting")] == \
+        ["alice", "bob", "alice"]
+    running[0].release()
+    assert a1.entered.wait(5)
+    running[1].release()
+    assert b1.entered.wait(5) and not a2.entered.is_set()
+    for h in (a1, b1, a2):
+        h.release()
@@ -0,0 +1,104 @@
+# tests/test_analytics.py — bincount pivot tables (pivot, pivot_cells / add_cells / pivot_from_cells)
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import PIVOT_MISSING, PIVOT_OTHER, add_cells, pivot, pivot_cells, pivot_from_cells
+
+
+def _sales(n: int = 3000, seed: int = 0) -> pd.DataFrame:
+    """Region × category sales with missing labels and missing values."""
+    rng = np.random.default_rng(seed)
+    region = rng.choice(["north", "south", "east", "west", "central"], n, p=[0.4, 0.25, 0.15, 0.15, 0.05]).astype(object)
+    category = rng.choice([f"c{i}" for i in range(12)], n).astype(object)
+    revenue = rng.gamma(2.0, 50.0, n)
+    region[rng.random(n) < 0.05] = None
+    category[rng.random(n) < 0.03] = np.nan
+    revenue[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({"region": region, "category": category, "revenue": revenue})
+
+
+def _expected(df: pd.DataFrame, agg: str) -> pd.DataFrame:
+    """pd.pivot_table of the same rows, missing labels shown as PIVOT_MISSING."""
+    labelled = df.assign(region=df["region"].fillna(PIVOT_MISSING), category=df["category"].fillna(PIVOT_MISSING))
+    # pivot()'s count is the number of rows in the cell, like aggfunc="size"
+    return pd.pivot_table(labelled, values="revenue", index="region", columns="category",
+                          aggfunc="size" if agg == "count" else agg)
+
+
+@pytest.mark.parametrize("agg", ["sum", "mean", "count"])
+def test_matches_pivot_table(agg):
+    df = _sales()
+    ours = pivot(df, "region", "category", "revenue", agg=agg)
+    expected = _expected(df, agg)
+    assert set(ours.index) == set(expected.index) and PIVOT_MISSING in ours.index
+    assert set(ours.columns) == set(expected.columns) and PIVOT_MISSING in ours.columns
+    expected = expected.reindex(index=ours.index, columns=ours.columns).astype(float)
+    np.testing.assert_allclose(ours.to_numpy(), expected.to_numpy(), rtol=1e-12, equal_nan=True)
+
+
+def test_count_without_a_value_column():
+    df = _sales()
+    ours = pivot(df, "region", "category")
+    expected = _expected(df, "count").reindex(index=ours.index, columns=ours.columns).astype(float)
+    np.testing.assert_allclose(ours.to_numpy(), expected.to_numpy(), equal_nan=True)
+
+
+def test_empty_cells_are_nan():
+    df = pd.DataFrame({"r": ["a", "a", "b"], "c": ["x", "y", "x"], "v": [1.0, np.nan, 2.0]})
+    ours = pivot(df, "r", "c", "v")
+    assert np.isnan(ours.loc["b", "y"])
+    assert ours.loc["a", "y"] == 0.0  # a row with no number still makes the cell exist
+    assert np.isnan(pivot(df, "r", "c", "v", agg="mean").loc["a", "y"])
+
+
+# ---------- Top-N pooling ----------
+
+@pytest.mark.parametrize("agg", ["sum", "count"])
+def test_pooling_into_other_keeps_the_totals(agg):
+    df = _sales(seed=1)
+    full = pivot(df, "region", "category", "revenue", agg=agg, top_rows=100, top_cols=100)
+    pooled = pivot(df, "region", "category", "revenue", agg=agg, top_rows=3, top_cols=4)
+    assert list(pooled.index[-1:]) == [PIVOT_OTHER] and list(pooled.columns[-1:]) == [PIVOT_OTHER]
+    assert pooled.shape == (4, 5)
+    assert np.nansum(pooled.to_numpy()) == pytest.approx(np.nansum(full.to_numpy()))
+    kept_rows, kept_cols = list(pooled.index[:-1]), list(pooled.columns[:-1])
+    # kept labels have the largest totals, and their cells are unchanged
+    row_totals = full.sum(axis=1).sort_values(ascending=False)
+    assert set(kept_rows) == set(row_totals.index[:3])
+    pd.testing.assert_frame_equal(pooled.loc[kept_rows, kept_cols], full.loc[kept_rows, kept_cols], check_names=False)
+    other = full.drop(index=kept_rows)
+    assert np.nansum(pooled.loc[PIVOT_OTHER].to_numpy()) == pytest.approx(np.nansum(other.to_numpy()))
+
+
+def test_mean_pools_by_weighted_rows():
+    df = _sales(seed=2)
+    pooled = pivot(df, "region", "category", "revenue", agg="mean", top_rows=2, top_cols=100)
+    kept = list(pooled.index[:-1])
+    rest = df[~df["region"].isin(kept)].assign(category=lambda d: d["category"].fillna(PIVOT_MISSING))
+    expected = rest.groupby("category")["revenue"].mean()
+    np.testing.assert_allclose(pooled.loc[PIVOT_OTHER, expected.index].to_numpy(dtype=float),
+                               expected.to_numpy(), rtol=1e-12)
+
+
+# ---------- Mergeable cells ----------
+
+@pytest.mark.parametrize("agg", ["sum", "mean", "count"])
+@pytest.mark.parametrize("top", [(30, 20), (3, 4)])
+def test_cells_of_two_halves_give_the_whole_pivot(agg, top):
+    df = _sales(seed=3)
+    k = 1700
+    cells = add_cells(pivot_cells(df.iloc[:k], "region", "category", "revenue"),
+                      pivot_cells(df.iloc[k:], "region", "category", "revenue"))
+    ours = pivot_from_cells(cells, "region", "category", agg=agg, top_rows=top[0], top_cols=top[1])
+    whole = pivot(df, "region", "category", "revenue", agg=agg, top_rows=top[0], top_cols=top[1])
+    pd.testing.assert_frame_equal(ours, whole, rtol=1e-12, check_names=False)
+
+
+def test_cells_keep_missing_labels():
+    df = _sales(seed=4)
+    cells = pivot_cells(df, "region", "category", "revenue")
+    assert cells["region"].isna().any() and cells["category"].isna().any()
+    assert cells["rows"].sum() == len(df)
+    assert cells["total"].sum() == pytest.approx(df["revenue"].sum())
+    assert add_cells(cells, cells.iloc[:0]) is cells
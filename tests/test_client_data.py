@@ -0,0 +1,113 @@
+# tests/test_client_data.py — canonical client schema and the (content, mapping) dataset cache
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+import client_data
+import datasets
+from client_data import CANONICAL_FIELDS, apply_mapping, content_hash, mapping_hash
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEMO_CSV = os.path.join(ROOT, "templates", "client_demo_retail.csv")
+CONFIG = os.path.join(ROOT, "config", "client_config.yaml")
+
+
+@pytest.fixture(scope="module")
+def demo_bytes() -> bytes:
+    with open(DEMO_CSV, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def mapping() -> dict:
+    with open(CONFIG, encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+# ---------- apply_mapping ----------
+
+def test_mapping_gives_canonical_columns_and_dtypes(demo_bytes, mapping):
+    df = client_data.read_client_csv(demo_bytes)
+    cdf = apply_mapping(df, mapping)
+    assert list(cdf.columns) == list(CANONICAL_FIELDS)
+    assert cdf["date"].dtype == "datetime64[ns]"
+    for field in client_data.NUMERIC_FIELDS:
+        assert cdf[field].dtype == "float64", field
+    for field in client_data.CATEGORY_FIELDS:
+        assert isinstance(cdf[field].dtype, pd.CategoricalDtype), field
+    np.testing.assert_array_equal(cdf["amount"], df["revenue"])
+    assert cdf["subcategory"].astype(str).tolist() == df["product"].tolist()
+    assert cdf.index.equals(df.index)
+
+
+def test_unmapped_and_missing_fields_are_omitted():
+    df = pd.DataFrame({"when": ["2024-01-02"], "rev": [3], "extra": ["x"]})
+    cdf = apply_mapping(df, {"date": "when", "amount": "rev", "cost": "not_in_data", "region": None})
+    assert list(cdf.columns) == ["date", "amount"]
+
+
+def test_unparseable_values_become_missing():
+    df = pd.DataFrame({"d": ["2024-01-02", "not a date"], "q": ["4", "n/a"], "c": ["a", None]})
+    cdf = apply_mapping(df, {"date": "d", "quantity": "q", "category": "c"})
+    assert cdf["date"].isna().tolist() == [False, True]
+    assert cdf["quantity"].tolist()[0] == 4.0 and np.isnan(cdf["quantity"].iloc[1])
+    assert cdf["category"].isna().tolist() == [False, True]
+
+
+def test_mapping_hash_ignores_key_order(mapping):
+    reordered = dict(reversed(list(mapping.items())))
+    assert mapping_hash(reordered) == mapping_hash(mapping)
+    assert mapping_hash({**mapping, "amount": "cost"}) != mapping_hash(mapping)
+
+
+# ---------- Cache keyed on (content, mapping) ----------
+
+@pytest.fixture
+def calls(monkeypatch):
+    datasets.read_client_csv.clear()
+    datasets.load_client_dataset.clear()
+    seen = {"read": 0, "map": 0}
+    read, apply = client_data.read_client_csv, client_data.apply_mapping
+
+    def spy_read(data):
+        seen["read"] += 1
+        return read(data)
+
+    def spy_apply(df, m):
+        seen["map"] += 1
+        return apply(df, m)
+
+    monkeypatch.setattr(client_data, "read_client_csv", spy_read)
+    monkeypatch.setattr(client_data, "apply_mapping", spy_apply)
+    yield seen
+    datasets.read_client_csv.clear()
+    datasets.load_client_dataset.clear()
+
+
+def _load(data: bytes, m: dict) -> pd.DataFrame:
+    return datasets.load_client_dataset(content_hash(data), mapping_hash(m), data, m)
+
+
+def test_same_content_and_mapping_is_mapped_once(calls, demo_bytes, mapping):
+    first = _load(demo_bytes, mapping)
+    again = _load(demo_bytes, dict(reversed(list(mapping.items()))))
+    assert calls == {"read": 1, "map": 1}
+    pd.testing.assert_frame_equal(first, again)
+
+
+def test_new_mapping_reuses_the_parsed_csv(calls, demo_bytes, mapping):
+    _load(demo_bytes, mapping)
+    other = _load(demo_bytes, {**mapping, "amount": "cost"})
+    assert calls == {"read": 1, "map": 2}
+    np.testing.assert_array_equal(other["amount"], other["cost"])
+
+
+def test_new_content_is_read_and_mapped_again(calls, demo_bytes, mapping):
+    _load(demo_bytes, mapping)
+    lines = demo_bytes.splitlines(keepends=True)
+    smaller = _load(b"".join(lines[:11]), mapping)
+    assert calls == {"read": 2, "map": 2}
+    assert len(smaller) == 10
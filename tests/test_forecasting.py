@@ -0,0 +1,151 @@
+# tests/test_forecasting.py — incremental forecasting state (init_state / update_state / state_fit) and backtests
+import numpy as np
+import pytest
+
+from forecasting import (
+    backtest_cutoffs, es_forecast, fit_es, fit_linear_batch, init_state, rolling_origin_backtest,
+    state_fit, update_state,
+)
+
+M = 7
+HORIZON = 14
+
+
+def _series(n: int, seed: int = 0) -> np.ndarray:
+    """Trend + weekly season + noise, like a resampled daily revenue series."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n, dtype=float)
+    return 100 + 0.8 * t + 12 * np.sin(2 * np.pi * t / M) + rng.normal(0, 3, n)
+
+
+def _params(state: dict) -> tuple:
+    return state["alpha"], state["beta"], state["gamma"]
+
+
+def _assert_same_fit(a: dict, b: dict) -> None:
+    assert a["kind"][0] == b["kind"][0]
+    assert a["n"] == b["n"]
+    for key in ("alpha", "beta", "gamma", "level", "trend", "season"):
+        np.testing.assert_allclose(a[key], b[key], rtol=1e-9, atol=1e-9, err_msg=key)
+    np.testing.assert_allclose(es_forecast(a, HORIZON), es_forecast(b, HORIZON), rtol=1e-9, atol=1e-9)
+
+
+# ---------- Linear ----------
+
+def test_linear_incremental_equals_full_refit():
+    y = _series(60)
+    state = update_state(init_state(y[:40], "linear", m=M), y)
+    assert state is not None and state["n"] == len(y) - 1
+    _assert_same_fit(state_fit(state, y), state_fit(init_state(y, "linear", m=M), y))
+
+
+def test_linear_state_fit_matches_closed_form():
+    y = _series(45, seed=1)
+    fit = state_fit(update_state(init_state(y[:20], "linear", m=M), y), y)
+    direct = fit_linear_batch(y, m=M)
+    np.testing.assert_allclose(fit["level"], direct["level"], rtol=1e-9)
+    np.testing.assert_allclose(fit["trend"], direct["trend"], rtol=1e-9)
+
+
+def test_linear_ignores_missing_periods():
+    y = _series(50, seed=2)
+    y[[5, 33, 41]] = np.nan
+    state = update_state(init_state(y[:30], "linear", m=M), y)
+    _assert_same_fit(state_fit(state, y), state_fit(init_state(y, "linear", m=M), y))
+
+
+# ---------- Exponential smoothing ----------
+
+@pytest.mark.parametrize("kind", ["ses", "holt", "hw"])
+def test_es_incremental_equals_full_refit_with_fixed_parameters(kind):
+    y = _series(70, seed=3)
+    first = init_state(y[:35], kind, m=M)
+    state = update_state(first, y)
+    assert state is not None and _params(state) == _params(first)
+    full = init_state(y, kind, m=M, params=_params(first))
+    _assert_same_fit(state_fit(state, y), state_fit(full, y))
+
+
+@pytest.mark.parametrize("kind", ["ses", "holt", "hw"])
+def test_es_update_in_several_steps(kind):
+    y = _series(80, seed=4)
+    state = init_state(y[:30], kind, m=M)
+    params = _params(state)
+    for end in (33, 47, 48, 80):
+        state = update_state(state, y[:end])
+        assert state is not None
+    _assert_same_fit(state_fit(state, y), state_fit(init_state(y, kind, m=M, params=params), y))
+
+
+# ---------- Uncommitted last period ----------
+
+@pytest.mark.parametrize("kind", ["linear", "holt", "hw"])
+def test_last_period_is_not_committed(kind):
+    y = _series(50, seed=5)
+    state = init_state(y, kind, m=M)
+    assert state["n"] == len(y) - 1
+
+    # the current (partial) period grows: same committed history, new last value
+    revised = y.copy()
+    revised[-1] += 40.0
+    again = update_state(state, revised)
+    assert again is not None and again["n"] == state["n"]
+    full = init_state(revised, kind, m=M, params=_params(state))
+    _assert_same_fit(state_fit(again, revised), state_fit(full, revised))
+
+
+def test_update_with_the_same_extract_is_a_no_op():
+    y = _series(40, seed=6)
+    state = init_state(y, "holt", m=M)
+    assert update_state(state, y) == state
+
+
+# ---------- Rewritten history ----------
+
+@pytest.mark.parametrize("kind", ["linear", "ses", "hw"])
+def test_rewritten_committed_value_needs_a_refit(kind):
+    y = _series(50, seed=7)
+    state = init_state(y[:40], kind, m=M)
+    rewritten = y.copy()
+    rewritten[state["n"] - 2] += 25.0  # inside the committed tail
+    assert update_state(state, rewritten) is None
+
+
+def test_shorter_extract_needs_a_refit():
+    y = _series(50, seed=8)
+    state = init_state(y, "linear", m=M)
+    assert update_state(state, y[:30]) is None
+
+
+def test_too_short_series_is_rejected():
+    with pytest.raises(ValueError):
+        init_state([1.0, 2.0], "linear")
+
+
+# ---------- Backtest ----------
+
+def test_cutoffs_leave_room_for_the_longest_horizon():
+    cutoffs = backtest_cutoffs(50, HORIZON, n_folds=100, min_train=3)
+    assert cutoffs[0] == 3 and cutoffs[-1] == 50 - HORIZON
+    assert len(backtest_cutoffs(50, HORIZON, n_folds=5)) == 5
+    assert len(backtest_cutoffs(10, HORIZON, n_folds=5)) == 0
+
+
+@pytest.mark.parametrize("kind", ["ses", "holt", "hw"])
+def test_es_backtest_refits_on_each_training_slice(kind):
+    y = _series(70, seed=6)
+    bt = rolling_origin_backtest(y, (1, 7), n_folds=8, fit=fit_es(y, kind, m=M))
+    assert len(bt) == 16 and bt["target_idx"].max() < len(y)
+    for cutoff, fold in bt.groupby("cutoff"):
+        expected = es_forecast(fit_es(y[:cutoff], kind, m=M), 7)[0, fold["horizon"].to_numpy() - 1]
+        np.testing.assert_allclose(fold["forecast"].to_numpy(), expected, rtol=1e-9)
+
+
+def test_es_backtest_does_not_see_future_points():
+    y = _series(70, seed=7)
+    future = y.copy()
+    future[55:] *= 3
+    a = rolling_origin_backtest(y, (1, 7), n_folds=20, fit=fit_es(y, "hw", m=M))
+    b = rolling_origin_backtest(future, (1, 7), n_folds=20, fit=fit_es(future, "hw", m=M))
+    early = a["cutoff"] <= 55
+    np.testing.assert_allclose(a.loc[early, "forecast"], b.loc[early, "forecast"], rtol=1e-12)
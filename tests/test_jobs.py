@@ -0,0 +1,87 @@
+# tests/test_jobs.py — job input hashes and reuse of finished results across users
+import os
+
+import pandas as pd
+import pytest
+
+import db
+import jobs
+from jobs import input_hash
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEMO_CSV = os.path.join(ROOT, "templates", "client_demo_retail.csv")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A fresh jobs database and result directory; the pool is shut down afterwards."""
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(jobs, "JOB_DIR", str(tmp_path / "results"))
+    monkeypatch.setattr(jobs, "_pool", None)
+    db.init_db()
+    yield tmp_path
+    if jobs._pool is not None:
+        jobs._pool.shutdown(wait=True)
+
+
+def _export_params() -> dict:
+    return {"dataset": {"path": DEMO_CSV}, "filters": {}, "png": False}
+
+
+def _run_here(kind: str, params: dict, user_id: str) -> str:
+    """Queue a job row and run it in this process, as a worker would."""
+    job_id = f"{kind}-{user_id}"
+    db.insert_job(job_id, user_id, kind, input_hash(kind, params), "", jobs._now(), jobs.OWNER)
+    jobs._execute(job_id, kind, params)
+    return job_id
+
+
+# ---------- Input hash ----------
+
+def test_bytes_are_hashed_by_content():
+    a = {"client": {"data": b"date,amount\n2024-01-01,3\n", "mapping": {"amount": "amount"}}}
+    b = {"client": {"data": bytes(bytearray(b"date,amount\n2024-01-01,3\n")), "mapping": {"amount": "amount"}}}
+    assert input_hash("dashboard_export", a) == input_hash("dashboard_export", b)
+    assert input_hash("dashboard_export", {"client": {**a["client"], "data": bytearray(a["client"]["data"])}}) == \
+        input_hash("dashboard_export", a)
+    c = {"client": {"data": b"date,amount\n2024-01-01,4\n", "mapping": {"amount": "amount"}}}
+    assert input_hash("dashboard_export", a) != input_hash("dashboard_export", c)
+
+
+def test_hash_ignores_key_order_but_not_kind_or_values():
+    p = {"filters": {"region": ["A", "B"]}, "png": False}
+    q = {"png": False, "filters": {"region": ["A", "B"]}}
+    assert input_hash("dashboard_export", p) == input_hash("dashboard_export", q)
+    assert input_hash("forecast_comparison", p) != input_hash("dashboard_export", p)
+    assert input_hash("dashboard_export", {**p, "png": True}) != input_hash("dashboard_export", p)
+
+
+# ---------- Reusing finished jobs ----------
+
+def test_finished_job_is_reused_by_the_same_user(store):
+    job_id = _run_here("dashboard_export", _export_params(), "1")
+    assert db.get_job(job_id)["status"] == "done"
+    assert jobs.submit("dashboard_export", _export_params(), user_id="1") == job_id
+
+
+def test_finished_job_is_reused_across_users(store):
+    job_id = _run_here("dashboard_export", _export_params(), "1")
+    first = db.get_job(job_id)
+    reused_id = jobs.submit("dashboard_export", _export_params(), user_id="2")
+    assert reused_id != job_id
+    reused = jobs.status(reused_id)
+    assert reused["status"] == "done" and reused["user_id"] == "2"
+    assert reused["result_path"] == first["result_path"]
+    assert [j["id"] for j in db.list_jobs_for_user("2")] == [reused_id]  # shows in the second user's history
+    out = jobs.result(reused)
+    assert out["rows"] == len(pd.read_csv(DEMO_CSV)) and out["bytes"] == jobs.result(first)["bytes"]
+
+
+def test_expired_job_is_not_reused(store):
+    job_id = _run_here("dashboard_export", _export_params(), "1")
+    path = db.get_job(job_id)["result_path"]
+    with db.get_conn() as conn:
+        conn.execute("UPDATE jobs SET created_at = '2000-01-01T00:00:00Z'")
+        conn.commit()
+    assert jobs.expire() == 1 and not os.path.exists(path)
+    assert db.find_job("dashboard_export", input_hash("dashboard_export", _export_params())) is None
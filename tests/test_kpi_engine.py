@@ -0,0 +1,138 @@
+# tests/test_kpi_engine.py — compiled KPI formulas (restricted syntax, shared reductions, parity with eval)
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+import kpi_engine
+from client_data import apply_mapping, source_aliases
+from kpi_engine import FormulaError, compile_formula, compile_plan, evaluate_kpis
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEMO_CSV = os.path.join(ROOT, "templates", "client_demo_retail.csv")
+CONFIG = os.path.join(ROOT, "config", "client_config.yaml")
+
+FORMULAS = [
+    "df['revenue'].sum()",
+    "df['revenue'].mean()",
+    "(df['margin'].sum() / df['revenue'].sum()) * 100",
+    "df['quantity'].count()",
+    "df['cost'].max() - df['cost'].min()",
+    "-df['margin'].min() + 2 ** 3",
+    "df['revenue'].sum() // 1000 % 7",
+]
+
+
+@pytest.fixture(scope="module")
+def demo() -> pd.DataFrame:
+    return pd.read_csv(DEMO_CSV)
+
+
+def _kpis(formulas):
+    return [{"id": f"k{i}", "label": f"KPI {i}", "formula": f} for i, f in enumerate(formulas)]
+
+
+# ---------- Restricted syntax ----------
+
+@pytest.mark.parametrize("formula", [
+    "df.revenue.sum()",                              # attribute access instead of df['col']
+    "df['revenue'].sum().real",                      # attribute on a result
+    "df['revenue'].apply(print)",                    # method outside the whitelist
+    "abs(df['revenue'].sum())",                      # call of a bare name
+    "open('/etc/passwd').read()",
+    "__import__('os').system('true')",               # dunder name
+    "df['revenue'].__class__",
+    "df['revenue'].sum.__globals__",
+    "df['revenue'][0]",                              # subscripts other than df['col']
+    "df[0].sum()",
+    "df['revenue'].sum()[0]",
+    "(lambda: 1)()",                                 # lambda
+    "[x for x in df['revenue']]",
+    "df['revenue'].sum(skipna=False)",               # arguments to a reduction
+    "df['revenue'].sum() if True else 0",
+    "df['revenue'].sum() > 0",
+    "'text'",
+    "True",
+    "other['revenue'].sum()",
+])
+def test_disallowed_syntax_is_rejected(formula):
+    with pytest.raises(FormulaError):
+        compile_formula(formula)
+
+
+def test_invalid_python_is_a_formula_error():
+    with pytest.raises(FormulaError, match="Invalid formula syntax"):
+        compile_formula("df['revenue'].sum(")
+
+
+def test_rejected_formula_is_reported_per_kpi(demo):
+    res = evaluate_kpis(_kpis(["df['revenue'].sum()", "__import__('os').getcwd()"]), demo)
+    assert res[0]["error"] is None and res[0]["value"] == pytest.approx(demo["revenue"].sum())
+    assert res[1]["value"] is None and "Unsupported expression" in res[1]["error"]
+
+
+# ---------- Missing columns ----------
+
+def test_missing_column_gives_a_clear_error(demo):
+    res = evaluate_kpis(_kpis(["df['profit'].sum() / df['revenue'].sum()", "df['revenue'].sum()"]), demo)
+    assert res[0]["value"] is None
+    assert res[0]["error"] == "Missing column(s): profit"
+    assert res[1]["error"] is None  # other KPIs are unaffected
+
+
+# ---------- Shared reductions ----------
+
+def test_shared_reductions_are_compiled_once():
+    plan = compile_plan(tuple(
+        (f"k{i}", f"KPI {i}", f) for i, f in enumerate([
+            "df['revenue'].sum()",
+            "(df['margin'].sum() / df['revenue'].sum()) * 100",
+            "df['margin'].sum() - df['revenue'].mean()",
+        ])
+    ))
+    assert plan["n_leaves"] == 3  # revenue.sum, margin.sum, revenue.mean
+    assert sorted(fn for fn, _ in plan["by_column"]["revenue"]) == ["mean", "sum"]
+    assert [fn for fn, _ in plan["by_column"]["margin"]] == ["sum"]
+
+
+def test_each_column_is_reduced_once(demo, monkeypatch):
+    calls = []
+    reduce_column = kpi_engine._reduce_column
+
+    def spy(s, fns, out):
+        calls.append(s.name)
+        reduce_column(s, fns, out)
+
+    monkeypatch.setattr(kpi_engine, "_reduce_column", spy)
+    evaluate_kpis(_kpis(FORMULAS), demo)
+    assert sorted(calls) == sorted(set(calls)) == ["cost", "margin", "quantity", "revenue"]
+
+
+# ---------- Parity with the old eval() path ----------
+
+def _eval(formula: str, df: pd.DataFrame):
+    return eval(formula, {"__builtins__": {}}, {"df": df, "pd": pd})  # the Client Template page before kpi_engine
+
+
+def test_matches_eval_on_the_demo_dataset(demo):
+    for formula, res in zip(FORMULAS, evaluate_kpis(_kpis(FORMULAS), demo)):
+        assert res["error"] is None, formula
+        np.testing.assert_allclose(res["value"], _eval(formula, demo), rtol=1e-12, err_msg=formula)
+
+
+def test_config_kpis_match_eval_through_the_client_mapping(demo):
+    with open(CONFIG, encoding="utf-8") as f:
+        mapping = yaml.safe_load(f)
+    cdf = apply_mapping(demo, mapping)
+    res = evaluate_kpis(mapping["kpis"], cdf, aliases=source_aliases(mapping, demo.columns), fallback=demo)
+    assert [r["id"] for r in res] == [k["id"] for k in mapping["kpis"]]
+    for k, r in zip(mapping["kpis"], res):
+        assert r["error"] is None, k["id"]
+        np.testing.assert_allclose(r["value"], _eval(k["formula"], demo), rtol=1e-12, err_msg=k["id"])
+
+
+def test_count_stays_an_integer(demo):
+    (res,) = evaluate_kpis(_kpis(["df['quantity'].count()"]), demo)
+    assert isinstance(res["value"], int) and res["value"] == demo["quantity"].count()
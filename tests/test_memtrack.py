@@ -0,0 +1,112 @@
+# tests/test_memtrack.py — memory sizing and the full → sampled → aggregated session budget
+import numpy as np
+import pandas as pd
+import pytest
+
+import memtrack
+from memtrack import deep_bytes, fit_to_budget
+
+MB = 1024 * 1024
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(memtrack, "MIN_SAMPLE_FRACTION", 0.25)
+    with memtrack._lock:
+        memtrack._entries.clear()
+    yield
+    with memtrack._lock:
+        memtrack._entries.clear()
+
+
+def _frame(n: int = 100_000) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "day": rng.integers(0, 30, n),
+        "amount": rng.gamma(2.0, 50.0, n),
+        "cost": rng.gamma(2.0, 30.0, n),
+    })
+
+
+def _limit(monkeypatch, mb: float) -> None:
+    monkeypatch.setattr(memtrack, "SESSION_LIMIT_MB", mb)
+
+
+def _rollup(df: pd.DataFrame) -> pd.DataFrame:
+    return df.groupby("day", as_index=False)[["amount", "cost"]].sum()
+
+
+# ---------- Sizing ----------
+
+def test_deep_bytes_matches_pandas_for_numeric_and_small_object_columns():
+    df = _frame(1000).assign(label=[f"item-{i % 37}" for i in range(1000)])
+    assert deep_bytes(df) == df.memory_usage(index=True, deep=True).sum()
+
+
+def test_deep_bytes_extrapolates_large_object_columns():
+    s = pd.Series([f"customer-{i:08d}" for i in range(200_000)])
+    assert deep_bytes(s) == pytest.approx(s.memory_usage(index=True, deep=True), rel=0.02)
+
+
+# ---------- Budget ----------
+
+def test_frame_within_the_limit_is_kept_whole(monkeypatch):
+    df = _frame()
+    _limit(monkeypatch, 2 * deep_bytes(df) / MB)
+    out, info = fit_to_budget(df, page="p", rollup=_rollup)
+    assert info["mode"] == "full" and out is df
+    assert memtrack.session_bytes() == deep_bytes(df)
+
+
+def test_frame_over_the_limit_is_sampled(monkeypatch):
+    df = _frame()
+    _limit(monkeypatch, 0.6 * deep_bytes(df) / MB)
+    sampled = memtrack.counters()["degraded_sampled_total"]
+    out, info = fit_to_budget(df, page="p", rollup=_rollup)
+    # 3 float columns are 24 bytes a row; the sample's int64 index adds 8 more
+    assert info["mode"] == "sampled" and info["fraction"] == pytest.approx(0.6 * 24 / 32 * 0.9, abs=1e-4)
+    assert len(out) == pytest.approx(info["fraction"] * len(df), abs=5) and out.index.is_monotonic_increasing
+    pd.testing.assert_frame_equal(out, df.loc[out.index])
+    assert info["bytes"] <= info["limit"] and memtrack.session_bytes() == info["bytes"]
+    assert memtrack.counters()["degraded_sampled_total"] == sampled + 1
+    again, _ = fit_to_budget(df, page="p", rollup=_rollup)  # refitting does not count its own entry
+    assert again.index.equals(out.index)
+
+
+def test_frame_far_over_the_limit_is_aggregated(monkeypatch):
+    df = _frame()
+    _limit(monkeypatch, 0.1 * deep_bytes(df) / MB)
+    aggregated = memtrack.counters()["degraded_aggregated_total"]
+    out, info = fit_to_budget(df, page="p", rollup=_rollup)
+    assert info["mode"] == "aggregated" and info["fraction"] is None
+    pd.testing.assert_frame_equal(out, _rollup(df))
+    assert memtrack.counters()["degraded_aggregated_total"] == aggregated + 1
+
+
+def test_without_a_rollup_a_small_sample_is_kept(monkeypatch):
+    df = _frame()
+    _limit(monkeypatch, 0.1 * deep_bytes(df) / MB)
+    out, info = fit_to_budget(df, page="p")
+    assert info["mode"] == "sampled" and info["fraction"] == pytest.approx(0.1 * 24 / 32 * 0.9, abs=1e-4)
+    assert len(out) == pytest.approx(info["fraction"] * len(df), abs=5) and info["bytes"] <= info["limit"]
+
+
+def test_switch_follows_what_else_the_session_holds(monkeypatch):
+    df = _frame()
+    size = deep_bytes(df)
+    _limit(monkeypatch, 1.5 * size / MB)
+    assert fit_to_budget(df, page="p", rollup=_rollup)[1]["mode"] == "full"
+    memtrack.track("other", np.zeros(int(0.8 * size) // 8), page="q")
+    assert fit_to_budget(df, page="p", rollup=_rollup)[1]["mode"] == "sampled"
+    memtrack.track("other", np.zeros(int(1.4 * size) // 8), page="q")
+    assert fit_to_budget(df, page="p", rollup=_rollup)[1]["mode"] == "aggregated"
+    memtrack.untrack("other", page="q")
+    assert fit_to_budget(df, page="p", rollup=_rollup)[1]["mode"] == "full"
+
+
+def test_shared_cache_entries_do_not_count_against_the_session(monkeypatch):
+    df = _frame()
+    _limit(monkeypatch, 1.5 * deep_bytes(df) / MB)
+    memtrack.track_cache("csv:big", _frame(400_000), ttl=60)
+    assert memtrack.is_cached("csv:big")
+    assert fit_to_budget(df, page="p")[1]["mode"] == "full"
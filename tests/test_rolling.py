@@ -0,0 +1,86 @@
+# tests/test_rolling.py — linear-time rolling statistics and anomaly bands (against pandas rolling)
+import numpy as np
+import pandas as pd
+import pytest
+
+import rolling
+from rolling import ANOMALY, LOWER, MAX, MEAN, MIN, UPPER, ZSCORE
+
+
+def _frame(sizes=(40, 1, 25, 3, 60), seed: int = 0) -> pd.DataFrame:
+    """Several groups of different lengths, values with NaNs (a few runs of them too)."""
+    rng = np.random.default_rng(seed)
+    g = np.repeat([f"g{i}" for i in range(len(sizes))], sizes)
+    v = 1000 + rng.normal(0, 50, len(g)).cumsum()
+    v[rng.random(len(g)) < 0.15] = np.nan
+    v[10:14] = np.nan
+    return pd.DataFrame({"g": g, "t": np.arange(len(g)), "v": v})
+
+
+def _pandas(df: pd.DataFrame, window: int, min_periods: int) -> pd.DataFrame:
+    r = df.groupby("g", sort=False)["v"].rolling(window, min_periods=min_periods)
+    return pd.DataFrame({fn: getattr(r, fn)().to_numpy() for fn in ("mean", "std", "min", "max")})
+
+
+@pytest.mark.parametrize("window", [1, 2, 3, 7, 30])
+@pytest.mark.parametrize("min_periods", [1, 3])
+def test_matches_pandas_groupby_rolling(window, min_periods):
+    min_periods = min(min_periods, window)  # pandas rejects min_periods > window
+    df = _frame()
+    ours = rolling.rolling(df["v"], window, groups=df["g"], min_periods=min_periods)
+    expected = _pandas(df, window, min_periods)
+    for fn in ("mean", "std", "min", "max"):
+        np.testing.assert_allclose(ours[fn], expected[fn], rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=fn)
+
+
+def test_single_series_matches_pandas():
+    v = _frame(sizes=(500,), seed=3)["v"]
+    ours = rolling.rolling(v, 14, min_periods=2)
+    r = v.rolling(14, min_periods=2)
+    for fn in ("mean", "std", "min", "max"):
+        np.testing.assert_allclose(ours[fn], getattr(r, fn)(), rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=fn)
+
+
+def test_window_longer_than_a_group_stays_inside_it():
+    df = pd.DataFrame({"g": ["a"] * 3 + ["b"] * 4, "v": [1.0, 2.0, 3.0, 100.0, 200.0, np.nan, 400.0]})
+    out = rolling.rolling(df["v"], 10, groups=df["g"])
+    np.testing.assert_array_equal(out["count"], [1, 2, 3, 1, 2, 2, 3])
+    np.testing.assert_allclose(out["mean"], [1, 1.5, 2, 100, 150, 150, 700 / 3])
+    np.testing.assert_array_equal(out["min"], [1, 1, 1, 100, 100, 100, 100])
+    np.testing.assert_array_equal(out["max"], [1, 2, 3, 100, 200, 200, 400])
+    expected = _pandas(df, 10, 1)
+    np.testing.assert_allclose(out["std"], expected["std"], equal_nan=True)
+
+
+def test_precision_on_large_offsets():
+    v = pd.Series(1e9 + np.random.default_rng(4).normal(0, 1, 400))
+    np.testing.assert_allclose(rolling.rolling(v, 20, min_periods=2)["std"], v.rolling(20, min_periods=2).std(),
+                               rtol=1e-6, equal_nan=True)
+
+
+# ---------- Anomaly band ----------
+
+def test_band_comes_from_the_previous_window():
+    df = _frame(sizes=(50, 30), seed=5).dropna().reset_index(drop=True)
+    window, z = 7, 2.5
+    out = rolling.frame(df, "t", "v", window, by="g", z=z)
+    prev = df.groupby("g", sort=False)["v"].rolling(window, min_periods=3)
+    mean = prev.mean().groupby(level=0).shift(1).to_numpy()
+    std = prev.std().groupby(level=0).shift(1).to_numpy()
+    np.testing.assert_allclose(out[LOWER], mean - z * std, equal_nan=True)
+    np.testing.assert_allclose(out[UPPER], mean + z * std, equal_nan=True)
+    np.testing.assert_allclose(out[MEAN], prev.mean().to_numpy(), equal_nan=True)
+    for col in (LOWER, UPPER):  # no band on each group's first row
+        assert out.groupby("g")[col].head(1).isna().all()
+
+
+def test_an_outlier_does_not_widen_its_own_band():
+    v = np.r_[np.tile([10.0, 11.0, 9.0, 10.0], 5), 50.0, 10.0]
+    df = pd.DataFrame({"t": np.arange(len(v)), "v": v})
+    out = rolling.frame(df, "t", "v", 6, z=3.0)
+    spike = out.iloc[20]
+    assert spike[ANOMALY] and spike["v"] > spike[UPPER] and spike[ZSCORE] > 3
+    assert spike[UPPER] < 13  # computed from the calm points before it
+    assert not out[ANOMALY].iloc[:20].any()
+    assert out[MAX].iloc[20] == 50.0 and out[MIN].iloc[20] == 9.0
+    assert out[UPPER].iloc[21] > 20  # the spike enters the band one point later
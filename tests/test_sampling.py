@@ -0,0 +1,124 @@
+# tests/test_sampling.py — stratified samples, extend() and the domain estimators
+import numpy as np
+import pandas as pd
+import pytest
+
+import sampling
+from sampling import CI, STRATUM, WEIGHT, build, extend, total
+
+
+def _orders(n: int = 40_000, seed: int = 2024) -> pd.DataFrame:
+    """A year of orders: skewed regions (one rare), 40 products, gamma revenue."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+        "region": rng.choice(list("ABCDEFGH"), n, p=[0.3, 0.2, 0.15, 0.1, 0.1, 0.1, 0.04, 0.01]),
+        "product": rng.choice([f"p{i}" for i in range(40)], n),
+        "revenue": rng.gamma(2.0, 100.0, n),
+    })
+
+
+def _domain(df: pd.DataFrame) -> pd.Series:
+    """About 0.3% of the rows: a rare region and three products."""
+    return (df["region"] == "G") & df["product"].isin(["p1", "p2", "p3"])
+
+
+def _assert_weights_are_population_over_drawn(sample: dict, df: pd.DataFrame) -> None:
+    frame = sample["frame"]
+    h = frame[STRATUM].to_numpy()
+    drawn = np.bincount(h, minlength=len(sample["population"]))
+    np.testing.assert_array_equal(drawn, sample["drawn"])
+    np.testing.assert_allclose(frame[WEIGHT], sample["population"][h] / drawn[h])
+    # N_h is the number of rows of the full data in stratum h
+    keys = sampling._stratum_keys(df, sample["spec"])
+    population = pd.Series(keys).value_counts().reindex(sample["keys"], fill_value=0).to_numpy()
+    np.testing.assert_array_equal(sample["population"], population)
+    assert frame.groupby(STRATUM)[WEIGHT].sum().sum() == pytest.approx(len(df))
+
+
+# ---------- Estimates ----------
+
+def test_small_domain_total_falls_within_its_ci():
+    df = _orders()
+    truth = df.loc[_domain(df), "revenue"].sum()
+    sample = build(df, date_col="date", cat_col="region", size=4000, seed=7)
+    est = total(sample, sample["frame"][_domain(sample["frame"])], "revenue")
+    assert 0 < est[CI] < est["estimate"]
+    assert abs(est["estimate"] - truth) <= est[CI]
+
+
+def test_ci_covers_the_truth_about_95_percent_of_the_time():
+    df = _orders()
+    dom = _domain(df)
+    truth_sum, truth_rows = df.loc[dom, "revenue"].sum(), int(dom.sum())
+    hit_sum = hit_rows = 0
+    seeds = range(60)
+    for seed in seeds:
+        sample = build(df, date_col="date", cat_col="region", size=4000, seed=seed)
+        view = sample["frame"][_domain(sample["frame"])]
+        s, r = total(sample, view, "revenue"), total(sample, view)
+        hit_sum += abs(s["estimate"] - truth_sum) <= s[CI]
+        hit_rows += abs(r["estimate"] - truth_rows) <= r[CI]
+    assert hit_sum >= 0.85 * len(seeds) and hit_rows >= 0.85 * len(seeds)
+
+
+def test_unfiltered_row_count_is_exact():
+    df = _orders()
+    sample = build(df, date_col="date", cat_col="region", size=3000)
+    est = total(sample, sample["frame"])
+    assert est["estimate"] == pytest.approx(len(df)) and est[CI] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_breakdown_estimates_every_category():
+    df = _orders()
+    sample = build(df, date_col="date", cat_col="region", size=4000)
+    out = sampling.category_breakdown(sample, sample["frame"], "region", "revenue").set_index("region")
+    truth = df.groupby("region")["revenue"].sum()
+    assert set(out.index) == set(truth.index)  # the 1% region is represented
+    assert (np.abs(out["revenue"] - truth[out.index]) <= 2 * out[CI]).mean() >= 0.75
+
+
+# ---------- build / extend ----------
+
+def test_build_weights_are_population_over_drawn():
+    df = _orders()
+    sample = build(df, date_col="date", cat_col="region", size=4000)
+    _assert_weights_are_population_over_drawn(sample, df)
+    assert sample["drawn"].min() >= 1
+    assert 0.8 * 4000 <= len(sample["frame"]) <= 1.6 * 4000
+
+
+@pytest.mark.parametrize("k, new_strata", [(30_000, True), (39_990, False)])
+def test_extend_keeps_weights_at_population_over_drawn(k, new_strata):
+    df = _orders().sort_values("date", kind="stable").reset_index(drop=True)  # appends bring later months
+    sample = build(df.iloc[:k], date_col="date", cat_col="region", size=4000)
+    grown = extend(sample, df.iloc[k:])
+    assert grown["rows"] == len(df)
+    _assert_weights_are_population_over_drawn(grown, df)
+    assert set(sample["keys"]) <= set(grown["keys"])
+    assert (len(grown["keys"]) > len(sample["keys"])) == new_strata
+
+
+def test_extend_with_no_rows_is_a_no_op():
+    df = _orders(5000)
+    sample = build(df, date_col="date", cat_col="region", size=500)
+    assert extend(sample, df.iloc[:0]) is sample
+
+
+def test_a_stratum_that_drew_nothing_keeps_its_first_row(monkeypatch):
+    df = _orders(5000)
+    # draw probabilities so small that no stratum would be sampled at all
+    monkeypatch.setattr(sampling, "_probabilities", lambda population, rows, size: np.full(len(population), 1e-12))
+    sample = build(df, date_col="date", cat_col="region", size=500)
+    frame = sample["frame"]
+    np.testing.assert_array_equal(sample["drawn"], 1)
+    keys = sampling._stratum_keys(df, sample["spec"])
+    first_rows = pd.Series(np.arange(len(df))).groupby(keys).first().to_numpy()
+    pd.testing.assert_frame_equal(frame[df.columns], df.iloc[np.sort(first_rows)].reset_index(drop=True))
+    np.testing.assert_allclose(frame[WEIGHT], sample["population"][frame[STRATUM]])
+
+
+def test_only_new_strata_are_topped_up_on_extend():
+    strata = np.array([0, 0, 1, 1, 2, 2, 2])
+    keep = sampling._draw(strata, np.zeros(3), first_new=1, seed=0)
+    np.testing.assert_array_equal(np.flatnonzero(keep), [2, 4])  # first rows of strata 1 and 2 only
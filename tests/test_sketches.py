@@ -0,0 +1,159 @@
+# tests/test_sketches.py — mergeable column sketches (HyperLogLog, Misra-Gries, quantile digest)
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sketches
+from sketches import HLL_P, TOP_K, hll_count, merge, sketch_column
+
+
+def _ids(n: int, prefix: str = "id") -> pd.Series:
+    return pd.Series([f"{prefix}-{i}" for i in range(n)])
+
+
+def _skewed(n: int, seed: int = 0) -> pd.Series:
+    """Zipf-like text column: a few heavy values and a long tail of rare ones."""
+    rng = np.random.default_rng(seed)
+    return pd.Series([f"v{x}" for x in rng.zipf(1.3, n)])
+
+
+def _assert_same_text_sketch(a: dict, b: dict) -> None:
+    np.testing.assert_array_equal(a["hll"], b["hll"])
+    assert a["top"] == b["top"]
+    for key in ("rows", "nulls", "top_error", "exact"):
+        assert a[key] == b[key], key
+
+
+# ---------- Merging ----------
+
+def test_merge_of_halves_equals_sketch_of_concatenation():
+    s = _skewed(50_000)
+    a, b = s.iloc[:25_000], s.iloc[25_000:]
+    merged = merge(sketch_column(a), sketch_column(b))
+    # sketch_column merges per chunk: a chunk boundary at the split builds the same sketch
+    _assert_same_text_sketch(merged, sketch_column(s, chunk_rows=25_000))
+    # HLL registers are a max, so they match the single-pass sketch exactly
+    np.testing.assert_array_equal(merged["hll"], sketch_column(s)["hll"])
+
+
+def test_merge_is_exact_while_every_value_has_a_counter():
+    s = pd.Series(list("abcabcaab") * 50 + [None] * 7)
+    merged = merge(sketch_column(s.iloc[:200]), sketch_column(s.iloc[200:]))
+    _assert_same_text_sketch(merged, sketch_column(s))
+    assert merged["exact"] and merged["top"] == dict(Counter(s.dropna()))
+    assert sketches.distinct(merged) == 3 and merged["nulls"] == 7
+
+
+def test_merge_leaves_its_inputs_unchanged():
+    a, b = sketch_column(_ids(3000, "a")), sketch_column(_ids(3000, "b"))
+    hll_a, top_a = a["hll"].copy(), dict(a["top"])
+    merge(a, b)
+    np.testing.assert_array_equal(a["hll"], hll_a)
+    assert a["top"] == top_a
+
+
+def test_sketches_survive_json():
+    sk = {"t": sketch_column(_skewed(5000))}
+    back = sketches.from_json(sketches.to_json(sk))
+    _assert_same_text_sketch(back["t"], sk["t"])
+
+
+# ---------- HyperLogLog ----------
+
+@pytest.mark.parametrize("n", [10, 500, 5_000, 50_000, 250_000])
+def test_hll_error_within_bound(n):
+    bound = 3 * 1.04 / np.sqrt(1 << HLL_P)  # three standard errors (≈ 4.9%)
+    assert abs(hll_count(sketch_column(_ids(n))["hll"]) / n - 1) <= bound
+
+
+def test_hll_counts_distinct_values_not_rows():
+    s = pd.concat([_ids(20_000)] * 3, ignore_index=True)
+    assert abs(sketches.distinct(sketch_column(s)) / 20_000 - 1) <= 3 * 1.04 / np.sqrt(1 << HLL_P)
+
+
+# ---------- Misra-Gries ----------
+
+@pytest.mark.parametrize("chunk_rows", [sketches.CHUNK_ROWS, 20_000])
+def test_misra_gries_keeps_every_frequent_item(chunk_rows):
+    s = _skewed(200_000, seed=1)
+    n = len(s)
+    truth = Counter(s)
+    assert len(truth) > TOP_K  # the table had to drop values
+    sk = sketch_column(s, chunk_rows=chunk_rows)
+    assert not sk["exact"]
+    assert sk["top_error"] <= n / (TOP_K + 1)
+    frequent = [v for v, c in truth.items() if c > n / TOP_K]
+    assert frequent and all(v in sk["top"] for v in frequent)
+    for v, c in sk["top"].items():  # counts are lower bounds, low by at most top_error
+        assert truth[v] - sk["top_error"] <= c <= truth[v]
+
+
+def test_top_values_are_ranked():
+    sk = sketch_column(pd.Series(["a"] * 5 + ["b"] * 3 + ["c"]))
+    assert sketches.top_values(sk, 2) == [("a", 5), ("b", 3)]
+
+
+# ---------- Quantile digest ----------
+
+QS = np.array([0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999])
+
+
+def _numbers(n: int, seed: int = 0) -> pd.Series:
+    """Skewed values (log-normal) with a few NaNs."""
+    rng = np.random.default_rng(seed)
+    x = rng.lognormal(3, 1.2, n)
+    x[rng.integers(0, n, n // 100)] = np.nan
+    return pd.Series(x)
+
+
+def _rank_error(x: np.ndarray, sk: dict, qs: np.ndarray) -> np.ndarray:
+    """|fraction of values below the estimate − q| for each q."""
+    x = np.sort(x[np.isfinite(x)])
+    return np.abs(np.searchsorted(x, sketches.quantile(sk, qs)) / len(x) - qs)
+
+
+def test_digest_merge_equals_sketch_of_concatenation():
+    s = _numbers(80_000)
+    a, b = s.iloc[:40_000], s.iloc[40_000:]
+    merged = merge(sketch_column(a), sketch_column(b))
+    chunked = sketch_column(s, chunk_rows=40_000)
+    np.testing.assert_array_equal(merged["means"], chunked["means"])
+    np.testing.assert_array_equal(merged["weights"], chunked["weights"])
+    whole = sketch_column(s)
+    for key in ("rows", "nulls", "min", "max"):
+        assert merged[key] == whole[key], key
+    assert merged["sum"] == pytest.approx(np.nansum(s.to_numpy()), rel=1e-12)
+    assert merged["weights"].sum() == s.notna().sum()
+    assert _rank_error(s.to_numpy(), merged, QS).max() <= 1e-3
+
+
+@pytest.mark.parametrize("chunk_rows", [sketches.CHUNK_ROWS, 25_000])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_digest_quantiles_close_to_numpy(chunk_rows, seed):
+    s = _numbers(200_000, seed)
+    sk = sketch_column(s, chunk_rows=chunk_rows)
+    assert len(sk["means"]) <= sketches.COMPRESSION
+    x = s.to_numpy()
+    err = _rank_error(x, sk, QS)
+    assert err.max() <= 1e-3
+    assert err[[0, -1]].max() <= 2e-4  # the tails are the most precise
+    values = sketches.quantile(sk, QS)
+    np.testing.assert_allclose(values[2:-2], np.nanquantile(x, QS[2:-2]), rtol=0.02)
+    assert sketches.quantile(sk, 0.0) == np.nanmin(x) and sketches.quantile(sk, 1.0) == np.nanmax(x)
+
+
+def test_digest_histogram_counts_every_row():
+    s = _numbers(50_000, seed=2)
+    sk = sketch_column(s)
+    hist = sketches.histogram(sk, bins=30)
+    assert len(hist) == 30 and hist["rows"].sum() == pytest.approx(s.notna().sum())
+    exact, _ = np.histogram(s.dropna(), bins=np.r_[hist["from"].to_numpy(), hist["to"].iloc[-1]])
+    assert np.abs(hist["rows"].to_numpy() - exact).max() <= 0.01 * len(s)
+
+
+def test_digest_of_an_empty_column():
+    sk = sketch_column(pd.Series([np.nan, np.nan]))
+    assert sk["rows"] == 2 and sk["nulls"] == 2 and sk["min"] is None
+    assert sketches.quantile(sk, 0.5) is None and sketches.box(sk) is None
@@ -0,0 +1,201 @@
+# warmup.py — background cache warm-up after a deploy or worker restart
+#
+# Caches are per process, so after a restart the first visitors of a big
+# dataset each wait for the cold CSV load and date parse. start() (called
+# once per process after the first sign-in on the Home page, and by the
+# Dashboard for deep links) runs a background thread that picks the datasets most likely to be opened —
+# those with the most saved Dashboard views, then the most recent uploads —
+# and fills the same caches the Dashboard reads:
+#   - the parsed dataset (datasets.load_dataset) and its column sketches;
+#   - for each saved view, what the page will compute for it: the stratified
+#     sample in approximate mode, else the view's breakdown / time series.
+# Each dataset is loaded under admission control as user "warm-up" (one at a
+# time, behind real users) and the total stays under WARM_MB. status() reports
+# progress (Admin page). Heavy modules are imported in the thread, and only
+# once there is something to warm. With the analytics API configured the pages
+# do not hold uploads in this process, so there is nothing to warm here.
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List
+
+import api_client
+import db
+
+WARM_ENABLED = os.getenv("LUMINAIQ_WARMUP", "1") != "0"
+WARM_MB = float(os.getenv("LUMINAIQ_WARM_MB", "1024"))
+WARM_DATASETS = int(os.getenv("LUMINAIQ_WARM_DATASETS", "5"))
+WARM_DELAY_S = float(os.getenv("LUMINAIQ_WARM_DELAY_S", "2"))  # let the first page render first
+
+_lock = threading.Lock()
+_state: Dict[str, Any] = {
+    "status": "idle",  # idle → running → done
+    "started_at": None, "finished_at": None,
+    "total": 0, "done": 0, "current": None,
+    "warmed_mb": 0.0, "datasets": [],  # one row per candidate: filename, views, outcome, mb, seconds
+}
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat(timespec="seconds") + "Z"
+
+
+def _label(upload: dict) -> str:
+    """The Dashboard's dataset option label (what saved views store)."""
+    return f"{upload['uploaded_at']} — {upload['filename']}"
+
+
+# ---------- Candidates ----------
+
+def candidates(limit: int = WARM_DATASETS) -> List[Dict[str, Any]]:
+    """[{"upload", "views": [payload, ...]}]: most saved Dashboard views first, then most recent."""
+    picked: Dict[int, Dict[str, Any]] = {}
+    by_user: Dict[str, Dict[str, dict]] = {}
+    for v in db.list_all_views("dashboard"):
+        try:
+            payload = json.loads(v["payload"])
+        except ValueError:
+            continue
+        if v["user_id"] not in by_user:
+            by_user[v["user_id"]] = {_label(u): u for u in db.list_uploads_for_user(v["user_id"])}
+        upload = by_user[v["user_id"]].get(payload.get("dataset"))
+        if upload:
+            picked.setdefault(upload["id"], {"upload": upload, "views": []})["views"].append(payload)
+
+    ranked = sorted(picked.values(), key=lambda e: len(e["views"]), reverse=True)
+    for upload in db.list_recent_uploads(limit):
+        if upload["id"] not in picked:
+            ranked.append({"upload": upload, "views": []})
+    return ranked[:limit]
+
+
+# ---------- Warming one dataset ----------
+
+def _view_filters(payload: dict, df, col_sketches: dict) -> Dict[str, Any]:
+    """The filters the Dashboard builds for a saved view (its widget defaults included)."""
+    import pandas as pd
+
+    sel_dt = payload.get("sel_dt") if payload.get("sel_dt") not in (None, "—") else None
+    sel_cat = payload.get("sel_cat") if payload.get("sel_cat") not in (None, "—") else None
+    sel_val = payload.get("sel_val") or None
+
+    drange = None
+    if sel_dt and sel_dt in df.columns:
+        if payload.get("drange"):
+            drange = tuple(date.fromisoformat(str(d)[:10]) for d in payload["drange"])
+        else:
+            s = pd.to_datetime(df[sel_dt], errors="coerce")
+            drange = (s.min().date(), s.max().date()) if s.notna().any() else None
+
+    num_range = None
+    if sel_val:
+        if payload.get("num_range") is not None:
+            num_range = tuple(float(x) for x in payload["num_range"])
+        elif (col_sketches.get(sel_val) or {}).get("min") is not None:
+            num_range = (float(col_sketches[sel_val]["min"]), float(col_sketches[sel_val]["max"]))
+
+    # same keys and values as the page's filters dict, so the cache names match
+    return dict(date_col=sel_dt, drange=drange, cat_col=sel_cat,
+                keep_vals=list(payload.get("keep_vals") or []) if sel_cat else [],
+                value_col=sel_val, num_range=num_range)
+
+
+def _warm(entry: Dict[str, Any]) -> float:
+    """Fill the Dashboard's caches for one dataset and its saved views; returns the MB now cached."""
+    import sampling
+    import sketches
+    from analytics import apply_filters, column_kinds
+    from datasets import dataset_key, load_dataset, load_sample, load_sketches, view_aggregate
+    from memtrack import deep_bytes
+
+    ds = entry["upload"]
+    df = load_dataset(ds)
+    key = f"{dataset_key(ds)}~1.0"  # the Dashboard's frame key for a session within its memory limit
+    col_sketches = load_sketches(key, ds, df)
+    num_cols, cat_cols, dt_cols = column_kinds(df)
+    categorical = [c for c in cat_cols if c in col_sketches and sketches.classify(col_sketches[c]) == "categorical"]
+    approximate = len(df) > 2 * sampling.SAMPLE_ROWS  # the Dashboard's default on datasets this large
+
+    for payload in entry["views"]:
+        filters = _view_filters(payload, df, col_sketches)
+        if approximate:
+            load_sample(key, filters["date_col"] or (dt_cols[0] if dt_cols else None),
+                        filters["cat_col"] or (categorical[0] if categorical else None), ds)
+            continue
+        if not filters["value_col"] or (not filters["cat_col"] and not filters["date_col"]):
+            continue
+        view = apply_filters(df, **filters)
+        if filters["cat_col"]:
+            view_aggregate(key, "breakdown", filters, filters["cat_col"], filters["value_col"], view, ds)
+        if filters["date_col"]:
+            view_aggregate(key, "timeseries", filters, filters["date_col"], filters["value_col"], view, ds)
+    return deep_bytes(df) / (1024 * 1024)
+
+
+# ---------- Runner ----------
+
+def _run() -> None:
+    time.sleep(WARM_DELAY_S)
+    try:
+        todo = candidates()
+    except Exception as e:  # e.g. schema not created yet
+        todo = []
+        with _lock:
+            _state["datasets"].append({"filename": "—", "views": 0, "outcome": f"failed: {e}", "mb": 0.0,
+                                       "seconds": 0.0})
+    with _lock:
+        _state["total"] = len(todo)
+    if todo:
+        # pandas & co. load here, after the delay, and not at all when there is nothing to warm
+        from admission import AdmissionRefused, admit
+        from datasets import is_loaded, load_cost_mb
+
+    for entry in todo:
+        ds = entry["upload"]
+        row = {"filename": ds["filename"], "views": len(entry["views"]), "outcome": "", "mb": 0.0, "seconds": 0.0}
+        with _lock:
+            _state["current"] = ds["filename"]
+            _state["datasets"].append(row)
+        t0 = time.perf_counter()
+        cost = load_cost_mb(ds)
+        if _state["warmed_mb"] + cost > WARM_MB:
+            row["outcome"] = f"skipped: needs ~{cost:,.0f} MB, over the warm-up budget"
+        else:
+            try:
+                with admit("cache warm-up", user="warm-up", cost_mb=cost):
+                    was_loaded = is_loaded(ds)
+                    mb = _warm(entry)
+                row.update(outcome="already warm" if was_loaded and not entry["views"] else "warmed",
+                           mb=round(mb, 1))
+                with _lock:
+                    _state["warmed_mb"] += mb
+            except AdmissionRefused as e:
+                row["outcome"] = f"skipped: {e}"
+            except Exception as e:
+                row["outcome"] = f"failed: {type(e).__name__}: {e}"
+        row["seconds"] = round(time.perf_counter() - t0, 2)
+        with _lock:
+            _state["done"] += 1
+
+    with _lock:
+        _state.update(status="done", current=None, finished_at=_now())
+
+
+def start() -> bool:
+    """Start the warm-up once per process (no-op when disabled or already started); True if this call started it."""
+    with _lock:
+        if not WARM_ENABLED or api_client.enabled() or _state["status"] != "idle":
+            return False
+        _state.update(status="running", started_at=_now())
+    threading.Thread(target=_run, name="luminaiq-warmup", daemon=True).start()
+    return True
+
+
+def status() -> Dict[str, Any]:
+    """Progress for display: status, done / total, current dataset, MB warmed, one row per dataset."""
+    with _lock:
+        return {**_state, "datasets": [dict(r) for r in _state["datasets"]], "budget_mb": WARM_MB}